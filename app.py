@@ -1,18 +1,15 @@
+import json
 import os
 import re
-import shutil
-import socket
-import subprocess
 import textwrap
 from urllib.parse import urlencode
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, g
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, g, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_babel import Babel, gettext, lazy_gettext as _l
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
-import requests
 from dotenv import load_dotenv
 from sqlalchemy.engine.url import make_url, URL
 from migrate_parts_translations import find_translation
@@ -94,12 +91,33 @@ app.config['TEMPLATES_AUTO_RELOAD'] = app.debug
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Импорт моделей и авторизации
-from models import db, Mechanic, Order, Part, Category
+from models import db, Mechanic, get_mechanics_order_stats, get_category_part_counts, Order, OrderItem, OrderPlateNgram, Part, Category, CategoryAlias, rebuild_category_aliases, CatalogState, OrderTombstone, NotificationOutbox, PrintJob, OrderEvent, serialize_orders, sort_by_sort_map, normalize_selected_parts, collect_part_ids, localize_selected_parts, _coerce_part_id
+from catalog_cache import get_catalog_snapshot, bump_catalog_version, catalog_etag
+from pagination import paginate_by_cursor, estimate_orders_count, InvalidCursor
+from order_stats import compute_order_stats, get_unfiltered_order_stats
+from order_changes import current_watermark, parse_watermark, get_order_changes, record_order_deletion
+from order_stream import publish_order_event, subscribe_order_events, unsubscribe_order_events, format_sse
+from order_items import insert_order_item, backfill_order_items
+from notification_outbox import enqueue_telegram_message, resume_pending_notifications
+from print_queue import enqueue_print_job, has_active_print_job, retry_print_job, reprint_job, resume_print_queue
+from plate_search import apply_plate_filter, create_trigram_index, rebuild_plate_ngrams
+from order_queue import get_order_queue
+from eta_model import get_eta_model, estimate_order_minutes, queue_estimates
+from order_event_log import THROUGHPUT_BUCKETS, record_order_event, get_order_timeline, get_status_throughput
+from order_export import EXPORT_FORMATS, generate_order_export
+from parts_import import ImportFileError, import_parts, iter_upload_rows, default_batch_size as default_parts_import_batch_size
 from auth import login_manager, admin_required, mechanic_required, should_notify_mechanic
+from request_timing import init_request_timing
+from env_config import env_float
+from metrics import init_metrics, count_order_created
 
 # Инициализация расширений
 db.init_app(app)
 login_manager.init_app(app)
+# Счётчик SQL-запросов и Server-Timing (REQUEST_TIMING=true), до остальных before_request
+init_request_timing(app)
+# Метрики Prometheus (/metrics), если установлен prometheus_client
+init_metrics(app, active_orders=lambda: len(get_order_queue()))
 
 # Автоматическая миграция базы данных при старте приложения
 def run_migrations():
@@ -109,6 +127,25 @@ def run_migrations():
             from sqlalchemy import inspect, text
             inspector = inspect(db.engine)
 
+            # Новые служебные таблицы (кэш справочника, лента изменений, позиции заказов)
+            existing_tables = inspector.get_table_names()
+            for model in (CatalogState, OrderTombstone, OrderItem, NotificationOutbox, PrintJob, OrderPlateNgram, CategoryAlias, OrderEvent):
+                if model.__tablename__ not in existing_tables:
+                    print(f"🔄 Выполнение миграции: создание таблицы {model.__tablename__}...")
+                    model.__table__.create(db.engine, checkfirst=True)
+                    print("✅ Миграция выполнена успешно!")
+
+            # Индекс названий категорий: категорий немного, поэтому пересобираем его
+            # при каждом старте (на случай правок справочника скриптами в обход ORM)
+            if 'categories' in existing_tables:
+                rebuild_category_aliases()
+                db.session.commit()
+
+            if 'parts' in existing_tables:
+                with db.engine.connect() as conn:
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_parts_category_name_ru ON parts (category, name_ru)"))
+                    conn.commit()
+
             # Проверяем, существует ли таблица orders
             if 'orders' in inspector.get_table_names():
                 columns = [col['name'] for col in inspector.get_columns('orders')]
@@ -120,12 +157,59 @@ def run_migrations():
                         conn.execute(text("ALTER TABLE orders ADD COLUMN estimated_ready_at TIMESTAMP"))
                         conn.commit()
                     print("✅ Миграция выполнена успешно!")
+
+                # Нормализованный гос номер для поиска по подстроке
+                if 'plate_normalized' not in columns:
+                    print("🔄 Выполнение миграции: добавление поля plate_normalized...")
+                    with db.engine.connect() as conn:
+                        conn.execute(text("ALTER TABLE orders ADD COLUMN plate_normalized VARCHAR(20)"))
+                        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_plate_normalized ON orders (plate_normalized)"))
+                        conn.commit()
+                    print("✅ Миграция выполнена успешно!")
+                # Время перехода в 'готово' для модели ETA; для уже готовых заказов
+                # лучшее приближение - updated_at
+                if 'ready_at' not in columns:
+                    print("🔄 Выполнение миграции: добавление поля ready_at...")
+                    with db.engine.connect() as conn:
+                        conn.execute(text("ALTER TABLE orders ADD COLUMN ready_at TIMESTAMP"))
+                        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_ready_at ON orders (ready_at)"))
+                        conn.execute(text("UPDATE orders SET ready_at = updated_at WHERE status = 'готово'"))
+                        conn.commit()
+                    print("✅ Миграция выполнена успешно!")
+                has_trigram_index = create_trigram_index()
+                needs_plate_rebuild = db.session.query(Order.id).filter(Order.plate_normalized.is_(None)).first() is not None
+                if not has_trigram_index and not needs_plate_rebuild:
+                    needs_plate_rebuild = (
+                        db.session.query(Order.id).first() is not None
+                        and db.session.query(OrderPlateNgram.order_id).first() is None
+                    )
+                if needs_plate_rebuild:
+                    print(f"✅ Индекс поиска по гос номеру построен для {rebuild_plate_ngrams()} заказов")
+
+                # Индексы для курсорной пагинации, ленты изменений и статистики механиков
+                with db.engine.connect() as conn:
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders (created_at, id)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_updated_at ON orders (updated_at)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_mechanic_id_status ON orders (mechanic_id, status)"))
+                    conn.commit()
+
+                # Перенос selected_parts старых заказов в order_items
+                migrated = backfill_order_items()
+                if migrated:
+                    print(f"✅ Перенесены позиции {migrated} заказов в order_items")
     except Exception as e:
         print(f"⚠️  Ошибка миграции (не критично): {e}")
 
 # Выполняем миграции при старте
 run_migrations()
 
+# Досылаем уведомления и чеки, оставшиеся в очередях с прошлого запуска
+try:
+    resume_pending_notifications(app)
+    resume_print_queue(app)
+except Exception as e:
+    print(f"⚠️  Фоновые очереди недоступны: {e}")
+
 # Функция для определения языка пользователя
 def get_locale():
     """Определить текущий язык интерфейса"""
@@ -157,7 +241,7 @@ def inject_category_translator():
         if lang is None:
             lang = g.locale if hasattr(g, 'locale') else 'ru'
         
-        category = Category.query.filter_by(name=category_name).first()
+        category = get_catalog_snapshot().categories_by_name.get(category_name)
         if category:
             return category.get_name(lang)
         return category_name
@@ -338,29 +422,27 @@ def apply_auto_translations(part, part_name_ru):
 
 # Функции для работы с Telegram
 def send_telegram_message(chat_id, text):
-    """Отправка сообщения в Telegram"""
+    """
+    Поставить сообщение в Telegram в очередь отправки
+    
+    Запись попадает в notification_outbox в текущей транзакции и уходит
+    после commit фоновым обработчиком (notification_outbox.py), поэтому
+    вызывать нужно до db.session.commit().
+    """
     if not TELEGRAM_BOT_TOKEN:
         print("⚠️ Telegram bot token не настроен")
         return False
     
-    url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage'
-    data = {
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': 'HTML'
-    }
-    try:
-        response = requests.post(url, data=data)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"❌ Ошибка отправки в Telegram: {e}")
-        return False
+    enqueue_telegram_message(chat_id, text)
+    return True
 
 def notify_admin_new_order(order):
     """Уведомление администратору о новом заказе"""
     if not TELEGRAM_ADMIN_CHAT_ID:
         return
     
+    snapshot = get_catalog_snapshot()
+
     # Формируем список деталей с количеством на русском языке
     parts_list = []
     for part in sort_selected_parts_by_sort_order(order.selected_parts or [], order.category):
@@ -371,7 +453,7 @@ def notify_admin_new_order(order):
             
             # Если есть part_id, получаем название на русском
             if part_id:
-                part_obj = Part.query.get(part_id)
+                part_obj = snapshot.parts_by_id.get(_coerce_part_id(part_id))
                 name = part_obj.get_name('ru') if part_obj else part.get('name', '')
             else:
                 name = part.get('name', '')
@@ -393,7 +475,7 @@ def notify_admin_new_order(order):
     
     # Получаем переведенное название категории на русском
     category_name = order.category
-    category_obj = Category.query.filter_by(name=order.category).first()
+    category_obj = snapshot.categories_by_name.get(order.category)
     if category_obj:
         category_name = category_obj.get_name('ru')
     
@@ -427,12 +509,7 @@ def notify_mechanic_order_ready(order):
     if not telegram_id:
         return
     
-    category_obj = Category.query.filter(
-        (Category.name == order.category) |
-        (Category.name_ru == order.category) |
-        (Category.name_en == order.category) |
-        (Category.name_he == order.category)
-    ).first()
+    category_obj = get_catalog_snapshot().resolve_category(order.category)
     category_name = category_obj.get_name('he') if category_obj else order.category
     
     message = f"""✅ <b>הזמנה מס׳ {order.id} מוכנה!</b>
@@ -449,11 +526,12 @@ def notify_admin_part_added(order, part_entry):
         return
     quantity = part_entry.get('quantity', 1)
     name = part_entry.get('name', '')
+    snapshot = get_catalog_snapshot()
     if 'part_id' in part_entry and part_entry.get('part_id'):
-        part_obj = Part.query.get(part_entry.get('part_id'))
+        part_obj = snapshot.parts_by_id.get(_coerce_part_id(part_entry.get('part_id')))
         if part_obj:
             name = part_obj.get_name('ru')
-    category_obj = Category.query.filter_by(name=order.category).first()
+    category_obj = snapshot.categories_by_name.get(order.category)
     category_name = category_obj.get_name('ru') if category_obj else order.category
     qty_text = f" (x{quantity})" if quantity and quantity > 1 else ''
     message = f"""➕ Добавлена запчасть к заказу №{order.id}
@@ -468,7 +546,7 @@ def notify_admin_order_cancelled(order):
     if not TELEGRAM_ADMIN_CHAT_ID:
         return
     
-    category_obj = Category.query.filter_by(name=order.category).first()
+    category_obj = get_catalog_snapshot().categories_by_name.get(order.category)
     category_name = category_obj.get_name('ru') if category_obj else order.category
     
     message = f"""❌ <b>Заказ №{order.id} ОТМЕНЕН</b>
@@ -496,95 +574,20 @@ def validate_plate_number(plate_number):
     
     return True
 
-def sort_selected_parts_by_sort_order(parts, category, cache=None):
+def sort_selected_parts_by_sort_order(parts, category):
+    """Отсортировать выбранные детали по sort_order из справочника (без запросов к БД)"""
     if not parts:
         return []
 
-    cache = cache if cache is not None else {}
-    category_obj = Category.query.filter(
-        (Category.name == category) |
-        (Category.name_ru == category) |
-        (Category.name_en == category) |
-        (Category.name_he == category)
-    ).first()
-    raw_category = category_obj.name if category_obj else category
-    mapping = cache.get(raw_category)
-
-    if mapping is None:
-        parts_in_category = Part.query.filter_by(category=raw_category).all()
-        id_to_order = {p.id: (p.sort_order if p.sort_order is not None else 0) for p in parts_in_category}
-        name_to_order = {}
-        for p in parts_in_category:
-            order_val = p.sort_order if p.sort_order is not None else 0
-            for nm in (p.name_ru, p.name_en, p.name_he, p.name):
-                if nm:
-                    name_to_order[nm] = order_val
-        max_order = max([o for o in id_to_order.values()] + [0])
-        mapping = (id_to_order, name_to_order, max_order)
-        cache[raw_category] = mapping
-
-    id_to_order, name_to_order, max_order = mapping
-
-    def sort_key(item, idx):
-        if isinstance(item, dict):
-            pid = item.get('part_id')
-            if isinstance(pid, str) and pid.isdigit():
-                pid = int(pid)
-            nm = item.get('name')
-            if pid in id_to_order:
-                return (id_to_order[pid], idx)
-            if nm in name_to_order:
-                return (name_to_order[nm], idx)
-            return (max_order + 1, idx)
-        if item in name_to_order:
-            return (name_to_order[item], idx)
-        return (max_order + 1, idx)
-
-    return [x for _, x in sorted([(sort_key(it, i), it) for i, it in enumerate(parts)], key=lambda t: t[0])]
-
-def _send_to_thermal_printer(text):
-    backend = (os.getenv('THERMAL_PRINT_BACKEND', 'stdout') or 'stdout').strip().lower()
-    encoding = (os.getenv('THERMAL_PRINTER_ENCODING', 'utf-8') or 'utf-8').strip()
-    payload = (text or '').encode(encoding, errors='replace')
-
-    if backend in {'stdout', 'console'}:
-        print(text)
-        return
+    snapshot = get_catalog_snapshot()
+    raw_category = snapshot.raw_category_name(category)
+    return sort_by_sort_map(parts, snapshot.get_sort_map(raw_category))
 
-    if backend == 'cups':
-        lp_path = shutil.which('lp')
-        if not lp_path:
-            raise RuntimeError('THERMAL_PRINT_BACKEND=cups, но lp не найден')
-
-        printer_name = (os.getenv('THERMAL_PRINTER_NAME') or '').strip()
-        cmd = [lp_path]
-        if printer_name:
-            cmd += ['-d', printer_name]
-        cmd += ['-o', 'raw']
-
-        proc = subprocess.run(cmd, input=payload, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if proc.returncode != 0:
-            err = proc.stderr.decode('utf-8', errors='replace').strip() or 'unknown error'
-            raise RuntimeError(f'Ошибка печати (cups): {err}')
-        return
-
-    if backend == 'tcp':
-        host = (os.getenv('THERMAL_PRINTER_HOST') or '').strip()
-        port_raw = (os.getenv('THERMAL_PRINTER_PORT') or '9100').strip()
-        port = int(port_raw) if port_raw.isdigit() else 9100
-        if not host:
-            raise RuntimeError('THERMAL_PRINT_BACKEND=tcp, но THERMAL_PRINTER_HOST не задан')
-
-        with socket.create_connection((host, port), timeout=10) as sock:
-            sock.sendall(payload)
-        return
-
-    raise RuntimeError(f'Неизвестный THERMAL_PRINT_BACKEND={backend}')
-
-def print_receipt(order):
-    """Печать чека на иврите"""
+def render_receipt(order):
+    """Сформировать текст чека на иврите"""
+    snapshot = get_catalog_snapshot()
     category_name = order.category
-    category_obj = Category.query.filter_by(name=order.category).first()
+    category_obj = snapshot.categories_by_name.get(order.category)
     if category_obj:
         category_name = category_obj.get_name('he') or category_obj.get_name('ru') or order.category
 
@@ -630,7 +633,7 @@ def print_receipt(order):
             quantity = part.get('quantity', 1)
 
             if part_id:
-                part_obj = Part.query.get(part_id)
+                part_obj = snapshot.parts_by_id.get(_coerce_part_id(part_id))
                 name = (part_obj.get_name('he') or part_obj.get_name('ru')) if part_obj else (part.get('name', '') or '')
             else:
                 name = (part.get('name', '') or '')
@@ -657,9 +660,20 @@ def print_receipt(order):
         sep,
     ]
 
-    receipt = '\n'.join(lines) + '\n'
-    _send_to_thermal_printer(receipt)
-    return receipt
+    return '\n'.join(lines) + '\n'
+
+def print_receipt(order, source='manual'):
+    """
+    Поставить чек заказа в очередь печати (print_queue.py)
+    
+    Задание добавляется в текущую транзакцию - вызывать до db.session.commit().
+    
+    Returns:
+        tuple: (текст чека, задание PrintJob)
+    """
+    receipt = render_receipt(order)
+    job = enqueue_print_job(order.id, receipt, source=source)
+    return receipt, job
 
 # Маршруты приложения
 
@@ -783,6 +797,7 @@ def mechanic_orders():
     """Список заказов механика"""
     status = request.args.get('status', 'все')
     plate_number = request.args.get('plate_number', '')
+    changes_watermark = current_watermark()
     
     query = Order.query.filter_by(mechanic_id=current_user.id)
     
@@ -790,84 +805,34 @@ def mechanic_orders():
         query = query.filter_by(status=status)
     
     if plate_number:
-        query = query.filter(Order.plate_number.ilike(f'%{plate_number}%'))
+        query = apply_plate_filter(query, plate_number)
     
     orders = query.order_by(Order.created_at.desc()).all()
     lang = g.locale if hasattr(g, 'locale') and g.locale else 'ru'
-    sort_cache = {}
-    no_additives_aliases_cf = {
-        'no_additives',
-        'без присадок',
-        'без добавок',
-        'no additives',
-        'ללא תוספים',
+    # Названия запчастей из снимка каталога, без запроса на каждую страницу
+    catalog_parts = get_catalog_snapshot().parts_by_id
+    parts_by_id = {
+        part_id: catalog_parts[part_id].get_name(lang)
+        for part_id in collect_part_ids(orders) if part_id in catalog_parts
     }
-
-    part_ids = set()
-    for order in orders:
-        for part in (order.selected_parts or []):
-            if isinstance(part, dict):
-                part_id = part.get('part_id')
-                if isinstance(part_id, int):
-                    part_ids.add(part_id)
-                elif isinstance(part_id, str) and part_id.isdigit():
-                    part_ids.add(int(part_id))
-
-    parts_by_id = {}
-    if part_ids:
-        for part in Part.query.filter(Part.id.in_(part_ids)).all():
-            parts_by_id[part.id] = part.get_name(lang)
+    no_additives_label = gettext('no_additives')
 
     for order in orders:
-        setattr(order, 'selected_parts_sorted', sort_selected_parts_by_sort_order(order.selected_parts or [], order.category, cache=sort_cache))
-
-        localized_parts = []
-        for part in (order.selected_parts or []):
-            if isinstance(part, dict):
-                part_name = (part.get('name') or '').strip()
-                is_no_additives_label = (
-                    bool(part.get('is_label')) and not part.get('part_id')
-                ) or (part_name == 'no_additives') or (part_name.casefold() in no_additives_aliases_cf)
-
-                if is_no_additives_label:
-                    localized_part = dict(part)
-                    localized_part['name'] = gettext('no_additives')
-                    localized_parts.append(localized_part)
-                    continue
-
-                part_id = part.get('part_id')
-                part_id_int = None
-                if isinstance(part_id, int):
-                    part_id_int = part_id
-                elif isinstance(part_id, str) and part_id.isdigit():
-                    part_id_int = int(part_id)
-
-                localized_part = dict(part)
-                translated_name = parts_by_id.get(part_id_int) if part_id_int else None
-                if translated_name:
-                    localized_part['name'] = translated_name
-                localized_parts.append(localized_part)
-            else:
-                part_text = (part or '').strip() if isinstance(part, str) else part
-                if isinstance(part_text, str) and (part_text == 'no_additives' or part_text.casefold() in no_additives_aliases_cf):
-                    localized_parts.append(gettext('no_additives'))
-                else:
-                    localized_parts.append(part)
-
-        setattr(order, 'selected_parts_localized', sort_selected_parts_by_sort_order(localized_parts, order.category, cache=sort_cache))
+        setattr(order, 'selected_parts_sorted', sort_selected_parts_by_sort_order(order.selected_parts or [], order.category))
+        localized_parts = localize_selected_parts(order.selected_parts, parts_by_id, no_additives_label)
+        setattr(order, 'selected_parts_localized', sort_selected_parts_by_sort_order(localized_parts, order.category))
 
     # Рассчитываем время готовности для активных заказов
-    processing_time_minutes = int(os.getenv('ORDER_PROCESSING_TIME_MINUTES', '10'))
     current_time = datetime.utcnow()
     tz = ZoneInfo(app.config['APP_TIMEZONE'])
 
-    # Получаем все активные заказы механика для расчета очереди
-    active_orders = [o for o in orders if o.status in ['новый', 'в работе', 'в ожидании запчасти']]
-    active_orders.sort(key=lambda x: x.created_at)
+    # Накопленное время по очереди активных заказов механика (модель ETA)
+    estimates, _ = queue_estimates(get_order_queue(), get_eta_model(), mechanic_id=current_user.id)
 
-    # Каждый заказ в очереди = полные 10 минут
-    for position, order in enumerate(active_orders, start=1):
-        cumulative_time = position * processing_time_minutes
+    for order in orders:
+        if order.id not in estimates:
+            continue
+        cumulative_time = round(estimates[order.id])
 
         # Расчетное время готовности
         estimated_ready_at = current_time + timedelta(minutes=cumulative_time)
@@ -877,7 +842,7 @@ def mechanic_orders():
         setattr(order, 'estimated_minutes', cumulative_time)
         setattr(order, 'estimated_ready_time', ready_at_local.strftime('%H:%M'))
 
-    return render_template('mechanic/orders.html', orders=orders)
+    return render_template('mechanic/orders.html', orders=orders, changes_watermark=changes_watermark)
 
 
 @app.route('/mechanic/orders/<int:order_id>/cancel', methods=['POST'])
@@ -898,10 +863,11 @@ def mechanic_cancel_order(order_id):
     
     try:
         order.status = 'отменено'
-        db.session.commit()
+        record_order_event(order, 'order_cancelled', 'новый', 'отменено')
         
-        # Уведомление администратору
+        # Уведомление администратору (в очередь, в той же транзакции)
         notify_admin_order_cancelled(order)
+        db.session.commit()
         
         flash(_l('Заказ #%(id)s успешно отменен', id=order.id), 'success')
     except Exception as e:
@@ -966,8 +932,15 @@ def public_orders():
     if page_size not in allowed_page_sizes:
         page_size = 25
 
+    changes_watermark = current_watermark()
+
+    # Курсорный режим (?cursor=...) - keyset-пагинация без OFFSET и COUNT
+    cursor_mode = 'cursor' in request.args
+    cursor = request.args.get('cursor', '').strip()
+
     base_args = request.args.to_dict(flat=True)
     base_args.pop('page', None)
+    base_args.pop('cursor', None)
     base_args['page_size'] = str(page_size)
     base_query = urlencode(base_args)
 
@@ -980,99 +953,65 @@ def public_orders():
         query = query.filter_by(status=status)
 
     if plate_number:
-        query = query.filter(Order.plate_number.ilike(f'%{plate_number}%'))
+        query = apply_plate_filter(query, plate_number)
 
     if mechanic:
         query = query.filter(Order.mechanic_name.ilike(f'%{mechanic}%'))
 
-    total_orders = query.count()
-    total_pages = max(1, (total_orders + page_size - 1) // page_size) if page_size > 0 else 1
-    if page > total_pages:
-        page = total_pages
+    next_cursor = None
+    prev_cursor = None
+    if cursor_mode:
+        try:
+            page_data = paginate_by_cursor(query, cursor, page_size)
+        except InvalidCursor:
+            page_data = paginate_by_cursor(query, '', page_size)
+        orders = page_data['orders']
+        next_cursor = page_data['next_cursor']
+        prev_cursor = page_data['prev_cursor']
+
+        has_filters = bool(order_id.isdigit() or (status and status != 'все') or plate_number or mechanic)
+        total_orders = None if has_filters else estimate_orders_count()
+        total_pages = None
+    else:
+        total_orders = query.count()
+        total_pages = max(1, (total_orders + page_size - 1) // page_size) if page_size > 0 else 1
+        if page > total_pages:
+            page = total_pages
 
-    orders = (
-        query.order_by(Order.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+        orders = (
+            query.order_by(Order.created_at.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+            .all()
+        )
     lang = g.locale if hasattr(g, 'locale') and g.locale else 'ru'
-    sort_cache = {}
-    no_additives_aliases_cf = {
-        'no_additives',
-        'без присадок',
-        'без добавок',
-        'no additives',
-        'ללא תוספים',
+    # Названия запчастей из снимка каталога, без запроса на каждую страницу
+    catalog_parts = get_catalog_snapshot().parts_by_id
+    parts_by_id = {
+        part_id: catalog_parts[part_id].get_name(lang)
+        for part_id in collect_part_ids(orders) if part_id in catalog_parts
     }
+    no_additives_label = gettext('no_additives')
 
-    part_ids = set()
     for order in orders:
-        for part in (order.selected_parts or []):
-            if isinstance(part, dict):
-                part_id = part.get('part_id')
-                if isinstance(part_id, int):
-                    part_ids.add(part_id)
-                elif isinstance(part_id, str) and part_id.isdigit():
-                    part_ids.add(int(part_id))
-
-    parts_by_id = {}
-    if part_ids:
-        for part in Part.query.filter(Part.id.in_(part_ids)).all():
-            parts_by_id[part.id] = part.get_name(lang)
-
-    for order in orders:
-        localized_parts = []
-        for part in (order.selected_parts or []):
-            if isinstance(part, dict):
-                part_name = (part.get('name') or '').strip()
-                is_no_additives_label = (
-                    bool(part.get('is_label')) and not part.get('part_id')
-                ) or (part_name.casefold() in no_additives_aliases_cf)
-
-                if is_no_additives_label or part_name == 'no_additives':
-                    localized_part = dict(part)
-                    localized_part['name'] = gettext('no_additives')
-                    localized_parts.append(localized_part)
-                    continue
-
-                part_id = part.get('part_id')
-                part_id_int = None
-                if isinstance(part_id, int):
-                    part_id_int = part_id
-                elif isinstance(part_id, str) and part_id.isdigit():
-                    part_id_int = int(part_id)
-
-                localized_part = dict(part)
-                translated_name = parts_by_id.get(part_id_int) if part_id_int else None
-                if translated_name:
-                    localized_part['name'] = translated_name
-                localized_parts.append(localized_part)
-            else:
-                part_text = (part or '').strip() if isinstance(part, str) else part
-                if isinstance(part_text, str) and (part_text == 'no_additives' or part_text.casefold() in no_additives_aliases_cf):
-                    localized_parts.append(gettext('no_additives'))
-                else:
-                    localized_parts.append(part)
-        setattr(order, 'selected_parts_localized', sort_selected_parts_by_sort_order(localized_parts, order.category, cache=sort_cache))
+        localized_parts = localize_selected_parts(order.selected_parts, parts_by_id, no_additives_label)
+        setattr(order, 'selected_parts_localized', sort_selected_parts_by_sort_order(localized_parts, order.category))
 
     # Рассчитываем время готовности для активных заказов
-    processing_time_minutes = int(os.getenv('ORDER_PROCESSING_TIME_MINUTES', '10'))
     current_time = datetime.utcnow()
     tz = ZoneInfo(app.config['APP_TIMEZONE'])
 
-    # Получаем все активные заказы для расчета очереди (не только на текущей странице)
-    all_active_orders = Order.query.filter(
-        Order.status.in_(['новый', 'в работе', 'в ожидании запчасти'])
-    ).order_by(Order.created_at.asc()).all()
+    # Накопленное время по общей очереди (модель ETA, кэшируется до изменения очереди)
+    estimates, _ = queue_estimates(get_order_queue(), get_eta_model())
 
-    # Каждый заказ в очереди = полные 10 минут
     order_times = {}
-    for position, active_order in enumerate(all_active_orders, start=1):
-        cumulative_time = position * processing_time_minutes
+    for order in orders:
+        if order.id not in estimates:
+            continue
+        cumulative_time = round(estimates[order.id])
         estimated_ready_at = current_time + timedelta(minutes=cumulative_time)
 
-        order_times[active_order.id] = {
+        order_times[order.id] = {
             'estimated_minutes': cumulative_time,
             'estimated_ready_at': estimated_ready_at
         }
@@ -1094,20 +1033,28 @@ def public_orders():
         page=page,
         page_size=page_size,
         total_pages=total_pages,
-        base_query=base_query
+        base_query=base_query,
+        cursor_mode=cursor_mode,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        changes_watermark=changes_watermark
     )
 
 
-def calculate_estimated_ready_time():
+def calculate_estimated_ready_time(category=None, selected_parts=None):
     """
     Рассчитывает ожидаемое время готовности нового заказа на основе очереди активных заказов.
 
     Логика:
-    - Базовое время обработки одного заказа: 10 минут (настраивается через ORDER_PROCESSING_TIME_MINUTES)
+    - Время обработки каждого заказа оценивает модель ETA (eta_model.py) по категории
+      и числу позиций на истории готовых заказов; без истории - ORDER_PROCESSING_TIME_MINUTES
     - Учитываются заказы со статусами 'новый', 'в работе' и 'в ожидании запчасти'
-    - Каждый заказ в очереди = полные 10 минут (независимо от прошедшего времени)
     - Новый заказ добавляется в конец очереди
 
+    Args:
+        category: категория нового заказа
+        selected_parts: позиции нового заказа
+
     Returns:
         dict: {
             'estimated_minutes': int,  # Время ожидания в минутах
@@ -1116,19 +1063,17 @@ def calculate_estimated_ready_time():
             'active_orders_count': int  # Количество активных заказов
         }
     """
-    # Базовое время обработки одного заказа (в минутах)
-    processing_time_minutes = int(os.getenv('ORDER_PROCESSING_TIME_MINUTES', '10'))
+    queue = get_order_queue()
+    model = get_eta_model()
 
-    # Получаем все активные заказы (новый + в работе + в ожидании запчасти)
-    active_orders = Order.query.filter(
-        Order.status.in_(['новый', 'в работе', 'в ожидании запчасти'])
-    ).order_by(Order.created_at.asc()).all()
+    # Количество активных заказов (новый + в работе + в ожидании запчасти)
+    active_orders_count = len(queue)
 
     current_time = datetime.utcnow()
 
-    # Каждый заказ в очереди = полные 10 минут
-    # Новый заказ добавляется в конец: (количество активных + 1) * 10
-    total_minutes = (len(active_orders) + 1) * processing_time_minutes
+    # Новый заказ добавляется в конец: время всей очереди + оценка самого заказа
+    _, queue_minutes = queue_estimates(queue, model)
+    total_minutes = round(queue_minutes + estimate_order_minutes(model, category, selected_parts))
 
     # Рассчитываем точное время готовности
     estimated_ready_at = current_time + timedelta(minutes=total_minutes)
@@ -1136,8 +1081,8 @@ def calculate_estimated_ready_time():
     return {
         'estimated_minutes': total_minutes,
         'estimated_ready_at': estimated_ready_at,
-        'queue_position': len(active_orders) + 1,
-        'active_orders_count': len(active_orders)
+        'queue_position': active_orders_count + 1,
+        'active_orders_count': active_orders_count
     }
 
 
@@ -1186,58 +1131,7 @@ def submit_order():
         
         # Нормализация формата selected_parts
         # Поддерживаем как старый формат (массив строк), так и новый (массив объектов с количеством и part_id)
-        selected_parts = data['selected_parts']
-        normalized_parts = []
-        no_additives_aliases_cf = {
-            'no_additives',
-            'без присадок',
-            'без добавок',
-            'no additives',
-            'ללא תוספים',
-        }
-        
-        for part in selected_parts:
-            if isinstance(part, str):
-                # Старый формат: просто строка (для обратной совместимости)
-                part_name = part.strip()
-                if part_name == 'no_additives' or part_name.casefold() in no_additives_aliases_cf:
-                    normalized_parts.append({
-                        'name': 'no_additives',
-                        'quantity': 1,
-                        'is_label': True
-                    })
-                else:
-                    normalized_parts.append({
-                        'name': part,
-                        'quantity': 1
-                    })
-            elif isinstance(part, dict):
-                # Новый формат: объект с name, quantity и опционально part_id
-                part_name = (part.get('name', '') or '').strip()
-                part_id = part.get('part_id')
-                is_label = bool(part.get('is_label')) or (not part_id and (part_name == 'no_additives' or part_name.casefold() in no_additives_aliases_cf))
-                if is_label:
-                    normalized_parts.append({
-                        'name': 'no_additives',
-                        'quantity': int(part.get('quantity', 1)),
-                        'is_label': True
-                    })
-                    continue
-
-                part_entry = {
-                    'name': part.get('name', ''),
-                    'quantity': int(part.get('quantity', 1))
-                }
-                
-                # Если передан part_id, сохраняем его для последующего перевода
-                if 'part_id' in part:
-                    part_entry['part_id'] = part['part_id']
-                
-                # Сохраняем is_original для каждой детали, если передано
-                if 'is_original' in part:
-                    part_entry['is_original'] = bool(part['is_original'])
-                
-                normalized_parts.append(part_entry)
+        normalized_parts = normalize_selected_parts(data['selected_parts'])
         normalized_parts = sort_selected_parts_by_sort_order(normalized_parts, data['category'])
 
         plate_number_normalized = data['plate_number'].strip().upper()
@@ -1276,7 +1170,7 @@ def submit_order():
                 }), 200
 
         # Рассчитываем ожидаемое время готовности перед созданием заказа
-        ready_time_info = calculate_estimated_ready_time()
+        ready_time_info = calculate_estimated_ready_time(data['category'], normalized_parts)
 
         # Создание нового заказа
         order = Order(
@@ -1294,10 +1188,13 @@ def submit_order():
         )
         
         db.session.add(order)
-        db.session.commit()
+        publish_order_event('order_created', order)
+        record_order_event(order, 'order_created', None, order.status)
         
-        # Отправка уведомления администратору
+        # Уведомление администратору (в очередь, в той же транзакции)
         notify_admin_new_order(order)
+        db.session.commit()
+        count_order_created()
 
         # Форматируем время готовности для ответа
         tz = ZoneInfo(app.config['APP_TIMEZONE'])
@@ -1331,20 +1228,26 @@ def get_orders_queue():
         JSON с информацией о текущей очереди и времени ожидания
     """
     try:
-        processing_time_minutes = int(os.getenv('ORDER_PROCESSING_TIME_MINUTES', '10'))
-
-        # Получаем все активные заказы
-        active_orders = Order.query.filter(
-            Order.status.in_(['новый', 'в работе', 'в ожидании запчасти'])
-        ).order_by(Order.created_at.asc()).all()
+        # Активные заказы в порядке очереди; из БД берём только нужные колонки
+        queue = get_order_queue()
+        model = get_eta_model()
+        estimates, queue_minutes = queue_estimates(queue, model)
+        queue_ids = queue.order_ids()
+        rows = {}
+        if queue_ids:
+            rows = {row.id: row for row in db.session.query(
+                Order.id, Order.mechanic_name, Order.plate_number, Order.status, Order.created_at
+            ).filter(Order.id.in_(queue_ids))}
+        active_orders = [rows[order_id] for order_id in queue_ids if order_id in rows]
 
         current_time = datetime.utcnow()
         tz = ZoneInfo(app.config['APP_TIMEZONE'])
         queue_info = []
+        previous_estimate = 0.0
 
-        # Каждый заказ в очереди = полные 10 минут
         for position, order in enumerate(active_orders, start=1):
-            cumulative_time = position * processing_time_minutes
+            order_estimate = estimates.get(order.id, previous_estimate)
+            cumulative_time = round(order_estimate)
 
             # Расчетное время готовности
             estimated_ready_at = current_time + timedelta(minutes=cumulative_time)
@@ -1357,19 +1260,24 @@ def get_orders_queue():
                 'status': order.status,
                 'created_at': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'position': position,
+                # Оценка модели для самого заказа и накопленная с учётом очереди
+                'processing_minutes': round(order_estimate - previous_estimate),
                 'estimated_minutes': cumulative_time,
                 'estimated_ready_at': ready_at_local.strftime('%H:%M')
             })
+            previous_estimate = order_estimate
 
         # Время ожидания для нового заказа
-        new_order_wait_time = (len(active_orders) + 1) * processing_time_minutes
+        processing_time_minutes = estimate_order_minutes(model, None, None)
+        new_order_wait_time = round(queue_minutes + processing_time_minutes)
         new_order_ready_at = current_time + timedelta(minutes=new_order_wait_time)
         new_order_ready_local = new_order_ready_at.replace(tzinfo=timezone.utc).astimezone(tz)
 
         return jsonify({
             'success': True,
             'current_time': current_time.replace(tzinfo=timezone.utc).astimezone(tz).strftime('%Y-%m-%d %H:%M:%S'),
-            'processing_time_minutes': processing_time_minutes,
+            # Оценка модели для нового заказа (без категории и позиций)
+            'processing_time_minutes': round(processing_time_minutes),
             'active_orders_count': len(active_orders),
             'queue': queue_info,
             'new_order_estimate': {
@@ -1420,16 +1328,80 @@ def admin_logout():
     session.pop('admin_logged_in', None)
     return redirect(url_for('admin_login'))
 
+def filter_orders_query(args):
+    """
+    Запрос заказов с фильтрами списка заказов (status, plate_number, mechanic,
+    created_from, created_to)
+    
+    Returns:
+        tuple: (запрос Order.query, задан ли хотя бы один фильтр)
+    """
+    status = args.get('status')
+    plate_number = args.get('plate_number')
+    mechanic = args.get('mechanic')
+    created_from_raw = args.get('created_from')
+    created_to_raw = args.get('created_to')
+    
+    query = Order.query
+    
+    if status and status != 'все':
+        query = query.filter_by(status=status)
+    
+    if plate_number:
+        query = apply_plate_filter(query, plate_number)
+    
+    if mechanic:
+        query = query.filter(Order.mechanic_name.ilike(f'%{mechanic}%'))
+
+    created_from = None
+    created_to = None
+    if created_from_raw:
+        created_from_raw = created_from_raw.strip()
+        try:
+            created_from = datetime.strptime(created_from_raw, '%Y-%m-%d') if len(created_from_raw) == 10 else datetime.fromisoformat(created_from_raw)
+        except (TypeError, ValueError):
+            created_from = None
+    if created_to_raw:
+        created_to_raw = created_to_raw.strip()
+        try:
+            created_to = datetime.strptime(created_to_raw, '%Y-%m-%d') if len(created_to_raw) == 10 else datetime.fromisoformat(created_to_raw)
+        except (TypeError, ValueError):
+            created_to = None
+
+    if created_from and created_to and created_from > created_to:
+        created_from, created_to = created_to, created_from
+
+    if created_from:
+        query = query.filter(Order.created_at >= created_from)
+
+    if created_to:
+        query = query.filter(Order.created_at < (created_to + timedelta(days=1)))
+    
+    has_filters = any([
+        status and status != 'все', plate_number, mechanic, created_from, created_to
+    ])
+    return query, has_filters
+
+
 @app.route('/api/orders')
 def get_orders():
-    """API для получения списка заказов с серверной пагинацией"""
+    """
+    API для получения списка заказов с серверной пагинацией
+
+    Два режима:
+    - page / page_size - постраничный (для админ-панели), с точным total и статистикой
+    - cursor / page_size - курсорный (keyset по created_at, id); пустой cursor
+      означает первую страницу. Точный total и статистика считаются только
+      при with_total=true, иначе возвращается оценка (если БД её даёт)
+    """
     try:
+        # Последний id заказа и watermark для ленты изменений фиксируем до чтения
+        # заказов: созданные раньше заказы клиент не будет считать новыми
+        latest_order_id = db.session.query(db.func.max(Order.id)).scalar() or 0
+        watermark = current_watermark()
+
         # Фильтрация
-        status = request.args.get('status')
-        plate_number = request.args.get('plate_number')
-        mechanic = request.args.get('mechanic')
-        created_from_raw = request.args.get('created_from')
-        created_to_raw = request.args.get('created_to')
+        query, has_filters = filter_orders_query(request.args)
         lang = request.args.get('lang')
         
         # Пагинация
@@ -1449,66 +1421,62 @@ def get_orders():
         # Ограничиваем размер страницы
         if page_size not in {15, 25, 50, 100}:
             page_size = 25
-        
-        query = Order.query
-        
-        if status and status != 'все':
-            query = query.filter_by(status=status)
-        
-        if plate_number:
-            query = query.filter(Order.plate_number.ilike(f'%{plate_number}%'))
-        
-        if mechanic:
-            query = query.filter(Order.mechanic_name.ilike(f'%{mechanic}%'))
 
-        created_from = None
-        created_to = None
-        if created_from_raw:
-            created_from_raw = created_from_raw.strip()
-            try:
-                created_from = datetime.strptime(created_from_raw, '%Y-%m-%d') if len(created_from_raw) == 10 else datetime.fromisoformat(created_from_raw)
-            except (TypeError, ValueError):
-                created_from = None
-        if created_to_raw:
-            created_to_raw = created_to_raw.strip()
-            try:
-                created_to = datetime.strptime(created_to_raw, '%Y-%m-%d') if len(created_to_raw) == 10 else datetime.fromisoformat(created_to_raw)
-            except (TypeError, ValueError):
-                created_to = None
+        def collect_stats():
+            # Статистика по статусам (для текущего фильтра) одним запросом;
+            # без фильтров - из короткого кэша воркера
+            if has_filters:
+                return compute_order_stats(query)
+            return get_unfiltered_order_stats()
 
-        if created_from and created_to and created_from > created_to:
-            created_from, created_to = created_to, created_from
+        if 'cursor' in request.args:
+            # Курсорный режим: без OFFSET и без обязательного COUNT
+            try:
+                page_data = paginate_by_cursor(query, request.args.get('cursor', '').strip(), page_size)
+            except InvalidCursor:
+                return jsonify({'error': 'Неверный курсор'}), 400
+
+            orders = page_data['orders']
+            stats = None
+            total_is_estimate = False
+            if request.args.get('with_total', 'false').lower() == 'true':
+                stats = collect_stats()
+                total_orders = stats['total']
+            else:
+                total_orders = None if has_filters else estimate_orders_count()
+                total_is_estimate = total_orders is not None
 
-        if created_from:
-            query = query.filter(Order.created_at >= created_from)
+            pagination = {
+                'mode': 'cursor',
+                'page_size': page_size,
+                'next_cursor': page_data['next_cursor'],
+                'prev_cursor': page_data['prev_cursor'],
+                'total_orders': total_orders,
+                'total_is_estimate': total_is_estimate
+            }
+        else:
+            # Подсчёт общего количества вместе со статистикой
+            stats = collect_stats()
+            total_orders = stats['total']
+            total_pages = max(1, (total_orders + page_size - 1) // page_size)
+            
+            if page > total_pages:
+                page = total_pages
+            
+            # Пагинированный запрос
+            orders = (
+                query.order_by(Order.created_at.desc())
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+                .all()
+            )
 
-        if created_to:
-            query = query.filter(Order.created_at < (created_to + timedelta(days=1)))
-        
-        # Подсчёт общего количества
-        total_orders = query.count()
-        total_pages = max(1, (total_orders + page_size - 1) // page_size)
-        
-        if page > total_pages:
-            page = total_pages
-        
-        # Статистика по статусам (для текущего фильтра)
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        stats = {
-            'total': total_orders,
-            'new': query.filter(Order.status == 'новый').count(),
-            'in_progress': query.filter(Order.status == 'в работе').count(),
-            'ready': query.filter(Order.status == 'готово').count(),
-            'today': query.filter(Order.created_at >= today_start).count()
-        }
-        
-        # Пагинированный запрос
-        orders = (
-            query.order_by(Order.created_at.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-            .all()
-        )
+            pagination = {
+                'page': page,
+                'page_size': page_size,
+                'total_orders': total_orders,
+                'total_pages': total_pages
+            }
         
         if not lang:
             lang = g.locale if hasattr(g, 'locale') else 'ru'
@@ -1517,14 +1485,11 @@ def get_orders():
             lang = 'ru'
 
         resp = jsonify({
-            'orders': [order.to_dict(lang=lang) for order in orders],
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total_orders': total_orders,
-                'total_pages': total_pages
-            },
-            'stats': stats
+            'orders': serialize_orders(orders, lang=lang, catalog=get_catalog_snapshot()),
+            'pagination': pagination,
+            'stats': stats,
+            'watermark': watermark,
+            'latest_order_id': latest_order_id
         })
         resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         resp.headers['Pragma'] = 'no-cache'
@@ -1546,6 +1511,172 @@ def get_orders():
             'details': 'Проверьте логи сервера для подробностей'
         }), 500
 
+
+@app.route('/api/admin/orders/export')
+@admin_required
+def export_orders():
+    """
+    Выгрузка заказов для бухгалтерии (потоком, без загрузки всех заказов в память)
+    
+    Query:
+        format: csv (по умолчанию) или jsonl
+        lang: язык названий категорий и запчастей (по умолчанию ru)
+        status, plate_number, mechanic, created_from, created_to - как в /api/orders
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Формат выгрузки: {', '.join(EXPORT_FORMATS)}"}), 400
+    lang = request.args.get('lang', 'ru')
+    
+    try:
+        query, _ = filter_orders_query(request.args)
+        rows = generate_order_export(query, export_format, lang=lang, catalog=get_catalog_snapshot())
+    except Exception as e:
+        print(f"❌ Ошибка выгрузки заказов: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    filename = f"orders-{datetime.now().strftime('%Y%m%d-%H%M')}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    resp = Response(stream_with_context(rows), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Не буферизовать ответ в nginx, чтобы строки уходили клиенту сразу
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+@app.route('/api/admin/orders/<int:order_id>/events')
+@admin_required
+def get_order_events(order_id):
+    """Хронология событий заказа (создание, смены статуса, добавленные запчасти)"""
+    return jsonify([event.to_dict() for event in get_order_timeline(order_id)])
+
+
+@app.route('/api/admin/orders/throughput')
+@admin_required
+def get_orders_throughput():
+    """
+    Количество переходов заказов в статусы по часам или дням
+
+    Query:
+        created_from, created_to: период (YYYY-MM-DD, по умолчанию последние 7 дней)
+        status: только переходы в этот статус (например готово)
+        bucket: hour или day (по умолчанию day)
+    """
+    bucket = request.args.get('bucket', 'day').lower()
+    if bucket not in THROUGHPUT_BUCKETS:
+        return jsonify({'error': f"bucket: {', '.join(THROUGHPUT_BUCKETS)}"}), 400
+
+    try:
+        created_from_raw = request.args.get('created_from')
+        created_to_raw = request.args.get('created_to')
+        end = datetime.utcnow()
+        if created_to_raw:
+            end = datetime.strptime(created_to_raw.strip(), '%Y-%m-%d') + timedelta(days=1)
+        start = end - timedelta(days=7)
+        if created_from_raw:
+            start = datetime.strptime(created_from_raw.strip(), '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Даты в формате YYYY-MM-DD'}), 400
+
+    try:
+        return jsonify({
+            'bucket': bucket,
+            'created_from': start.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_to': end.strftime('%Y-%m-%d %H:%M:%S'),
+            'throughput': get_status_throughput(start, end, to_status=request.args.get('status'), bucket=bucket)
+        })
+    except Exception as e:
+        print(f"❌ Ошибка подсчёта переходов заказов: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/orders/changes')
+def get_orders_changes():
+    """
+    Лента изменений заказов для опроса страницами
+
+    Параметры:
+        since - watermark из предыдущего ответа (или из /api/orders)
+        mine=true - только заказы авторизованного механика
+        lang - язык названий
+
+    Возвращает только заказы с updated_at новее watermark и id удалённых заказов.
+    reset=true означает, что клиенту нужно перезагрузить список целиком.
+    """
+    try:
+        mechanic_id = None
+        if request.args.get('mine', 'false').lower() == 'true':
+            if not current_user.is_authenticated:
+                return jsonify({'error': 'Требуется авторизация механика'}), 401
+            mechanic_id = current_user.id
+
+        lang = request.args.get('lang') or (g.locale if hasattr(g, 'locale') else 'ru')
+        if lang not in app.config['LANGUAGES']:
+            lang = 'ru'
+
+        changes = get_order_changes(parse_watermark(request.args.get('since')), mechanic_id=mechanic_id)
+
+        resp = jsonify({
+            'orders': serialize_orders(changes['orders'], lang=lang, catalog=get_catalog_snapshot()),
+            'created': changes['created'],
+            'deleted': changes['deleted'],
+            'watermark': changes['watermark'],
+            'reset': changes['reset']
+        })
+        resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        return resp
+    except Exception as e:
+        print(f"❌ Ошибка получения изменений заказов: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/orders/stream')
+def stream_orders():
+    """
+    Поток событий заказов (Server-Sent Events)
+
+    Параметры:
+        mine=true - только заказы авторизованного механика
+
+    События: order_created, status_changed, part_added, order_deleted,
+    order_updated и resync (клиенту нужно перезагрузить список).
+    Соединение закрывается через ORDER_STREAM_MAX_SECONDS секунд,
+    браузер переподключается сам. При превышении лимита подключений
+    возвращается 503 - страница продолжает работать через опрос /api/orders/changes.
+    """
+    mechanic_id = None
+    if request.args.get('mine', 'false').lower() == 'true':
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Требуется авторизация механика'}), 401
+        mechanic_id = current_user.id
+
+    subscription = subscribe_order_events(mechanic_id)
+    if subscription is None:
+        return jsonify({'error': 'Слишком много подключений к потоку событий'}), 503
+
+    max_seconds = env_float('ORDER_STREAM_MAX_SECONDS', 300.0)
+
+    def generate():
+        started = datetime.utcnow()
+        event_id = 0
+        try:
+            # Пауза перед переподключением браузера (мс)
+            yield 'retry: 3000\n\n'
+            while (datetime.utcnow() - started).total_seconds() < max_seconds:
+                payload = subscription.get(timeout=15)
+                if payload is None:
+                    # Комментарий поддерживает соединение через прокси
+                    yield ': keepalive\n\n'
+                    continue
+                event_id += 1
+                yield format_sse(payload, event_id)
+        finally:
+            unsubscribe_order_events(subscription)
+
+    resp = Response(generate(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
 @app.route('/api/orders/<int:order_id>', methods=['PUT'])
 def update_order(order_id):
     """API для обновления заказа"""
@@ -1562,21 +1693,23 @@ def update_order(order_id):
         if 'printed' in data:
             order.printed = data['printed']
         
-        db.session.commit()
+        if new_status and new_status != old_status:
+            publish_order_event('status_changed', order, old_status=old_status)
+            record_order_event(order, 'status_changed', old_status, new_status)
         
         # Если статус изменён на "готово", отправить уведомление механику
-        if old_status != 'готово' and new_status == 'готово':
+        became_ready = old_status != 'готово' and new_status == 'готово'
+        if became_ready:
             notify_mechanic_order_ready(order)
             
-            # Автоматическая печать чека
-            if not order.printed:
-                print_receipt(order)
-                order.printed = True
-                db.session.commit()
+            # Автоматическая печать чека (в очередь, printed выставит обработчик очереди)
+            if not order.printed and not has_active_print_job(order.id):
+                print_receipt(order, source='auto')
+        db.session.commit()
         
         return jsonify({
             'success': True,
-            'order': order.to_dict()
+            'order': serialize_orders([order], catalog=get_catalog_snapshot())[0]
         })
         
     except Exception as e:
@@ -1616,13 +1749,17 @@ def add_part_to_order(order_id):
                 entry['name'] = part.get_name('ru')
         if not isinstance(order.selected_parts, list):
             order.selected_parts = []
-        order.selected_parts.append(entry)
-        order.selected_parts = sort_selected_parts_by_sort_order(order.selected_parts, order.category)
+        selected_parts = sort_selected_parts_by_sort_order(order.selected_parts + [entry], order.category)
+        # До изменения selected_parts: UPDATE сдвига позиций делает autoflush
+        insert_order_item(order, entry, next(i for i, part in enumerate(selected_parts) if part is entry))
+        order.selected_parts = selected_parts
         flag_modified(order, 'selected_parts')
         order.updated_at = datetime.utcnow()
-        db.session.commit()
+        publish_order_event('part_added', order)
+        record_order_event(order, 'part_added', order.status, order.status)
         notify_admin_part_added(order, entry)
-        return jsonify({'success': True, 'order': order.to_dict(lang='ru')})
+        db.session.commit()
+        return jsonify({'success': True, 'order': serialize_orders([order], lang='ru', catalog=get_catalog_snapshot())[0]})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1633,17 +1770,59 @@ def print_order(order_id):
     """API для печати чека"""
     try:
         order = Order.query.get_or_404(order_id)
-        receipt = print_receipt(order)
-        
-        order.printed = True
+        receipt, job = print_receipt(order)
         db.session.commit()
         
         return jsonify({
             'success': True,
-            'receipt': receipt
+            'receipt': receipt,
+            'job': job.to_dict()
         })
         
     except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/orders/<int:order_id>/print-jobs', methods=['GET'])
+@admin_required
+def get_order_print_jobs(order_id):
+    """Задания печати заказа (новые сверху)"""
+    jobs = PrintJob.query.filter_by(order_id=order_id).order_by(PrintJob.id.desc()).limit(20).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+@app.route('/api/print-jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_print_job(job_id):
+    """Состояние задания печати"""
+    job = PrintJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/api/print-jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def retry_print_job_api(job_id):
+    """Повторить задание, которое не удалось напечатать"""
+    try:
+        job = PrintJob.query.get_or_404(job_id)
+        if job.status != 'failed':
+            return jsonify({'error': 'Повторить можно только задание в статусе failed'}), 409
+        retry_print_job(job)
+        db.session.commit()
+        return jsonify({'success': True, 'job': job.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/print-jobs/<int:job_id>/reprint', methods=['POST'])
+@admin_required
+def reprint_job_api(job_id):
+    """Напечатать тот же чек ещё раз (новое задание)"""
+    try:
+        job = PrintJob.query.get_or_404(job_id)
+        new_job = reprint_job(job)
+        db.session.commit()
+        return jsonify({'success': True, 'job': new_job.to_dict()})
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/orders/<int:order_id>', methods=['DELETE'])
@@ -1651,6 +1830,8 @@ def delete_order(order_id):
     """API для удаления заказа"""
     try:
         order = Order.query.get_or_404(order_id)
+        record_order_deletion(order)
+        publish_order_event('order_deleted', order)
         db.session.delete(order)
         db.session.commit()
         
@@ -1784,11 +1965,11 @@ def get_mechanic_orders():
         query = query.filter_by(status=status)
     
     if plate_number:
-        query = query.filter(Order.plate_number.ilike(f'%{plate_number}%'))
+        query = apply_plate_filter(query, plate_number)
     
     orders = query.order_by(Order.created_at.desc()).all()
     
-    return jsonify([order.to_dict(lang=lang) for order in orders])
+    return jsonify(serialize_orders(orders, lang=lang, catalog=get_catalog_snapshot()))
 
 
 @app.route('/api/mechanic/stats', methods=['GET'])
@@ -1808,7 +1989,8 @@ def get_mechanics():
     """Получить список всех механиков"""
     try:
         mechanics = Mechanic.query.order_by(Mechanic.created_at.desc()).all()
-        return jsonify([m.to_dict(include_stats=True) for m in mechanics])
+        stats = get_mechanics_order_stats(m.id for m in mechanics)
+        return jsonify([m.to_dict(include_stats=True, stats=stats[m.id]) for m in mechanics])
     except Exception as e:
         error_msg = str(e)
         
@@ -2008,6 +2190,21 @@ def toggle_mechanic_active(mechanic_id):
 # API ДЛЯ УПРАВЛЕНИЯ СПРАВОЧНИКОМ ЗАПЧАСТЕЙ
 # ============================================================================
 
+def catalog_not_modified(etag):
+    """Ответ 304, если у клиента уже есть версия каталога с этим ETag, иначе None"""
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+        return with_catalog_etag(resp, etag)
+    return None
+
+
+def with_catalog_etag(resp, etag):
+    """Проставить ETag каталога; no-cache - браузер обязан перепроверять версию"""
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
 @app.route('/api/parts', methods=['GET'])
 def get_parts():
     """Получить список всех запчастей (доступно всем)"""
@@ -2016,24 +2213,22 @@ def get_parts():
         active_only = request.args.get('active_only', 'true').lower() == 'true'
         lang = request.args.get('lang', g.locale if hasattr(g, 'locale') else 'ru')
         
-        query = Part.query
+        snapshot = get_catalog_snapshot()
+        etag = catalog_etag(snapshot, f'parts|{category}|{active_only}|{lang}')
+        not_modified = catalog_not_modified(etag)
+        if not_modified:
+            return not_modified
+        
+        parts = snapshot.parts
         
         if active_only:
-            query = query.filter_by(is_active=True)
+            parts = [p for p in parts if p.is_active]
         
         if category:
-            cat_obj = Category.query.filter(
-                (Category.name == category) |
-                (Category.name_ru == category) |
-                (Category.name_en == category) |
-                (Category.name_he == category)
-            ).first()
-            raw_cat = cat_obj.name if cat_obj else category
-            query = query.filter(db.func.lower(Part.category) == raw_cat.lower())
+            raw_cat = snapshot.raw_category_name(category).lower()
+            parts = [p for p in parts if (p.category or '').lower() == raw_cat]
         
-        parts = query.order_by(Part.category, Part.sort_order, Part.name_ru).all()
-        
-        return jsonify([part.to_dict(lang=lang) for part in parts])
+        return with_catalog_etag(jsonify([part.to_dict(lang=lang) for part in parts]), etag)
         
     except Exception as e:
         print(f"❌ Ошибка получения запчастей: {e}")
@@ -2072,14 +2267,18 @@ def get_parts_catalog():
         lang_param = request.args.get('lang')
         lang = lang_param or 'ru'
         
-        query = Part.query
-        if active_only:
-            query = query.filter_by(is_active=True)
+        snapshot = get_catalog_snapshot()
+        etag = catalog_etag(snapshot, f'catalog|{active_only}|{lang_param}')
+        not_modified = catalog_not_modified(etag)
+        if not_modified:
+            return not_modified
         
-        parts = query.order_by(Part.category, Part.sort_order, Part.name_ru).all()
+        parts = snapshot.parts
+        if active_only:
+            parts = [p for p in parts if p.is_active]
         
         # Получаем категории для перевода
-        categories = {cat.name: cat for cat in Category.query.all()}
+        categories = snapshot.categories_by_name
         
         # Группируем по категориям с переводами и ID
         catalog = {}
@@ -2101,7 +2300,7 @@ def get_parts_catalog():
                 'name_ru': part.name_ru or part.name
             })
         
-        return jsonify(catalog)
+        return with_catalog_etag(jsonify(catalog), etag)
         
     except Exception as e:
         print(f"❌ Ошибка получения каталога: {e}")
@@ -2140,6 +2339,7 @@ def create_part():
         apply_auto_translations(part, data['name_ru'])
         
         db.session.add(part)
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2197,6 +2397,7 @@ def update_part(part_id):
         if 'sort_order' in data:
             part.sort_order = data['sort_order']
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2218,6 +2419,7 @@ def delete_part(part_id):
         part = Part.query.get_or_404(part_id)
         
         db.session.delete(part)
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({'success': True})
@@ -2236,6 +2438,7 @@ def toggle_part_active(part_id):
         part = Part.query.get_or_404(part_id)
         part.is_active = not part.is_active
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2289,6 +2492,7 @@ def bulk_create_parts():
             except Exception as e:
                 errors.append(f"Ошибка создания '{item.get('name', 'unknown')}': {str(e)}")
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2304,6 +2508,67 @@ def bulk_create_parts():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/parts/import', methods=['POST'])
+@admin_required
+def import_parts_file():
+    """
+    Импорт запчастей из CSV/XLSX (поле формы file)
+    
+    Query:
+        batch_size: строк в пачке (по умолчанию PARTS_IMPORT_BATCH_SIZE)
+        stream: true - отдавать ход импорта построчно (application/x-ndjson):
+                ошибки строк, прогресс после каждой пачки и итог
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'Файл не загружен'}), 400
+    
+    batch_size = request.args.get('batch_size', type=int) or default_parts_import_batch_size()
+    batch_size = max(1, min(batch_size, 5000))
+    
+    try:
+        rows = iter_upload_rows(upload)
+    except ImportFileError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('stream', 'false').lower() == 'true':
+        def generate():
+            try:
+                for item in import_parts(rows, batch_size=batch_size):
+                    yield json.dumps(item, ensure_ascii=False) + '\n'
+            except ImportFileError as e:
+                yield json.dumps({'type': 'failed', 'error': str(e)}, ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    try:
+        errors = []
+        errors_limit = 1000
+        for item in import_parts(rows, batch_size=batch_size):
+            if item['type'] == 'error' and len(errors) < errors_limit:
+                errors.append({'row': item['row'], 'error': item['error']})
+            elif item['type'] == 'done':
+                summary = item
+        
+        print(f"✅ Импорт запчастей: обработано {summary['processed']}, создано {summary['created']}, "
+              f"обновлено {summary['updated']}, ошибок {summary['errors']}")
+        return jsonify({
+            'success': True,
+            'processed': summary['processed'],
+            'created': summary['created'],
+            'updated': summary['updated'],
+            'errors_count': summary['errors'],
+            'errors': errors
+        })
+    
+    except ImportFileError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Ошибка импорта запчастей: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/admin/parts/import-default', methods=['POST'])
 @admin_required
 def import_default_catalog():
@@ -2338,6 +2603,7 @@ def import_default_catalog():
                 db.session.add(part)
                 created.append(part)
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2363,6 +2629,14 @@ def get_categories_api():
     try:
         active_only = request.args.get('active_only', 'false').lower() == 'true'
         lang = request.args.get('lang', 'ru')  # Получаем язык из параметра
+        # counts=false - без parts_count / active_parts_count (нужны только названия)
+        include_counts = request.args.get('counts', 'true').lower() != 'false'
+        
+        # Счётчики запчастей тоже меняются только вместе с версией каталога
+        etag = catalog_etag(get_catalog_snapshot(), f'categories|{active_only}|{lang}|{include_counts}')
+        not_modified = catalog_not_modified(etag)
+        if not_modified:
+            return not_modified
         
         query = Category.query
         if active_only:
@@ -2370,8 +2644,14 @@ def get_categories_api():
         
         categories = query.order_by(Category.sort_order, Category.name).all()
         
+        # Счётчики всех категорий одним GROUP BY вместо двух COUNT на категорию
+        part_counts = get_category_part_counts() if include_counts else None
+        
         # Возвращаем данные с учётом языка
-        return jsonify([cat.to_dict(lang=lang) for cat in categories])
+        return with_catalog_etag(jsonify([
+            cat.to_dict(lang=lang, part_counts=part_counts, include_counts=include_counts)
+            for cat in categories
+        ]), etag)
         
     except Exception as e:
         print(f"❌ Ошибка получения категорий: {e}")
@@ -2405,6 +2685,7 @@ def create_category():
         )
         
         db.session.add(category)
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2466,6 +2747,7 @@ def update_category(category_id):
         if 'sort_order' in data:
             category.sort_order = data['sort_order']
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -2494,6 +2776,7 @@ def delete_category(category_id):
             }), 400
         
         db.session.delete(category)
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({'success': True})
@@ -2512,6 +2795,7 @@ def toggle_category_active(category_id):
         category = Category.query.get_or_404(category_id)
         category.is_active = not category.is_active
         
+        bump_catalog_version()
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка модели ETA на истории готовых заказов
+
+Готовые заказы проигрываются в порядке ready_at: время обработки каждого
+заказа сначала предсказывается моделью, обученной только на более ранних
+заказах, и лишь затем заказ добавляется в обучение. Ошибка сравнивается с
+прежним расчётом (ORDER_PROCESSING_TIME_MINUTES на заказ).
+
+Использование:
+    python backtest_eta.py --days 60
+    python backtest_eta.py --percentile 60 --window 300
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from catalog_cache import get_catalog_snapshot
+from eta_model import EtaModel, count_order_items, default_processing_minutes, iter_ready_orders
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def summarize(errors):
+    """MAE, медиана и p90 абсолютной ошибки в минутах"""
+    if not errors:
+        return None
+    return {
+        'mae': sum(errors) / len(errors),
+        'median': _percentile(errors, 50),
+        'p90': _percentile(errors, 90),
+    }
+
+
+def backtest(rows, model, fixed_minutes, category_name=lambda name: name):
+    """
+    Args:
+        rows: строки iter_ready_orders в порядке ready_at
+        model: необученная EtaModel
+        fixed_minutes: время на заказ в прежнем расчёте
+
+    Returns:
+        dict: {'samples', 'model', 'fixed'} - сводки ошибок по summarize
+    """
+    model_errors = []
+    fixed_errors = []
+    for _, category, selected_parts, created_at, ready_at in rows:
+        category = category_name(category)
+        item_count = count_order_items(selected_parts)
+        predicted = model.estimate(category, item_count)
+        actual = model.observe(category, item_count, created_at, ready_at)
+        if actual is None:
+            continue
+        model_errors.append(abs(predicted - actual))
+        fixed_errors.append(abs(fixed_minutes - actual))
+    return {
+        'samples': len(model_errors),
+        'model': summarize(model_errors),
+        'fixed': summarize(fixed_errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бэктест модели ETA на готовых заказах')
+    parser.add_argument('--days', type=float, default=30, help='глубина истории в днях (по умолчанию 30)')
+    parser.add_argument('--percentile', type=float, default=None, help='перцентиль окна (ORDER_ETA_PERCENTILE)')
+    parser.add_argument('--window', type=int, default=None, help='размер окна (ORDER_ETA_WINDOW)')
+    parser.add_argument('--min-samples', type=int, default=None, help='минимум выборок (ORDER_ETA_MIN_SAMPLES)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        fixed_minutes = default_processing_minutes()
+        model = EtaModel(percentile=args.percentile, window=args.window, min_samples=args.min_samples)
+        since = datetime.utcnow() - timedelta(days=args.days)
+        snapshot = get_catalog_snapshot()
+        result = backtest(iter_ready_orders(since), model, fixed_minutes, snapshot.raw_category_name)
+
+    if not result['samples']:
+        print("❌ Нет готовых заказов с ready_at за выбранный период")
+        return 1
+
+    print(f"📊 Заказов в бэктесте: {result['samples']} (за {args.days:g} дн.)")
+    print(f"{'':<28}{'MAE':>8}{'медиана':>10}{'p90':>8}")
+    for title, stats in (
+        (f'Фиксированные {fixed_minutes} мин', result['fixed']),
+        (f'Модель (p{model.percentile:g})', result['model']),
+    ):
+        print(f"{title:<28}{stats['mae']:>8.1f}{stats['median']:>10.1f}{stats['p90']:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарки горячих путей сериализации и сортировки Felix Hub
+
+Замеряются:
+- Order.to_dict и пакетная serialize_orders со снимком каталога;
+- sort_by_sort_map (сортировка позиций по sort_order справочника, ядро
+  sort_selected_parts_by_sort_order);
+- normalize_selected_parts (нормализация позиций в submit_order);
+- localize_selected_parts (перевод позиций в public_orders / mechanic_orders);
+- find_translation (словарь переводов запчастей).
+
+Каждый случай гоняется на реалистичном (3-5 позиций, известные названия)
+и худшем наборе (60 позиций вперемешку: строки, строковые part_id,
+неизвестные id, метки "без присадок" в разных написаниях, длинные названия).
+
+Время - минимум и медиана из --repeat повторов (микросекунды на вызов).
+--save сохраняет результат как JSON-базу, --compare сравнивает с базой и
+завершается с кодом 1, если какой-либо случай медленнее более чем на
+--max-regression (по умолчанию 20%).
+
+Использование:
+    python bench_hot_paths.py --save bench_baseline.json
+    python bench_hot_paths.py --compare bench_baseline.json
+    python bench_hot_paths.py --filter localize
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from catalog_cache import get_catalog_snapshot
+from migrate_parts_translations import PARTS_TRANSLATIONS, find_translation
+from models import (
+    db, Category, Order, Part, build_sort_map, localize_selected_parts, normalize_selected_parts,
+    serialize_orders, sort_by_sort_map,
+)
+
+CATEGORY = 'тормоза'
+PART_COUNT = 200
+
+
+def make_bench_app():
+    """Приложение с БД в памяти и справочником из PART_COUNT запчастей"""
+    bench_app = Flask(__name__)
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(bench_app)
+    with bench_app.app_context():
+        db.create_all()
+        db.session.add(Category(name=CATEGORY, name_ru='Тормоза', name_en='Brakes', name_he='בלמים'))
+        for i in range(PART_COUNT):
+            db.session.add(Part(
+                name_ru=f'Запчасть {i}', name_en=f'Part {i}', name_he=f'חלק {i}',
+                category=CATEGORY, sort_order=(i * 7) % PART_COUNT
+            ))
+        db.session.commit()
+    return bench_app
+
+
+def realistic_parts(rng, part_ids):
+    parts = [{'part_id': part_id, 'name': f'Запчасть {part_id}', 'quantity': rng.choice((1, 1, 2))}
+             for part_id in rng.sample(part_ids, 4)]
+    parts.append({'name': 'no_additives', 'quantity': 1, 'is_label': True})
+    return parts
+
+
+def worst_case_parts(rng, part_ids):
+    parts = []
+    for i in range(60):
+        kind = i % 6
+        if kind == 0:
+            parts.append({'part_id': rng.choice(part_ids), 'name': 'x', 'quantity': 3, 'is_original': True})
+        elif kind == 1:
+            parts.append({'part_id': str(rng.choice(part_ids)), 'name': 'Запчасть', 'quantity': '2'})
+        elif kind == 2:
+            parts.append({'part_id': 10 ** 6 + i, 'name': 'Неизвестная ' * 10})
+        elif kind == 3:
+            parts.append(rng.choice(('Без присадок', 'NO ADDITIVES', 'ללא תוספים', ' без добавок ')))
+        elif kind == 4:
+            parts.append(f'Запчасть {rng.choice(part_ids)}')
+        else:
+            parts.append({'name': 'Ручная позиция ' + 'x' * 80, 'quantity': 1})
+    return parts
+
+
+def translation_names(rng, worst):
+    known = list(PARTS_TRANSLATIONS)
+    if not worst:
+        return [rng.choice(known) for _ in range(20)]
+    # Длинные названия со словарными фрагментами внутри и без совпадений
+    return [
+        ('Комплект ' + rng.choice(known).lower() + ' усиленный ' * 10) if i % 2 else ('Нет в словаре ' * 15)
+        for i in range(20)
+    ]
+
+
+def build_cases(bench_app, seed):
+    """Случаи: имя -> (функция без аргументов, число элементов на вызов)"""
+    rng = random.Random(seed)
+    cases = {}
+    with bench_app.app_context():
+        part_ids = [row[0] for row in db.session.query(Part.id)]
+        parts_in_category = Part.query.filter_by(category=CATEGORY).all()
+        part_names = {part.id: part.get_name('en') for part in parts_in_category}
+        sort_map = build_sort_map(parts_in_category)
+
+        now = datetime.utcnow()
+        for variant, make_parts in (('realistic', realistic_parts), ('worst', worst_case_parts)):
+            parts = make_parts(rng, part_ids)
+            orders = [
+                Order(id=i + 1, mechanic_id=1, mechanic_name='Иван', category=CATEGORY, plate_number='123-45-678',
+                      selected_parts=make_parts(rng, part_ids), status='новый',
+                      created_at=now - timedelta(minutes=i), updated_at=now)
+                for i in range(25)
+            ]
+            names = translation_names(rng, variant == 'worst')
+
+            cases[f'sort_by_sort_map[{variant}]'] = (lambda p=parts: sort_by_sort_map(p, sort_map), 1)
+            cases[f'normalize_selected_parts[{variant}]'] = (lambda p=parts: normalize_selected_parts(p), 1)
+            cases[f'localize_selected_parts[{variant}]'] = (
+                lambda p=parts: localize_selected_parts(p, part_names, 'NO ADDITIVES'), 1
+            )
+            cases[f'find_translation[{variant}]'] = (lambda n=names: [find_translation(x) for x in n], len(names))
+            cases[f'order_to_dict[{variant}]'] = (lambda o=orders[0]: o.to_dict(lang='en'), 1)
+            cases[f'serialize_orders_page[{variant}]'] = (
+                lambda o=orders: serialize_orders(o, lang='en', catalog=get_catalog_snapshot()), len(orders)
+            )
+    return cases
+
+
+def run_case(bench_app, func, per_call, repeat):
+    """Минимум и медиана в микросекундах на элемент"""
+    with bench_app.app_context():
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        timings = timer.repeat(repeat=repeat, number=number)
+    per_item = [seconds / number / per_call * 1e6 for seconds in timings]
+    return {'min_us': round(min(per_item), 3), 'median_us': round(statistics.median(per_item), 3), 'loops': number}
+
+
+def compare(results, baseline, max_regression):
+    """Печатает сравнение с базой; возвращает список регрессий"""
+    regressions = []
+    print(f"\n{'случай':<40}{'база, мкс':>12}{'сейчас, мкс':>14}{'изменение':>12}")
+    for name, row in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name:<40}{'-':>12}{row['min_us']:>14.2f}{'новый':>12}")
+            continue
+        change = row['min_us'] / base['min_us'] - 1 if base['min_us'] else 0.0
+        mark = ' ❌' if change > max_regression else ''
+        print(f"{name:<40}{base['min_us']:>12.2f}{row['min_us']:>14.2f}{change:>+11.0%}{mark}")
+        if change > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарки сериализации и сортировки Felix Hub')
+    parser.add_argument('--repeat', type=int, default=5, help='повторов на случай (по умолчанию 5)')
+    parser.add_argument('--filter', default='', help='только случаи, содержащие подстроку')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='сохранить результат как JSON-базу')
+    parser.add_argument('--compare', help='сравнить с JSON-базой')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='допустимое замедление (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    bench_app = make_bench_app()
+    results = {}
+    print(f"{'случай':<40}{'min, мкс':>12}{'медиана, мкс':>14}")
+    for name, (func, per_call) in build_cases(bench_app, args.seed).items():
+        if args.filter not in name:
+            continue
+        results[name] = run_case(bench_app, func, per_call, args.repeat)
+        print(f"{name:<40}{results[name]['min_us']:>12.2f}{results[name]['median_us']:>14.2f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 База сохранена в {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Замедление больше {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+        print("✅ Регрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Кэш справочника запчастей и категорий для Felix Hub
+
+Запчасти и категории меняются редко, а читаются почти в каждом запросе.
+Каждый воркер держит неизменяемый снимок каталога (CatalogSnapshot) и
+пересобирает его только когда меняется счётчик версии в таблице catalog_state.
+
+Версия проверяется не чаще одного раза в CATALOG_VERSION_CHECK_SECONDS секунд,
+поэтому обычный запрос не делает к БД ни одного лишнего запроса. Вместе с
+версией сверяется отпечаток таблиц (количество строк и max(updated_at)),
+чтобы заметить изменения, сделанные скриптами в обход API.
+Все эндпоинты, изменяющие справочник, вызывают bump_catalog_version()
+до commit - так изменение версии попадает в ту же транзакцию, а воркер,
+выполнивший commit, сбрасывает свой снимок сразу.
+
+Та же версия даёт ETag для ответов каталога (catalog_etag): клиент с
+актуальной копией получает 304 без сборки и сериализации JSON.
+"""
+
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from env_config import env_float
+from models import db, Part, Category, CatalogState, build_sort_map
+
+CATALOG_STATE_ID = 1
+
+_EMPTY_SORT_MAP = ({}, {}, 0)
+
+
+class PartInfo(namedtuple('PartInfo', [
+    'id', 'name', 'name_ru', 'name_en', 'name_he',
+    'description_ru', 'description_en', 'description_he',
+    'category', 'is_active', 'sort_order', 'created_at', 'updated_at'
+])):
+    """Неизменяемая копия строки Part (не привязана к сессии SQLAlchemy)"""
+    __slots__ = ()
+
+    get_name = Part.get_name
+    get_description = Part.get_description
+    to_dict = Part.to_dict
+
+    @classmethod
+    def from_model(cls, part):
+        return cls(**{field: getattr(part, field) for field in cls._fields})
+
+
+class CategoryInfo(namedtuple('CategoryInfo', [
+    'id', 'name', 'name_ru', 'name_en', 'name_he', 'is_active', 'sort_order'
+])):
+    """Неизменяемая копия строки Category"""
+    __slots__ = ()
+
+    get_name = Category.get_name
+
+    @classmethod
+    def from_model(cls, category):
+        return cls(**{field: getattr(category, field) for field in cls._fields})
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога
+
+    Атрибуты:
+        version: версия каталога, из которой собран снимок
+        fingerprint: отпечаток таблиц parts/categories на момент сборки
+        parts: все запчасти в порядке (category, sort_order, name_ru)
+        parts_by_id: {id: PartInfo}
+        categories: все категории в порядке (sort_order, name)
+        categories_by_name: {name: CategoryInfo}
+        category_aliases: {name / name_ru / name_en / name_he: CategoryInfo}
+        sort_maps: {имя категории: (id -> порядок, имя -> порядок, max порядок)}
+    """
+
+    __slots__ = (
+        'version', 'fingerprint', 'parts', 'parts_by_id', 'categories',
+        'categories_by_name', 'category_aliases', 'sort_maps'
+    )
+
+    def __init__(self, version, parts, categories, fingerprint=None):
+        parts = tuple(parts)
+        categories = tuple(categories)
+
+        category_aliases = {}
+        for cat in sorted(categories, key=lambda c: c.id):
+            for alias in (cat.name, cat.name_ru, cat.name_en, cat.name_he):
+                if alias and alias not in category_aliases:
+                    category_aliases[alias] = cat
+
+        parts_by_category = {}
+        for part in parts:
+            parts_by_category.setdefault(part.category, []).append(part)
+
+        set_ = object.__setattr__
+        set_(self, 'version', version)
+        set_(self, 'fingerprint', fingerprint)
+        set_(self, 'parts', parts)
+        set_(self, 'parts_by_id', MappingProxyType({p.id: p for p in parts}))
+        set_(self, 'categories', categories)
+        set_(self, 'categories_by_name', MappingProxyType({c.name: c for c in categories}))
+        set_(self, 'category_aliases', MappingProxyType(category_aliases))
+        set_(self, 'sort_maps', MappingProxyType({
+            name: build_sort_map(items) for name, items in parts_by_category.items()
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CatalogSnapshot is immutable')
+
+    def resolve_category(self, category):
+        """Найти категорию по любому из её названий"""
+        return self.category_aliases.get(category)
+
+    def raw_category_name(self, category):
+        """Системное имя категории (Category.name) для любого её названия"""
+        cat = self.category_aliases.get(category)
+        return cat.name if cat else category
+
+    def get_sort_map(self, raw_category):
+        return self.sort_maps.get(raw_category, _EMPTY_SORT_MAP)
+
+
+class _CatalogCacheState:
+    """Состояние кэша одного приложения внутри воркера"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.checked_at = 0.0
+
+
+def _get_state():
+    state = current_app.extensions.get('catalog_cache')
+    if state is None:
+        state = current_app.extensions.setdefault('catalog_cache', _CatalogCacheState())
+    return state
+
+
+def _check_interval():
+    if current_app.testing:
+        return 0.0
+    return env_float('CATALOG_VERSION_CHECK_SECONDS', 2.0)
+
+
+def read_catalog_version():
+    """
+    Прочитать версию каталога одним запросом
+
+    Returns:
+        tuple: (счётчик из catalog_state, отпечаток таблиц parts/categories)
+    """
+    row = db.session.query(
+        db.session.query(CatalogState.version).filter_by(id=CATALOG_STATE_ID).scalar_subquery(),
+        db.session.query(db.func.count(Part.id)).scalar_subquery(),
+        db.session.query(db.func.max(Part.updated_at)).scalar_subquery(),
+        db.session.query(db.func.count(Category.id)).scalar_subquery(),
+        db.session.query(db.func.max(Category.updated_at)).scalar_subquery()
+    ).one()
+    return row[0] or 0, tuple(row[1:])
+
+
+def build_catalog_snapshot(version, fingerprint=None):
+    """Собрать снимок каталога двумя запросами"""
+    parts = Part.query.order_by(Part.category, Part.sort_order, Part.name_ru).all()
+    categories = Category.query.order_by(Category.sort_order, Category.name).all()
+    return CatalogSnapshot(
+        version,
+        [PartInfo.from_model(p) for p in parts],
+        [CategoryInfo.from_model(c) for c in categories],
+        fingerprint=fingerprint
+    )
+
+
+def get_catalog_snapshot():
+    """
+    Получить актуальный снимок каталога
+
+    Версия в БД проверяется не чаще раза в CATALOG_VERSION_CHECK_SECONDS
+    (в режиме тестирования - при каждом обращении), снимок пересобирается
+    только если изменилась версия или отпечаток таблиц.
+    """
+    state = _get_state()
+    snapshot = state.snapshot
+    if snapshot is not None and time.monotonic() - state.checked_at < _check_interval():
+        return snapshot
+
+    with state.lock:
+        snapshot = state.snapshot
+        if snapshot is not None and time.monotonic() - state.checked_at < _check_interval():
+            return snapshot
+
+        version, fingerprint = read_catalog_version()
+        if snapshot is None or snapshot.version != version or snapshot.fingerprint != fingerprint:
+            snapshot = build_catalog_snapshot(version, fingerprint)
+            state.snapshot = snapshot
+        state.checked_at = time.monotonic()
+        return snapshot
+
+
+def catalog_etag(snapshot, variant=''):
+    """
+    Сильный ETag ответа, собранного из каталога
+
+    Args:
+        snapshot: снимок каталога (версия и отпечаток таблиц)
+        variant: всё, от чего ещё зависит ответ (эндпоинт, язык, фильтры)
+    """
+    raw = f'{snapshot.version}|{snapshot.fingerprint}|{variant}'
+    return f'c{snapshot.version}-' + hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def invalidate_catalog_snapshot():
+    """Заставить текущий воркер перепроверить версию при следующем обращении"""
+    state = _get_state()
+    state.checked_at = 0.0
+
+
+def bump_catalog_version():
+    """
+    Увеличить версию каталога в текущей транзакции
+
+    Вызывать перед db.session.commit() в любом коде, который меняет
+    запчасти или категории.
+    """
+    updated = CatalogState.query.filter_by(id=CATALOG_STATE_ID).update(
+        {'version': CatalogState.version + 1, 'updated_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.add(CatalogState(id=CATALOG_STATE_ID, version=1))
+    db.session.info['catalog_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    # Воркер, который сам изменил каталог, видит изменения сразу после commit
+    if session.info.pop('catalog_changed', False):
+        invalidate_catalog_snapshot()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('catalog_changed', None)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общие фикстуры тестов Felix Hub
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+from models import db
+
+
+@pytest.fixture
+def app():
+    """Отдельное приложение с пустой БД в памяти; контекст приложения открыт"""
+    test_app = Flask(__name__)
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    test_app.testing = True
+    db.init_app(test_app)
+    with test_app.app_context():
+        db.create_all()
+        yield test_app
+        db.session.remove()
@@ -0,0 +1,22 @@
+"""
+Числовые настройки из переменных окружения для Felix Hub
+
+Некорректное значение (опечатка в переменной окружения) не роняет воркер,
+а заменяется значением по умолчанию.
+"""
+
+import os
+
+
+def env_float(name, default):
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
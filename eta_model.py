@@ -0,0 +1,272 @@
+"""
+Модель времени готовности заказов (ETA) для Felix Hub
+
+Вместо фиксированных ORDER_PROCESSING_TIME_MINUTES на заказ модель учится
+на истории: для каждого готового заказа считается время обработки
+
+    ready_at - max(created_at, ready_at предыдущего готового заказа)
+
+(заказы обрабатываются по очереди, поэтому ожидание в очереди не входит
+во время обработки). Выборки длиннее ORDER_ETA_MAX_SAMPLE_MINUTES (ночь,
+выходные) и короче ORDER_ETA_MIN_SAMPLE_MINUTES (пачка заказов, закрытых
+разом) отбрасываются.
+
+Время обработки хранится скользящими окнами (последние ORDER_ETA_WINDOW
+выборок) с отсортированной копией - перцентиль берётся за O(1), новая
+выборка добавляется за O(log n). Окна ведутся по ключам
+(категория, число позиций), (категория), (число позиций) и общему; оценка
+берётся из самого точного окна, где не меньше ORDER_ETA_MIN_SAMPLES выборок,
+иначе используется ORDER_PROCESSING_TIME_MINUTES.
+
+Модель каждого воркера дообучается на новых готовых заказах (по индексу
+ready_at) не чаще раза в ORDER_ETA_REFRESH_SECONDS. ORDER_ETA_MODEL=fixed
+возвращает прежний расчёт.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from catalog_cache import get_catalog_snapshot
+from env_config import env_float, env_int
+from models import db, Order, _is_no_additives
+
+# Границы групп по числу позиций: 1, 2, 3-4, 5+
+ITEM_BUCKETS = ((1, '1'), (2, '2'), (4, '3-4'))
+
+
+def default_processing_minutes():
+    return env_int('ORDER_PROCESSING_TIME_MINUTES', 10)
+
+
+def count_order_items(selected_parts):
+    """Количество позиций заказа без служебных меток ("без присадок")"""
+    count = 0
+    for part in selected_parts or []:
+        # Метка - в любом написании ("Без присадок", "NO ADDITIVES"), как в OrderItem.is_label
+        if isinstance(part, dict):
+            if not part.get('part_id') and (part.get('is_label') or _is_no_additives(part.get('name'))):
+                continue
+        elif _is_no_additives(part):
+            continue
+        count += 1
+    return count
+
+
+def item_bucket(item_count):
+    for limit, name in ITEM_BUCKETS:
+        if item_count <= limit:
+            return name
+    return f'{ITEM_BUCKETS[-1][0] + 1}+'
+
+
+class RollingPercentile:
+    """Последние size значений в порядке поступления и в отсортированном виде"""
+
+    def __init__(self, size):
+        self.size = size
+        self.window = deque()
+        self.ordered = []
+
+    def add(self, value):
+        self.window.append(value)
+        insort(self.ordered, value)
+        if len(self.window) > self.size:
+            oldest = self.window.popleft()
+            del self.ordered[bisect_left(self.ordered, oldest)]
+
+    def __len__(self):
+        return len(self.window)
+
+    def percentile(self, q):
+        """Перцентиль q (0-100) по ближайшему рангу"""
+        if not self.ordered:
+            return None
+        index = round(q / 100 * (len(self.ordered) - 1))
+        return self.ordered[min(max(index, 0), len(self.ordered) - 1)]
+
+
+class EtaModel:
+    """Оценка времени обработки заказа по категории и числу позиций"""
+
+    def __init__(self, default_minutes=None, percentile=None, window=None, min_samples=None,
+                 max_sample_minutes=None, min_sample_minutes=None):
+        self.default_minutes = default_minutes if default_minutes is not None else default_processing_minutes()
+        self.percentile = percentile if percentile is not None else env_float('ORDER_ETA_PERCENTILE', 50)
+        self.window = int(window) if window is not None else env_int('ORDER_ETA_WINDOW', 200)
+        self.min_samples = int(min_samples) if min_samples is not None else env_int('ORDER_ETA_MIN_SAMPLES', 5)
+        self.max_sample_minutes = (
+            max_sample_minutes if max_sample_minutes is not None
+            else env_float('ORDER_ETA_MAX_SAMPLE_MINUTES', 120)
+        )
+        self.min_sample_minutes = (
+            min_sample_minutes if min_sample_minutes is not None
+            else env_float('ORDER_ETA_MIN_SAMPLE_MINUTES', 1)
+        )
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.prev_ready_at = None
+        # (ready_at, id) последнего учтённого заказа
+        self.last_seen = None
+        self.version = 0
+
+    @staticmethod
+    def _keys(category, item_count):
+        bucket = item_bucket(item_count)
+        return ((category, bucket), (category, None), (None, bucket), (None, None))
+
+    def add_sample(self, category, item_count, minutes):
+        with self.lock:
+            for key in self._keys(category, item_count):
+                group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = RollingPercentile(self.window)
+                group.add(minutes)
+            self.version += 1
+
+    def observe(self, category, item_count, created_at, ready_at):
+        """
+        Учесть готовый заказ (заказы передаются в порядке ready_at)
+
+        Returns:
+            float | None: время обработки в минутах, если выборка принята
+        """
+        if ready_at is None or created_at is None:
+            return None
+        started_at = max(created_at, self.prev_ready_at) if self.prev_ready_at else created_at
+        self.prev_ready_at = ready_at if self.prev_ready_at is None else max(self.prev_ready_at, ready_at)
+        minutes = (ready_at - started_at).total_seconds() / 60
+        if minutes < self.min_sample_minutes or minutes > self.max_sample_minutes:
+            return None
+        self.add_sample(category, item_count, minutes)
+        return minutes
+
+    def estimate(self, category, item_count):
+        """Оценка времени обработки одного заказа в минутах"""
+        with self.lock:
+            for key in self._keys(category, item_count):
+                group = self.groups.get(key)
+                if group is not None and len(group) >= self.min_samples:
+                    return group.percentile(self.percentile)
+        return self.default_minutes
+
+    def sample_count(self):
+        group = self.groups.get((None, None))
+        return len(group) if group is not None else 0
+
+
+class FixedEtaModel(EtaModel):
+    """Прежний расчёт: ORDER_PROCESSING_TIME_MINUTES на каждый заказ"""
+
+    def estimate(self, category, item_count):
+        return self.default_minutes
+
+
+def iter_ready_orders(since=None, after_id=0, batch_size=1000):
+    """
+    Готовые заказы в порядке (ready_at, id)
+
+    Yields:
+        tuple: (id, category, selected_parts, created_at, ready_at)
+    """
+    query = db.session.query(
+        Order.id, Order.category, Order.selected_parts, Order.created_at, Order.ready_at
+    ).filter(Order.ready_at.isnot(None))
+    if since is not None:
+        query = query.filter(
+            (Order.ready_at > since) | ((Order.ready_at == since) & (Order.id > after_id))
+        )
+    yield from query.order_by(Order.ready_at, Order.id).yield_per(batch_size)
+
+
+class _EtaModelState:
+    """Модель одного приложения внутри воркера"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model = None
+        self.checked_at = 0.0
+
+
+def _refresh_interval():
+    if current_app.testing:
+        return 0.0
+    return env_float('ORDER_ETA_REFRESH_SECONDS', 60)
+
+
+def learn_from_orders(model, rows):
+    """Обучить модель на строках iter_ready_orders"""
+    snapshot = get_catalog_snapshot()
+    for order_id, category, selected_parts, created_at, ready_at in rows:
+        model.observe(snapshot.raw_category_name(category), count_order_items(selected_parts), created_at, ready_at)
+        model.last_seen = (ready_at, order_id)
+
+
+def get_eta_model():
+    """
+    Модель ETA текущего воркера
+
+    При первом обращении обучается на заказах за ORDER_ETA_HISTORY_DAYS дней,
+    затем дообучается на заказах, ставших готовыми после последнего учтённого.
+    """
+    state = current_app.extensions.get('eta_model')
+    if state is None:
+        state = current_app.extensions.setdefault('eta_model', _EtaModelState())
+    if state.model is not None and time.monotonic() - state.checked_at < _refresh_interval():
+        return state.model
+
+    with state.lock:
+        if state.model is not None and time.monotonic() - state.checked_at < _refresh_interval():
+            return state.model
+
+        if os.getenv('ORDER_ETA_MODEL', 'learned').strip().lower() == 'fixed':
+            if not isinstance(state.model, FixedEtaModel):
+                state.model = FixedEtaModel()
+        else:
+            model = state.model
+            if model is None:
+                model = EtaModel()
+                model.last_seen = (datetime.utcnow() - timedelta(days=env_float('ORDER_ETA_HISTORY_DAYS', 30)), 0)
+            learn_from_orders(model, iter_ready_orders(*model.last_seen))
+            state.model = model
+        state.checked_at = time.monotonic()
+        return state.model
+
+
+def estimate_order_minutes(model, category, selected_parts):
+    """Оценка времени обработки одного заказа (категория - в любом написании)"""
+    return model.estimate(get_catalog_snapshot().raw_category_name(category), count_order_items(selected_parts))
+
+
+def queue_estimates(queue, model, mechanic_id=None):
+    """
+    Накопленное время готовности для заказов очереди
+
+    Результат для всей очереди кэшируется до изменения очереди или модели.
+
+    Args:
+        mechanic_id: считать только очередь заказов этого механика
+
+    Returns:
+        tuple: ({id заказа: минут до готовности}, минут до конца всей очереди)
+    """
+    cache_key = (id(queue), queue.version, id(model), model.version)
+    cached = current_app.extensions.get('eta_queue_estimates')
+    if mechanic_id is None and cached is not None and cached[0] == cache_key:
+        return cached[1]
+
+    snapshot = get_catalog_snapshot()
+    cumulative = {}
+    total = 0.0
+    for order_id, category, item_count in queue.features(mechanic_id):
+        total += model.estimate(snapshot.raw_category_name(category), item_count)
+        cumulative[order_id] = total
+
+    if mechanic_id is None:
+        current_app.extensions['eta_queue_estimates'] = (cache_key, (cumulative, total))
+    return cumulative, total
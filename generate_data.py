@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических данных Felix Hub для проверки на больших объёмах
+
+Заполняет БД механиками, категориями, запчастями (названия на трёх языках)
+и заказами, похожими на настоящие:
+- selected_parts в обоих форматах: старый (список строк) и новый
+  (словари с part_id, количеством, is_original, меткой "без присадок");
+- распределение статусов зависит от возраста заказа: старые почти все
+  выданы, активные - только за последние сутки;
+- created_at растянут на --years лет, свежих заказов больше (рост бизнеса);
+- часть заказов без механика (анонимные заказы старых версий).
+
+Вставка идёт пачками одним INSERT (executemany) без ORM-объектов заказов,
+id заказов назначаются заранее, поэтому позиции (order_items) и триграммы
+номера (order_plate_ngrams) пишутся теми же пачками - миллион заказов
+генерируется за минуты. Данные дописываются к уже существующим.
+
+Использование:
+    python generate_data.py --orders 1000000
+    python generate_data.py --database-url postgresql://localhost/felix_scale --orders 500000 --years 5
+    python generate_data.py --mechanics 50 --categories 12 --parts 2000 --orders 0
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASE_CATEGORIES = (
+    ('тормоза', 'Тормоза', 'Brakes', 'בלמים'),
+    ('двигатель', 'Двигатель', 'Engine', 'מנוע'),
+    ('подвеска', 'Подвеска', 'Suspension', 'מתלים'),
+    ('электрика', 'Электрика', 'Electrics', 'חשמל'),
+    ('расходники', 'Расходники', 'Consumables', 'מתכלים'),
+    ('кузов', 'Кузов', 'Body', 'מרכב'),
+    ('трансмиссия', 'Трансмиссия', 'Transmission', 'תיבת הילוכים'),
+    ('охлаждение', 'Охлаждение', 'Cooling', 'קירור'),
+)
+
+# Статусы по возрасту заказа: (старше, [(статус, вес)])
+STATUS_BY_AGE = (
+    (timedelta(days=2), (('выдано', 88), ('отменено', 6), ('готово', 6))),
+    (timedelta(days=1), (('выдано', 60), ('готово', 30), ('отменено', 5), ('в ожидании запчасти', 5))),
+    (timedelta(0), (('новый', 30), ('в работе', 25), ('готово', 25), ('выдано', 10),
+                    ('в ожидании запчасти', 5), ('отменено', 5))),
+)
+
+READY_STATUSES = ('готово', 'выдано')
+NO_ADDITIVES_SPELLINGS = ('Без присадок', 'без присадок', 'NO ADDITIVES', 'ללא תוספים')
+
+
+def _weighted(rng, weighted):
+    names, weights = zip(*weighted)
+    return rng.choices(names, weights=weights)[0]
+
+
+def random_plate(rng):
+    """Номер в одном из встречающихся форматов"""
+    if rng.random() < 0.8:
+        return f'{rng.randint(10, 999)}-{rng.randint(10, 99)}-{rng.randint(100, 999)}'
+    letters = 'ABEKMHOPCTYX'
+    return f'{rng.choice(letters)}{rng.randint(100, 999)}{rng.choice(letters)}{rng.choice(letters)}{rng.randint(10, 199)}'
+
+
+def generate_mechanics(count, rng):
+    """Добавить механиков; возвращает [(id, имя, telegram_id)] всех механиков"""
+    from sqlalchemy import func
+    from werkzeug.security import generate_password_hash
+
+    from models import db, Mechanic
+
+    if count:
+        offset = db.session.query(func.coalesce(func.max(Mechanic.id), 0)).scalar()
+        # Хеш один на всех: generate_password_hash намеренно медленный
+        password_hash = generate_password_hash('mechanic')
+        first_names = ('Иван', 'Алексей', 'Давид', 'Михаил', 'Йоси', 'Сергей', 'Ави', 'Олег')
+        db.session.execute(Mechanic.__table__.insert(), [
+            {
+                'username': f'gen_mechanic_{offset + i}',
+                'password_hash': password_hash,
+                'full_name': f'{rng.choice(first_names)} {offset + i}',
+                'telegram_id': str(9_000_000 + offset + i),
+                'is_active': rng.random() < 0.9,
+                'language': rng.choice(('ru', 'ru', 'he', 'en')),
+            }
+            for i in range(1, count + 1)
+        ])
+        db.session.commit()
+    return db.session.query(Mechanic.id, Mechanic.full_name, Mechanic.telegram_id).all()
+
+
+def generate_catalog(categories, parts, rng):
+    """Добавить категории и запчасти (на трёх языках); возвращает {категория: [(id, название)]}"""
+    from sqlalchemy import func
+
+    from catalog_cache import bump_catalog_version
+    from migrate_parts_translations import PARTS_TRANSLATIONS
+    from models import db, Category, Part, rebuild_category_aliases
+
+    existing = {name for (name,) in db.session.query(Category.name)}
+    new_categories = []
+    for i in range(categories):
+        if i < len(BASE_CATEGORIES):
+            name, ru, en, he = BASE_CATEGORIES[i]
+        else:
+            number = i + 1
+            name, ru, en, he = f'категория {number}', f'Категория {number}', f'Category {number}', f'קטגוריה {number}'
+        if name not in existing:
+            new_categories.append({'name': name, 'name_ru': ru, 'name_en': en, 'name_he': he,
+                                   'is_active': True, 'sort_order': i})
+    if new_categories:
+        db.session.execute(Category.__table__.insert(), new_categories)
+
+    category_names = [name for (name,) in db.session.query(Category.name).order_by(Category.sort_order, Category.id)]
+    if parts and category_names:
+        offset = db.session.query(func.coalesce(func.max(Part.id), 0)).scalar()
+        dictionary = list(PARTS_TRANSLATIONS.items())
+        rows = []
+        for i in range(1, parts + 1):
+            ru, translations = dictionary[(offset + i) % len(dictionary)]
+            suffix = f' {offset + i}'
+            rows.append({
+                'name': ru.capitalize() + suffix,
+                'name_ru': ru.capitalize() + suffix,
+                'name_en': translations.get('en', ru) + suffix,
+                'name_he': translations.get('he', ru) + suffix,
+                'description_ru': f'Описание: {ru}' if rng.random() < 0.3 else None,
+                'category': category_names[i % len(category_names)],
+                'is_active': rng.random() < 0.95,
+                'sort_order': (i * 10) % 1000,
+            })
+        db.session.execute(Part.__table__.insert(), rows)
+
+    if new_categories or parts:
+        rebuild_category_aliases()
+        bump_catalog_version()
+    db.session.commit()
+
+    catalog = {}
+    for part_id, name_ru, category in db.session.query(Part.id, Part.name_ru, Part.category).filter(Part.is_active.is_(True)):
+        catalog.setdefault(category, []).append((part_id, name_ru))
+    return catalog
+
+
+def random_selected_parts(rng, parts, legacy_share):
+    """selected_parts заказа в старом или новом формате"""
+    chosen = rng.sample(parts, min(len(parts), rng.choices((1, 2, 3, 4, 6), weights=(35, 30, 20, 10, 5))[0]))
+    with_label = rng.random() < 0.1
+    if rng.random() < legacy_share:
+        selected = [name for _, name in chosen]
+        if with_label:
+            selected.append(rng.choice(NO_ADDITIVES_SPELLINGS))
+        return selected
+
+    selected = []
+    for part_id, name in chosen:
+        entry = {'part_id': part_id if rng.random() < 0.95 else str(part_id), 'name': name,
+                 'quantity': rng.choices((1, 2, 4), weights=(80, 15, 5))[0]}
+        if rng.random() < 0.3:
+            entry['is_original'] = rng.random() < 0.5
+        selected.append(entry)
+    if rng.random() < 0.05:
+        # Запчасть, добавленная вручную (не из справочника)
+        selected.append({'name': 'Ручная позиция', 'quantity': 1})
+    if with_label:
+        selected.append({'name': 'no_additives', 'quantity': 1, 'is_label': True})
+    return selected
+
+
+def _order_status(rng, age):
+    for min_age, weighted in STATUS_BY_AGE:
+        if age >= min_age:
+            return _weighted(rng, weighted)
+    return _weighted(rng, STATUS_BY_AGE[-1][1])
+
+
+def generate_orders(count, mechanics, catalog, rng, years=3.0, batch_size=5000, legacy_share=0.15,
+                    anonymous_share=0.05, active_count=40, progress=print):
+    """
+    Добавить заказы вместе с order_items и триграммами номера
+
+    Args:
+        active_count: сколько заказов поместить в последние сутки (очередь)
+
+    Returns:
+        int: количество добавленных заказов
+    """
+    from sqlalchemy import func, text
+
+    from models import db, Order, OrderItem, OrderPlateNgram, normalize_plate
+    from order_items import build_order_items
+    from plate_search import _uses_trigram_index, plate_ngrams
+
+    if not count or not catalog:
+        return 0
+
+    next_id = db.session.query(func.coalesce(func.max(Order.id), 0)).scalar() + 1
+    use_ngrams = not _uses_trigram_index()
+    # Объекты OrderItem не проходят flush, поэтому умолчания колонок подставляем сами
+    item_defaults = {
+        column.key: column.default.arg if column.default is not None else None
+        for column in OrderItem.__table__.columns if column.key != 'id'
+    }
+    categories = list(catalog)
+    now = datetime.utcnow()
+    span_seconds = int(years * 365 * 24 * 3600)
+
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < count:
+        orders, items, ngrams = [], [], []
+        for _ in range(min(batch_size, count - inserted)):
+            order_id = next_id
+            next_id += 1
+            inserted += 1
+
+            if inserted > count - active_count:
+                age = timedelta(seconds=rng.randint(60, 24 * 3600))
+            else:
+                # Свежих заказов больше: возраст смещён к нулю
+                age = timedelta(seconds=int(span_seconds * rng.random() ** 1.6) + 24 * 3600)
+            created_at = now - age
+            status = _order_status(rng, age)
+            handled_at = min(now, created_at + timedelta(minutes=rng.randint(5, 240)))
+
+            category = rng.choice(categories)
+            selected_parts = random_selected_parts(rng, catalog[category], legacy_share)
+            if not mechanics or rng.random() < anonymous_share:
+                mechanic_id, mechanic_name, telegram_id = None, f'Гость {rng.randint(1, 500)}', None
+            else:
+                mechanic_id, mechanic_name, telegram_id = rng.choice(mechanics)
+            plate_number = random_plate(rng)
+            plate_normalized = normalize_plate(plate_number)
+
+            orders.append({
+                'id': order_id,
+                'mechanic_id': mechanic_id,
+                'mechanic_name': mechanic_name,
+                'telegram_id': telegram_id,
+                'category': category,
+                'plate_number': plate_number,
+                'plate_normalized': plate_normalized,
+                'selected_parts': selected_parts,
+                'is_original': rng.random() < 0.3,
+                'comment': 'Срочно' if rng.random() < 0.05 else None,
+                'status': status,
+                'printed': status in READY_STATUSES,
+                'created_at': created_at,
+                'updated_at': handled_at if status != 'новый' else created_at,
+                'ready_at': handled_at if status in READY_STATUSES else None,
+            })
+            for item in build_order_items(selected_parts):
+                item.order_id = order_id
+                row = {}
+                for key, default in item_defaults.items():
+                    value = getattr(item, key)
+                    row[key] = default if value is None else value
+                items.append(row)
+            if use_ngrams:
+                ngrams.extend({'gram': gram, 'order_id': order_id} for gram in plate_ngrams(plate_normalized))
+
+        # Core-вставка таблиц: ORM-вставка дробит пачку по набору NULL-колонок строк
+        db.session.execute(Order.__table__.insert(), orders)
+        if items:
+            db.session.execute(OrderItem.__table__.insert(), items)
+        if ngrams:
+            db.session.execute(OrderPlateNgram.__table__.insert(), ngrams)
+        db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        progress(f"   {inserted}/{count} заказов ({inserted / elapsed:.0f} в секунду)")
+
+    if db.engine.dialect.name == 'postgresql':
+        # id назначены явно - сдвигаем последовательность
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('orders', 'id'), (SELECT MAX(id) FROM orders))"))
+        db.session.commit()
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генерация синтетических данных Felix Hub')
+    parser.add_argument('--database-url', help='БД (по умолчанию DATABASE_URL приложения)')
+    parser.add_argument('--mechanics', type=int, default=20)
+    parser.add_argument('--categories', type=int, default=len(BASE_CATEGORIES))
+    parser.add_argument('--parts', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--years', type=float, default=3, help='на сколько лет назад растянуть заказы')
+    parser.add_argument('--legacy-share', type=float, default=0.15, help='доля заказов со старым форматом selected_parts')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from app import app, run_migrations
+    from models import db
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        mechanics = generate_mechanics(args.mechanics, rng)
+        catalog = generate_catalog(args.categories, args.parts, rng)
+        print(f"✅ Механиков: {len(mechanics)}, категорий с запчастями: {len(catalog)}")
+        print(f"🔄 Генерация {args.orders} заказов...")
+        inserted = generate_orders(
+            args.orders, mechanics, catalog, rng,
+            years=args.years, batch_size=args.batch_size, legacy_share=args.legacy_share
+        )
+    print(f"✅ Добавлено {inserted} заказов за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,17 @@
 import os
 import multiprocessing
+import shutil
 
 # Bind to the PORT environment variable (required by Render)
 bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
 
 # Worker configuration
 workers = 1
-threads = 2
-worker_class = 'sync'
+# Потоки: SSE-подключения (/api/orders/stream) держат поток все время соединения,
+# поэтому их число ограничено ORDER_STREAM_MAX_CLIENTS и не больше threads - 2
+# (order_stream.stream_client_limit), остальные запросы обслуживают свободные потоки
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -32,3 +36,27 @@ tmp_upload_dir = None
 # SSL (не используется на Render, но для будущего)
 keyfile = None
 certfile = None
+
+# Метрики Prometheus (metrics.py): каждый воркер пишет значения в mmap-файлы
+# общего каталога, /metrics собирает их со всех воркеров
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/felix-hub-metrics')
+
+
+def on_starting(server):
+    # Значения прошлого запуска не должны попасть в новые счётчики
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Фактическое число потоков (с учётом --threads) - для лимита SSE-подключений
+    os.environ['GUNICORN_THREADS'] = str(worker.cfg.threads)
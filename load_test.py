@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест Felix Hub с моделью трафика мастерской
+
+Поднимает приложение (встроенный многопоточный сервер werkzeug) на
+локальной SQLite или PostgreSQL, заполняет БД сгенерированными данными
+и в несколько потоков гоняет смесь запросов:
+
+- механики создают заказы (/api/submit_order);
+- вкладки админ-панели опрашивают /api/orders (страницы, фильтр статуса,
+  поиск по номеру) и двигают заказы по статусам (PUT /api/orders/<id>);
+- посетители открывают публичную страницу /orders;
+- формы заказа загружают каталог (/api/parts/catalog, /api/categories).
+
+Работает офлайн: Telegram API подменяется локальной заглушкой
+(TELEGRAM_API_BASE), принтер - бэкенд stdout. По итогам для каждого
+сценария печатаются p50/p95/p99, ошибки и пропускная способность;
+--json сохраняет результат для сравнения между прогонами. Генератор
+случайных чисел фиксирован (--seed), поэтому данные и смесь запросов
+воспроизводимы.
+
+Использование:
+    python load_test.py                                   # SQLite во временном каталоге
+    python load_test.py --orders 100000 --users 16 --duration 60 --json result.json
+    python load_test.py --database-url postgresql://localhost/felix_load
+    python load_test.py --url http://127.0.0.1:8000 --database-url postgresql://localhost/felix --skip-seed
+        # уже запущенный gunicorn; --database-url - его БД (id механиков и запчастей)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_data import BASE_CATEGORIES, generate_catalog, generate_mechanics, generate_orders, random_plate
+
+ADMIN_PASSWORD = 'felix2025'
+
+# Сценарий: (имя, вес)
+SCENARIOS = (
+    ('submit_order', 8),
+    ('admin_orders', 30),
+    ('admin_search', 5),
+    ('update_status', 7),
+    ('public_orders', 25),
+    ('catalog', 15),
+    ('categories', 10),
+)
+
+NEXT_STATUS = {'новый': 'в работе', 'в работе': 'готово', 'готово': 'выдано'}
+
+
+# ============================================================================
+# ЗАГЛУШКА TELEGRAM
+# ============================================================================
+
+class _TelegramStubHandler(BaseHTTPRequestHandler):
+    sent = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with _TelegramStubHandler.lock:
+            _TelegramStubHandler.sent += 1
+        body = b'{"ok": true, "result": {}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_telegram_stub():
+    """Локальный HTTP-сервер, отвечающий ok на любой sendMessage"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _TelegramStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================================================
+# ДАННЫЕ
+# ============================================================================
+
+def weighted_choice(rng, weighted):
+    names, weights = zip(*weighted)
+    return rng.choices(names, weights=weights)[0]
+
+
+def seed_database(mechanics, parts, orders, rng):
+    """Заполнить БД генератором синтетических данных (generate_data)"""
+    mechanic_rows = generate_mechanics(mechanics, rng)
+    catalog = generate_catalog(len(BASE_CATEGORIES), parts, rng)
+    generate_orders(orders, mechanic_rows, catalog, rng, years=1, progress=lambda message: None)
+
+
+def prepare_app(args, rng):
+    """Импортировать приложение с окружением нагрузочного теста и заполнить БД"""
+    stub = start_telegram_stub()
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['TELEGRAM_API_BASE'] = f'http://127.0.0.1:{stub.server_port}'
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'loadtest')
+    os.environ.setdefault('TELEGRAM_ADMIN_CHAT_ID', '1')
+    os.environ['THERMAL_PRINT_BACKEND'] = 'stdout'
+
+    import app as app_module
+    from models import db, Mechanic, Part
+
+    with app_module.app.app_context():
+        db.create_all()
+        if not args.skip_seed and db.session.query(Mechanic.id).first() is None:
+            started = time.perf_counter()
+            print(f"🔄 Генерация данных: {args.mechanics} механиков, {args.parts} запчастей, {args.orders} заказов...")
+            seed_database(args.mechanics, args.parts, args.orders, rng)
+            print(f"✅ Данные созданы за {time.perf_counter() - started:.1f} с")
+        # Индексы и служебные таблицы; позиции и триграммы генератор пишет сам
+        app_module.run_migrations()
+
+        mechanic_ids = [row[0] for row in db.session.query(Mechanic.id).filter(Mechanic.is_active.is_(True))]
+        parts_by_category = {}
+        for part_id, category in db.session.query(Part.id, Part.category).filter(Part.is_active.is_(True)):
+            parts_by_category.setdefault(category, []).append(part_id)
+    return app_module.app, stub, mechanic_ids, parts_by_category
+
+
+def start_server(app):
+    """Встроенный многопоточный сервер в фоновом потоке"""
+    import logging
+    from werkzeug.serving import make_server
+
+    # Строка лога на каждый запрос заглушила бы отчёт
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+# ============================================================================
+# НАГРУЗКА
+# ============================================================================
+
+class VirtualUser:
+    """Один поток нагрузки со своей HTTP-сессией (куки администратора)"""
+
+    def __init__(self, base_url, rng, mechanic_ids, parts_by_category, created_orders):
+        self.base_url = base_url
+        self.rng = rng
+        self.mechanic_ids = mechanic_ids
+        self.parts_by_category = parts_by_category
+        self.created_orders = created_orders
+        self.http = requests.Session()
+        self.http.post(f'{base_url}/admin/login', data={'password': ADMIN_PASSWORD}, allow_redirects=False)
+
+    def request(self, method, path, **kwargs):
+        return self.http.request(method, self.base_url + path, timeout=30, **kwargs)
+
+    def submit_order(self):
+        category = self.rng.choice(list(self.parts_by_category))
+        part_ids = self.parts_by_category[category]
+        selected_parts = [
+            {'part_id': part_id, 'quantity': self.rng.choice((1, 1, 2))}
+            for part_id in self.rng.sample(part_ids, min(self.rng.randint(1, 4), len(part_ids)))
+        ]
+        response = self.request('POST', '/api/submit_order', json={
+            'mechanic_id': self.rng.choice(self.mechanic_ids),
+            'category': category,
+            'plate_number': random_plate(self.rng),
+            'selected_parts': selected_parts,
+            'is_original': self.rng.random() < 0.3,
+        })
+        if response.status_code == 200:
+            order_id = response.json().get('order_id')
+            if order_id:
+                self.created_orders.append((order_id, 'новый'))
+        return response
+
+    def admin_orders(self):
+        params = {'page': self.rng.choice((1, 1, 1, 2, 3)), 'page_size': 25}
+        if self.rng.random() < 0.4:
+            params['status'] = self.rng.choice(('новый', 'в работе', 'готово'))
+        return self.request('GET', '/api/orders', params=params)
+
+    def admin_search(self):
+        return self.request('GET', '/api/orders', params={'plate_number': str(self.rng.randint(10, 999)), 'page_size': 25})
+
+    def update_status(self):
+        try:
+            order_id, status = self.created_orders.pop(self.rng.randrange(len(self.created_orders)))
+        except (IndexError, ValueError):
+            return self.admin_orders()
+        next_status = NEXT_STATUS[status]
+        response = self.request('PUT', f'/api/orders/{order_id}', json={'status': next_status})
+        if next_status in NEXT_STATUS:
+            self.created_orders.append((order_id, next_status))
+        return response
+
+    def public_orders(self):
+        return self.request('GET', '/orders', params={'page': self.rng.choice((1, 1, 2))})
+
+    def catalog(self):
+        return self.request('GET', '/api/parts/catalog', params={'active_only': 'true'})
+
+    def categories(self):
+        return self.request('GET', '/api/categories', params={'counts': 'false'})
+
+
+class Stats:
+    """Задержки и ошибки по сценариям (потокобезопасно)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, scenario, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(scenario, []).append(seconds)
+            if not ok:
+                self.errors[scenario] = self.errors.get(scenario, 0) + 1
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(stats, elapsed):
+    """Сводка по сценариям: количество, ошибки, rps, p50/p95/p99/max в мс"""
+    result = {}
+    for scenario, latencies in sorted(stats.latencies.items()):
+        ordered = sorted(latencies)
+        result[scenario] = {
+            'requests': len(ordered),
+            'errors': stats.errors.get(scenario, 0),
+            'rps': round(len(ordered) / elapsed, 2),
+            'p50_ms': round(_percentile(ordered, 50) * 1000, 1),
+            'p95_ms': round(_percentile(ordered, 95) * 1000, 1),
+            'p99_ms': round(_percentile(ordered, 99) * 1000, 1),
+            'max_ms': round(ordered[-1] * 1000, 1),
+        }
+    return result
+
+
+def run_load(base_url, users, duration, warmup, seed, mechanic_ids, parts_by_category):
+    stats = Stats()
+    created_orders = []
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        user = VirtualUser(base_url, rng, mechanic_ids, parts_by_category, created_orders)
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            scenario = weighted_choice(rng, SCENARIOS)
+            started = time.perf_counter()
+            try:
+                ok = getattr(user, scenario)().status_code < 400
+            except Exception:
+                # Любая ошибка итерации (сеть, неожиданный JSON) - ошибка сценария, а не конец потока
+                ok = False
+            if now >= measure_from:
+                stats.record(scenario, time.perf_counter() - started, ok)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(stats, duration)
+
+
+def print_report(summary, duration):
+    print(f"\n📊 Результаты за {duration:g} с")
+    print(f"{'сценарий':<16}{'запросов':>10}{'ошибок':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    total_requests = 0
+    for scenario, row in summary.items():
+        total_requests += row['requests']
+        print(f"{scenario:<16}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+    print(f"{'всего':<16}{total_requests:>10}{'':>8}{total_requests / duration:>9.1f}   (задержки в мс)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест Felix Hub')
+    parser.add_argument('--database-url', default=None,
+                        help='БД для теста (по умолчанию - новая SQLite во временном каталоге)')
+    parser.add_argument('--url', default=None, help='адрес уже запущенного сервера (без встроенного)')
+    parser.add_argument('--mechanics', type=int, default=20)
+    parser.add_argument('--parts', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--skip-seed', action='store_true', help='не генерировать данные')
+    parser.add_argument('--users', type=int, default=8, help='параллельных потоков нагрузки')
+    parser.add_argument('--duration', type=float, default=30, help='длительность замера в секундах')
+    parser.add_argument('--warmup', type=float, default=3, help='прогрев без замера в секундах')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='сохранить результат в JSON')
+    args = parser.parse_args()
+    if args.url and not args.database_url:
+        # Иначе id механиков и запчастей возьмутся из пустой временной БД, не связанной с сервером
+        parser.error('--url требует --database-url той же БД, что у тестируемого сервера')
+
+    rng = random.Random(args.seed)
+    if args.database_url is None:
+        args.database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='felix-load-'), 'load.db')
+
+    # Данные и заглушки готовятся всегда: для внешнего сервера - в той же БД
+    app, _, mechanic_ids, parts_by_category = prepare_app(args, rng)
+    if not mechanic_ids or not parts_by_category:
+        print("❌ В БД нет активных механиков или запчастей - заказы создавать не из чего (уберите --skip-seed)")
+        return 1
+    base_url = args.url
+    if base_url is None:
+        _, base_url = start_server(app)
+    print(f"🚀 Нагрузка на {base_url}: {args.users} потоков, {args.duration:g} с (+{args.warmup:g} с прогрева)")
+
+    summary = run_load(
+        base_url.rstrip('/'), args.users, args.duration, args.warmup, args.seed, mechanic_ids, parts_by_category
+    )
+    print_report(summary, args.duration)
+    print(f"📨 Сообщений в заглушку Telegram: {_TelegramStubHandler.sent}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'started_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                'config': {key: value for key, value in vars(args).items() if key != 'json_path'},
+                'scenarios': summary,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результат сохранён в {args.json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
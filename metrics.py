@@ -0,0 +1,191 @@
+"""
+Метрики Prometheus (/metrics) для Felix Hub
+
+Экспортируются:
+- felix_http_request_duration_seconds{endpoint, method} и
+  felix_http_requests_total{endpoint, method, status} - по эндпоинтам Flask;
+- felix_db_query_duration_seconds - количество и время SQL-запросов;
+- felix_telegram_send_duration_seconds и felix_telegram_send_failures_total -
+  отправка уведомлений фоновым обработчиком outbox;
+- felix_print_job_duration_seconds{result} - печать чеков очередью печати;
+- felix_active_orders - длина очереди активных заказов (на момент опроса);
+- felix_orders_created_total - созданные заказы (скорость - rate() в Prometheus).
+
+Несколько воркеров gunicorn: если задан PROMETHEUS_MULTIPROC_DIR (его
+выставляет gunicorn.conf.py), каждый процесс пишет значения в свои
+mmap-файлы в этом каталоге, а /metrics собирает их все через
+MultiProcessCollector - ответ не зависит от того, какой воркер его отдал.
+
+Нужен пакет prometheus_client; без него (или при METRICS_ENABLED=false)
+функции записи ничего не делают, а /metrics не регистрируется.
+/metrics доступен только с METRICS_TOKEN (заголовок Authorization: Bearer);
+без токена маршрут регистрируется лишь при явном METRICS_PUBLIC=true
+(например, Prometheus в закрытой сети).
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+from models import db
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SEND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def metrics_enabled():
+    if prometheus_client is None:
+        return False
+    return os.getenv('METRICS_ENABLED', 'true').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+class _Metrics:
+    """Метрики процесса (создаются один раз при первом init_metrics)"""
+
+    def __init__(self):
+        from prometheus_client import Counter, Gauge, Histogram
+
+        self.request_duration = Histogram(
+            'felix_http_request_duration_seconds', 'Время обработки запроса',
+            ('endpoint', 'method')
+        )
+        self.requests = Counter(
+            'felix_http_requests_total', 'Запросы по эндпоинтам и кодам ответа',
+            ('endpoint', 'method', 'status')
+        )
+        self.db_query_duration = Histogram(
+            'felix_db_query_duration_seconds', 'Время SQL-запроса', buckets=DB_QUERY_BUCKETS
+        )
+        self.telegram_duration = Histogram(
+            'felix_telegram_send_duration_seconds', 'Время отправки сообщения Telegram', buckets=SEND_BUCKETS
+        )
+        self.telegram_failures = Counter(
+            'felix_telegram_send_failures_total', 'Неудачные отправки Telegram', ('permanent',)
+        )
+        self.print_duration = Histogram(
+            'felix_print_job_duration_seconds', 'Время печати чека', ('result',), buckets=SEND_BUCKETS
+        )
+        self.active_orders = Gauge(
+            'felix_active_orders', 'Активные заказы в очереди', multiprocess_mode='livemostrecent'
+        )
+        self.orders_created = Counter('felix_orders_created_total', 'Созданные заказы')
+
+
+_metrics = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Как в request_timing: на контексте выполнения, чтобы упавшие запросы не копились в conn.info
+    if context is not None:
+        context.metrics_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_query_started', None)
+    if started is not None:
+        _metrics.db_query_duration.observe(time.perf_counter() - started)
+
+
+def _start_request():
+    g.metrics_started_at = time.perf_counter()
+
+
+def _remember_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    # teardown_request вызывается и для необработанных исключений, когда after_request не доходит
+    started_at = g.pop('metrics_started_at', None)
+    if started_at is not None:
+        status = 500 if exc is not None else g.pop('metrics_status', 500)
+        # Несуществующие адреса - одной меткой, чтобы не плодить ряды
+        endpoint = request.endpoint or 'unmatched'
+        _metrics.request_duration.labels(endpoint, request.method).observe(time.perf_counter() - started_at)
+        _metrics.requests.labels(endpoint, request.method, str(status)).inc()
+
+
+def observe_telegram_send(seconds, success, permanent=False):
+    """Учесть попытку отправки сообщения Telegram"""
+    if _metrics is None:
+        return
+    _metrics.telegram_duration.observe(seconds)
+    if not success:
+        _metrics.telegram_failures.labels('true' if permanent else 'false').inc()
+
+
+def observe_print_job(seconds, success):
+    """Учесть попытку печати чека"""
+    if _metrics is not None:
+        _metrics.print_duration.labels('done' if success else 'error').observe(seconds)
+
+
+def count_order_created():
+    """Учесть созданный заказ (вызывается после commit)"""
+    if _metrics is not None:
+        _metrics.orders_created.inc()
+
+
+def render_metrics():
+    """Текст метрик в формате Prometheus (со всех воркеров при PROMETHEUS_MULTIPROC_DIR)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry)
+
+
+def init_metrics(app, active_orders=None):
+    """
+    Подключить метрики к приложению и зарегистрировать /metrics
+
+    Args:
+        active_orders: функция без аргументов, возвращающая длину очереди
+            активных заказов (вызывается при каждом опросе /metrics)
+
+    Returns:
+        bool: включены ли метрики
+    """
+    global _metrics
+    if not metrics_enabled():
+        return False
+    if _metrics is None:
+        _metrics = _Metrics()
+
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_remember_status)
+    app.teardown_request(_finish_request)
+
+    public = os.getenv('METRICS_PUBLIC', '').strip().lower() in ('1', 'true', 'yes', 'on')
+    if not os.getenv('METRICS_TOKEN') and not public:
+        print("⚠️ /metrics отключён: задайте METRICS_TOKEN (или METRICS_PUBLIC=true)")
+        return True
+
+    def metrics_view():
+        token = os.getenv('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        if active_orders is not None:
+            try:
+                _metrics.active_orders.set(active_orders())
+            except Exception as e:
+                print(f"⚠️ Не удалось получить длину очереди для метрик: {e}")
+        return Response(render_metrics(), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    return True
@@ -147,24 +147,101 @@ PARTS_TRANSLATIONS = {
     }
 }
 
+class TranslationMatcher:
+    """
+    Поиск перевода по словарю за один проход по названию
+    
+    Раньше find_translation проверял каждый ключ словаря двумя поисками
+    подстроки, и массовый импорт стоил O(запчасти × словарь). Теперь при
+    создании строятся два индекса:
+    - автомат Ахо-Корасик по ключам: все ключи, входящие в название,
+      находятся за один проход по названию;
+    - словарь всех подстрок ключей: ключи, в которые входит название,
+      находятся одним обращением к словарю.
+    
+    Результат тот же, что у прежнего перебора: точное совпадение, иначе
+    первый в порядке словаря ключ, который входит в название или содержит его.
+    """
+    
+    def __init__(self, translations):
+        self.translations = translations
+        self.keys = list(translations)
+        missing = len(self.keys)
+        
+        # Подстрока ключа -> наименьший номер ключа, который её содержит
+        self.containing = {}
+        for index, key in enumerate(self.keys):
+            for start in range(len(key) + 1):
+                for end in range(start, len(key) + 1):
+                    self.containing.setdefault(key[start:end], index)
+        
+        # Бор ключей; best - наименьший номер ключа, заканчивающегося в состоянии
+        goto = [{}]
+        best = [missing]
+        for index, key in enumerate(self.keys):
+            state = 0
+            for ch in key:
+                if ch not in goto[state]:
+                    goto[state][ch] = len(goto)
+                    goto.append({})
+                    best.append(missing)
+                state = goto[state][ch]
+            best[state] = min(best[state], index)
+        
+        # Ссылки неудач обходом в ширину; переходы дополняются до полного
+        # автомата, чтобы при поиске не ходить по ссылкам неудач
+        fail = [0] * len(goto)
+        self.delta = [dict(goto[0])]
+        self.delta.extend({} for _ in range(len(goto) - 1))
+        queue = list(goto[0].values())
+        for state in queue:
+            best[state] = min(best[state], best[fail[state]])
+            transitions = dict(self.delta[fail[state]])
+            for ch, next_state in goto[state].items():
+                fail[next_state] = transitions.get(ch, 0)
+                transitions[ch] = next_state
+                queue.append(next_state)
+            self.delta[state] = transitions
+        self.best = best
+        self.missing = missing
+    
+    def _first_key_inside(self, text):
+        """Наименьший номер ключа, входящего в text (len(keys) - ни одного)"""
+        delta = self.delta
+        best = self.best
+        found = best[0]
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+                if not found:
+                    break
+        return found
+    
+    def match(self, name_lower):
+        """Перевод для уже нормализованного названия или None"""
+        if name_lower in self.translations:
+            return self.translations[name_lower]
+        
+        index = min(self._first_key_inside(name_lower), self.containing.get(name_lower, self.missing))
+        if index == self.missing:
+            return None
+        return self.translations[self.keys[index]]
+
+
+# Индекс строится один раз при импорте; после изменения PARTS_TRANSLATIONS
+# его нужно пересоздать
+_matcher = TranslationMatcher(PARTS_TRANSLATIONS)
+
+
 def find_translation(part_name):
     """Найти перевод для запчасти"""
     if not part_name:
         return None
     
     # Приводим к нижнему регистру для поиска
-    name_lower = part_name.lower().strip()
-    
-    # Точное совпадение
-    if name_lower in PARTS_TRANSLATIONS:
-        return PARTS_TRANSLATIONS[name_lower]
-    
-    # Частичное совпадение
-    for key, translation in PARTS_TRANSLATIONS.items():
-        if key in name_lower or name_lower in key:
-            return translation
-    
-    return None
+    return _matcher.match(part_name.lower().strip())
 
 def migrate_parts_translations():
     """Миграция переводов запчастей"""
@@ -204,6 +281,8 @@ def migrate_parts_translations():
     
     # Сохраняем изменения
     if updated_count > 0:
+        from catalog_cache import bump_catalog_version
+        bump_catalog_version()
         db.session.commit()
         print(f"✅ Обновлено запчастей: {updated_count}")
     else:
@@ -84,6 +84,8 @@ def migrate_category_translations():
     
     # Сохраняем изменения
     if updated_count > 0:
+        from catalog_cache import bump_catalog_version
+        bump_catalog_version()
         db.session.commit()
         print(f"✅ Обновлено категорий: {updated_count}")
     else:
@@ -9,6 +9,8 @@
 
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, inspect, select, union_all
+from sqlalchemy.orm import Session, validates
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -58,22 +60,10 @@ class Mechanic(UserMixin, db.Model):
         db.session.commit()
     
     def get_order_stats(self):
-        """Получить статистику заказов механика"""
-        total_orders = self.orders.count()
-        new_orders = self.orders.filter_by(status='новый').count()
-        processing_orders = self.orders.filter_by(status='в работе').count()
-        ready_orders = self.orders.filter_by(status='готово').count()
-        completed_orders = self.orders.filter_by(status='выдано').count()
-        
-        return {
-            'total': total_orders,
-            'new': new_orders,
-            'processing': processing_orders,
-            'ready': ready_orders,
-            'completed': completed_orders
-        }
+        """Получить статистику заказов механика (один запрос)"""
+        return get_mechanics_order_stats([self.id])[self.id]
     
-    def to_dict(self, include_stats=False):
+    def to_dict(self, include_stats=False, stats=None):
         """Преобразовать в словарь для API"""
         data = {
             'id': self.id,
@@ -93,7 +83,8 @@ class Mechanic(UserMixin, db.Model):
         }
         
         if include_stats:
-            data['stats'] = self.get_order_stats()
+            # stats можно передать заранее посчитанными (get_mechanics_order_stats)
+            data['stats'] = stats if stats is not None else self.get_order_stats()
         
         return data
     
@@ -101,6 +92,50 @@ class Mechanic(UserMixin, db.Model):
         return f'<Mechanic {self.username}>'
 
 
+def _empty_mechanic_stats():
+    return {'total': 0, 'new': 0, 'processing': 0, 'ready': 0, 'completed': 0}
+
+
+# Статус заказа -> ключ в статистике механика
+_MECHANIC_STATS_KEYS = {
+    'новый': 'new',
+    'в работе': 'processing',
+    'готово': 'ready',
+    'выдано': 'completed'
+}
+
+
+def get_mechanics_order_stats(mechanic_ids):
+    """
+    Статистика заказов сразу для нескольких механиков одним запросом
+    (GROUP BY mechanic_id, status)
+    
+    Args:
+        mechanic_ids: список id механиков
+    
+    Returns:
+        dict: {mechanic_id: {'total', 'new', 'processing', 'ready', 'completed'}}
+    """
+    mechanic_ids = list(mechanic_ids)
+    stats = {mechanic_id: _empty_mechanic_stats() for mechanic_id in mechanic_ids}
+    if not mechanic_ids:
+        return stats
+    
+    rows = db.session.query(
+        Order.mechanic_id, Order.status, db.func.count(Order.id)
+    ).filter(
+        Order.mechanic_id.in_(mechanic_ids)
+    ).group_by(Order.mechanic_id, Order.status).all()
+    
+    for mechanic_id, status, count in rows:
+        item = stats[mechanic_id]
+        item['total'] += count
+        key = _MECHANIC_STATS_KEYS.get(status)
+        if key:
+            item[key] += count
+    return stats
+
+
 class Category(db.Model):
     """
     Модель категории запчастей с многоязычной поддержкой
@@ -133,12 +168,16 @@ class Category(db.Model):
         # Fallback на основное имя
         return self.name
     
-    def to_dict(self, lang=None):
-        """Преобразовать в словарь для API"""
-        # Подсчитываем количество запчастей в категории
-        parts_count = Part.query.filter_by(category=self.name).count()
-        active_parts_count = Part.query.filter_by(category=self.name, is_active=True).count()
+    def to_dict(self, lang=None, part_counts=None, include_counts=True):
+        """
+        Преобразовать в словарь для API
         
+        Args:
+            lang: язык локализованного имени
+            part_counts: заранее посчитанные счётчики (get_category_part_counts);
+                         без них считаются отдельным запросом для этой категории
+            include_counts: False - не добавлять parts_count / active_parts_count
+        """
         # Базовые данные со всеми языками
         data = {
             'id': self.id,
@@ -148,12 +187,17 @@ class Category(db.Model):
             'name_ru': self.name_ru,
             'is_active': self.is_active,
             'sort_order': self.sort_order,
-            'parts_count': parts_count,
-            'active_parts_count': active_parts_count,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
         }
         
+        if include_counts:
+            if part_counts is None:
+                part_counts = get_category_part_counts([self.name])
+            counts = part_counts.get(self.name, _EMPTY_PART_COUNTS)
+            data['parts_count'] = counts['total']
+            data['active_parts_count'] = counts['active']
+        
         # Если указан язык, добавляем локализованное имя
         if lang:
             data['name'] = self.get_name(lang)
@@ -164,11 +208,96 @@ class Category(db.Model):
         return f'<Category {self.name}>'
 
 
+CATEGORY_ALIAS_FIELDS = ('name', 'name_ru', 'name_en', 'name_he')
+
+
+class CategoryAlias(db.Model):
+    """
+    Индекс названий категорий: любое название (name / name_ru / name_en / name_he) -> категория
+    
+    Заказы хранят категорию в том виде, в каком её выбрал механик (часто
+    перевод), а индексирован только Category.name. Таблица пересобирается
+    автоматически при каждом flush, меняющем названия категорий. Если одно
+    название есть у нескольких категорий, берётся категория с меньшим id.
+    """
+    __tablename__ = 'category_aliases'
+    
+    alias = db.Column(db.String(120), primary_key=True)
+    category_id = db.Column(
+        db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    
+    def __repr__(self):
+        return f'<CategoryAlias {self.alias} -> {self.category_id}>'
+
+
+def rebuild_category_aliases(connection=None):
+    """Пересобрать category_aliases одним INSERT ... SELECT по таблице categories"""
+    connection = connection if connection is not None else db.session.connection()
+    categories = Category.__table__
+    aliases = CategoryAlias.__table__
+    names = union_all(*(
+        select(categories.c[field].label('alias'), categories.c.id.label('category_id'))
+        .where(categories.c[field].isnot(None), categories.c[field] != '')
+        for field in CATEGORY_ALIAS_FIELDS
+    )).subquery()
+    connection.execute(aliases.delete())
+    connection.execute(aliases.insert().from_select(
+        ['alias', 'category_id'],
+        select(names.c.alias, func.min(names.c.category_id)).group_by(names.c.alias)
+    ))
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_category_aliases(session, flush_context):
+    changed = any(isinstance(obj, Category) for obj in session.new) or \
+        any(isinstance(obj, Category) for obj in session.deleted)
+    if not changed:
+        for obj in session.dirty:
+            if isinstance(obj, Category):
+                state = inspect(obj)
+                if any(state.attrs[field].history.has_changes() for field in CATEGORY_ALIAS_FIELDS):
+                    changed = True
+                    break
+    if changed:
+        rebuild_category_aliases(session.connection())
+
+
+_EMPTY_PART_COUNTS = {'total': 0, 'active': 0}
+
+
+def get_category_part_counts(category_names=None):
+    """
+    Количество запчастей по категориям одним запросом (GROUP BY category, is_active)
+    
+    Args:
+        category_names: ограничить этими категориями (None - все)
+    
+    Returns:
+        dict: {имя категории: {'total': всего, 'active': активных}}
+    """
+    query = db.session.query(Part.category, Part.is_active, db.func.count(Part.id))
+    if category_names is not None:
+        query = query.filter(Part.category.in_(list(category_names)))
+    
+    counts = {}
+    for category, is_active, count in query.group_by(Part.category, Part.is_active).all():
+        item = counts.setdefault(category, {'total': 0, 'active': 0})
+        item['total'] += count
+        if is_active:
+            item['active'] += count
+    return counts
+
+
 class Part(db.Model):
     """
     Модель запчасти в справочнике с многоязычной поддержкой
     """
     __tablename__ = 'parts'
+    __table_args__ = (
+        # Импорт из файла: поиск существующей запчасти по (category, name_ru)
+        db.Index('ix_parts_category_name_ru', 'category', 'name_ru'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -250,6 +379,23 @@ class Part(db.Model):
         return f'<Part {self.name_ru or self.name}>'
 
 
+class CatalogState(db.Model):
+    """
+    Версия справочника запчастей и категорий
+    
+    Единственная строка (id=1). Счётчик увеличивается при каждом изменении
+    справочника, чтобы все воркеры знали, когда пересобрать кэш каталога.
+    """
+    __tablename__ = 'catalog_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CatalogState v{self.version}>'
+
+
 class Order(db.Model):
     """
     Модель заказа запчастей
@@ -257,6 +403,12 @@ class Order(db.Model):
     v2.2: Добавлена связь с Mechanic
     """
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Курсорная пагинация: поиск по (created_at, id) без OFFSET
+        db.Index('ix_orders_created_at_id', 'created_at', 'id'),
+        # Статистика механиков: GROUP BY mechanic_id, status
+        db.Index('ix_orders_mechanic_id_status', 'mechanic_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -270,6 +422,8 @@ class Order(db.Model):
     # Данные заказа
     category = db.Column(db.String(120), nullable=False)
     plate_number = db.Column(db.String(20), nullable=False, index=True)
+    # Гос номер без разделителей в верхнем регистре - для поиска (plate_search.py)
+    plate_normalized = db.Column(db.String(20), index=True)
     selected_parts = db.Column(db.JSON)
     is_original = db.Column(db.Boolean, default=False)
     photo_url = db.Column(db.String(250))
@@ -279,164 +433,569 @@ class Order(db.Model):
     status = db.Column(db.String(50), default='новый', index=True)
     printed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Расчетное время готовности заказа (новое в v2.3)
     estimated_ready_at = db.Column(db.DateTime, nullable=True)
+    # Когда заказ перешёл в статус 'готово' - история для модели ETA (eta_model.py)
+    ready_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    # Позиции заказа в нормализованном виде (дублируют selected_parts)
+    items = db.relationship(
+        'OrderItem',
+        backref='order',
+        order_by='OrderItem.position',
+        cascade='all, delete-orphan'
+    )
+    
+    @validates('plate_number')
+    def _sync_plate_normalized(self, key, value):
+        self.plate_normalized = normalize_plate(value)
+        return value
+    
+    @validates('status')
+    def _stamp_ready_at(self, key, value):
+        if value == 'готово' and self.status != 'готово':
+            self.ready_at = datetime.utcnow()
+        return value
     
     def to_dict(self, include_mechanic=False, lang=None):
         """Преобразовать в словарь для API"""
-        category_name = self.category
-        category_obj = Category.query.filter(
-            (Category.name == self.category) |
-            (Category.name_ru == self.category) |
-            (Category.name_en == self.category) |
-            (Category.name_he == self.category)
-        ).first()
-        category_raw = category_obj.name if category_obj else self.category
+        return serialize_orders([self], lang=lang, include_mechanic=include_mechanic)[0]
+    
+    def __repr__(self):
+        return f'<Order {self.id} - {self.mechanic_name}>'
 
-        if lang and category_obj:
-            category_name = category_obj.get_name(lang)
+
+class OrderItem(db.Model):
+    """
+    Позиция заказа (нормализованная копия элемента Order.selected_parts)
+    
+    Пока selected_parts остаётся основным форматом, таблица заполняется
+    двойной записью (order_items.py) и позволяет считать и фильтровать
+    заказы по запчастям средствами SQL.
+    """
+    __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order_id_position', 'order_id', 'position'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    part_id = db.Column(db.Integer, index=True)
+    
+    # Название на момент заказа (запчасть могли переименовать или удалить)
+    name = db.Column(db.String(250), nullable=False, default='')
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    is_original = db.Column(db.Boolean)
+    is_label = db.Column(db.Boolean, nullable=False, default=False)
+    added_by_mechanic = db.Column(db.Boolean, nullable=False, default=False)
+    added_at = db.Column(db.DateTime)
+    
+    # Порядковый номер позиции в заказе
+    position = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def from_selected_part(cls, part, position):
+        """Создать позицию из элемента selected_parts (строка или словарь)"""
+        if not isinstance(part, dict):
+            name = str(part or '').strip()[:250]
+            return cls(name=name, quantity=1, is_label=_is_no_additives(name), position=position)
         
-        def translate_no_additives(target_lang):
-            if target_lang == 'he':
-                return 'ללא תוספים'
-            if target_lang == 'en':
-                return 'NO ADDITIVES'
-            return 'БЕЗ ПРИСАДОК'
-
-        no_additives_aliases_cf = {
-            'no_additives',
-            'без присадок',
-            'без добавок',
-            'no additives',
-            'ללא תוספים',
+        try:
+            quantity = int(part.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 1
+        
+        added_at = None
+        if part.get('added_at'):
+            try:
+                added_at = datetime.strptime(str(part['added_at']), '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                added_at = None
+        
+        name = str(part.get('name') or '').strip()[:250]
+        part_id = _coerce_part_id(part.get('part_id'))
+        return cls(
+            part_id=part_id,
+            name=name,
+            quantity=quantity if quantity > 0 else 1,
+            is_original=bool(part['is_original']) if 'is_original' in part else None,
+            is_label=bool(part.get('is_label')) or (not part_id and _is_no_additives(name)),
+            added_by_mechanic=bool(part.get('added_by_mechanic')),
+            added_at=added_at,
+            position=position
+        )
+    
+    def __repr__(self):
+        return f'<OrderItem {self.order_id}#{self.position} {self.name}>'
+
+
+class OrderPlateNgram(db.Model):
+    """
+    Триграммы нормализованного гос номера заказа
+    
+    Индекс для поиска по подстроке номера на БД без pg_trgm (SQLite).
+    На PostgreSQL вместо этой таблицы используется GIN-индекс gin_trgm_ops.
+    """
+    __tablename__ = 'order_plate_ngrams'
+    
+    gram = db.Column(db.String(3), primary_key=True)
+    order_id = db.Column(db.Integer, primary_key=True)
+
+
+class OrderTombstone(db.Model):
+    """
+    Отметка об удалённом заказе
+    
+    Нужна ленте изменений (/api/orders/changes), чтобы клиенты узнали
+    об удалении заказа, которого больше нет в таблице orders.
+    """
+    __tablename__ = 'order_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False)
+    mechanic_id = db.Column(db.Integer, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<OrderTombstone {self.order_id}>'
+
+
+class NotificationOutbox(db.Model):
+    """
+    Исходящее уведомление Telegram
+    
+    Запись добавляется в той же транзакции, что и изменение заказа,
+    а отправляет её фоновый обработчик (notification_outbox.py).
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.String(50), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    
+    # pending - ждёт отправки, sent - отправлено, failed - попытки исчерпаны
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} {self.status}>'
+
+
+class PrintJob(db.Model):
+    """
+    Задание на печать чека на термопринтере
+    
+    Чек формируется при постановке в очередь, а печатает его фоновый
+    обработчик (print_queue.py), чтобы запрос администратора не ждал принтер.
+    """
+    __tablename__ = 'print_jobs'
+    __table_args__ = (
+        db.Index('ix_print_jobs_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Без внешнего ключа: история печати остаётся и после удаления заказа
+    order_id = db.Column(db.Integer, index=True)
+    receipt = db.Column(db.Text, nullable=False)
+    
+    # queued - в очереди, printing - печатается, done - напечатан, failed - попытки исчерпаны
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    # auto - при переходе в "готово", manual - кнопка печати, reprint - повторная печать
+    source = db.Column(db.String(20), nullable=False, default='manual')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Преобразовать в словарь для API"""
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'status': self.status,
+            'source': self.source,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<PrintJob {self.id} order={self.order_id} {self.status}>'
+
+
+class OrderEvent(db.Model):
+    """
+    Событие жизненного цикла заказа (журнал только на добавление)
+
+    Пишется в той же транзакции, что и изменение заказа (order_event_log.py):
+    создание, смена статуса, отмена механиком, добавление запчасти.
+    """
+    __tablename__ = 'order_events'
+    __table_args__ = (
+        db.Index('ix_order_events_order_id_id', 'order_id', 'id'),
+        db.Index('ix_order_events_to_status_created_at', 'to_status', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Без внешнего ключа: история остаётся и после удаления заказа
+    order_id = db.Column(db.Integer, nullable=False)
+    # order_created / status_changed / order_cancelled / part_added
+    event = db.Column(db.String(30), nullable=False)
+    from_status = db.Column(db.String(50))
+    to_status = db.Column(db.String(50))
+    # admin, mechanic:<id> или api
+    actor = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def to_dict(self):
+        """Преобразовать в словарь для API"""
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'event': self.event,
+            'from_status': self.from_status,
+            'to_status': self.to_status,
+            'actor': self.actor,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
+    def __repr__(self):
+        return f'<OrderEvent {self.order_id} {self.from_status} -> {self.to_status}>'
+
+
+# ============================================================================
+# ПАКЕТНАЯ СЕРИАЛИЗАЦИЯ ЗАКАЗОВ
+# ============================================================================
+
+NO_ADDITIVES_ALIASES_CF = {
+    'no_additives',
+    'без присадок',
+    'без добавок',
+    'no additives',
+    'ללא תוספים',
+}
+
+
+def _translate_no_additives(target_lang):
+    if target_lang == 'he':
+        return 'ללא תוספים'
+    if target_lang == 'en':
+        return 'NO ADDITIVES'
+    return 'БЕЗ ПРИСАДОК'
+
+
+def _is_no_additives(name):
+    if not isinstance(name, str):
+        return False
+    stripped = name.strip()
+    return stripped == 'no_additives' or stripped.casefold() in NO_ADDITIVES_ALIASES_CF
+
+
+def normalize_plate(plate_number):
+    """Гос номер для поиска: только буквы и цифры, верхний регистр ("12-345-67" -> "1234567")"""
+    if not plate_number:
+        return ''
+    return ''.join(ch for ch in str(plate_number).upper() if ch.isalnum())
+
+
+def _coerce_part_id(part_id):
+    if isinstance(part_id, bool):
+        return None
+    if isinstance(part_id, int):
+        return part_id
+    if isinstance(part_id, str) and part_id.isdigit():
+        return int(part_id)
+    return None
+
+
+def build_sort_map(parts_in_category):
+    """Построить (id -> порядок, имя -> порядок, максимальный порядок) для категории"""
+    id_to_order = {p.id: (p.sort_order if p.sort_order is not None else 0) for p in parts_in_category}
+    name_to_order = {}
+    for p in parts_in_category:
+        order_val = p.sort_order if p.sort_order is not None else 0
+        for nm in (p.name_ru, p.name_en, p.name_he, p.name):
+            if nm:
+                name_to_order[nm] = order_val
+    max_order = max([o for o in id_to_order.values()] + [0])
+    return id_to_order, name_to_order, max_order
+
+
+def sort_by_sort_map(items, sort_map):
+    id_to_order, name_to_order, max_order = sort_map
+
+    def sort_key(item, idx):
+        if isinstance(item, dict):
+            pid = item.get('part_id')
+            if isinstance(pid, str) and pid.isdigit():
+                pid = int(pid)
+            nm = item.get('name')
+            if pid in id_to_order:
+                return (id_to_order[pid], idx)
+            if nm in name_to_order:
+                return (name_to_order[nm], idx)
+            return (max_order + 1, idx)
+        if item in name_to_order:
+            return (name_to_order[item], idx)
+        return (max_order + 1, idx)
+
+    return [x for _, x in sorted([(sort_key(it, i), it) for i, it in enumerate(items)], key=lambda t: t[0])]
+
+
+def normalize_selected_parts(selected_parts):
+    """
+    Привести selected_parts из формы заказа к формату словарей
+
+    Строки (старый формат) становятся {'name', 'quantity': 1}, метка
+    "без присадок" в любом написании - {'name': 'no_additives', 'is_label': True}.
+    """
+    normalized_parts = []
+    for part in selected_parts:
+        if isinstance(part, str):
+            part_name = part.strip()
+            if part_name == 'no_additives' or part_name.casefold() in NO_ADDITIVES_ALIASES_CF:
+                normalized_parts.append({'name': 'no_additives', 'quantity': 1, 'is_label': True})
+            else:
+                normalized_parts.append({'name': part, 'quantity': 1})
+        elif isinstance(part, dict):
+            part_name = (part.get('name', '') or '').strip()
+            part_id = part.get('part_id')
+            is_label = bool(part.get('is_label')) or (
+                not part_id and (part_name == 'no_additives' or part_name.casefold() in NO_ADDITIVES_ALIASES_CF)
+            )
+            if is_label:
+                normalized_parts.append({'name': 'no_additives', 'quantity': int(part.get('quantity', 1)), 'is_label': True})
+                continue
+
+            part_entry = {'name': part.get('name', ''), 'quantity': int(part.get('quantity', 1))}
+            # part_id сохраняется для последующего перевода
+            if 'part_id' in part:
+                part_entry['part_id'] = part['part_id']
+            if 'is_original' in part:
+                part_entry['is_original'] = bool(part['is_original'])
+            normalized_parts.append(part_entry)
+    return normalized_parts
+
+
+def collect_part_ids(orders):
+    """id запчастей из selected_parts заказов"""
+    part_ids = set()
+    for order in orders:
+        for part in (order.selected_parts or []):
+            if isinstance(part, dict):
+                part_id = _coerce_part_id(part.get('part_id'))
+                if part_id is not None:
+                    part_ids.add(part_id)
+    return part_ids
+
+
+def localize_selected_parts(selected_parts, part_names, no_additives_label):
+    """
+    Позиции заказа с названиями на языке интерфейса
+
+    Args:
+        part_names: {id запчасти: название на нужном языке}
+        no_additives_label: переведённая метка "без присадок"
+    """
+    localized_parts = []
+    for part in (selected_parts or []):
+        if isinstance(part, dict):
+            part_name = (part.get('name') or '').strip()
+            if (bool(part.get('is_label')) and not part.get('part_id')) or (
+                part_name == 'no_additives' or part_name.casefold() in NO_ADDITIVES_ALIASES_CF
+            ):
+                localized_part = dict(part)
+                localized_part['name'] = no_additives_label
+                localized_parts.append(localized_part)
+                continue
+
+            localized_part = dict(part)
+            part_id = _coerce_part_id(part.get('part_id'))
+            translated_name = part_names.get(part_id) if part_id else None
+            if translated_name:
+                localized_part['name'] = translated_name
+            localized_parts.append(localized_part)
+        elif _is_no_additives(part):
+            localized_parts.append(no_additives_label)
+        else:
+            localized_parts.append(part)
+    return localized_parts
+
+
+def _copy_part_flags(source, item):
+    if 'is_original' in source:
+        item['is_original'] = source['is_original']
+    if source.get('added_by_mechanic') is not None:
+        item['added_by_mechanic'] = source.get('added_by_mechanic')
+    if source.get('added_at'):
+        item['added_at'] = source.get('added_at')
+    return item
+
+
+def serialize_orders(orders, lang=None, include_mechanic=False, catalog=None):
+    """
+    Сериализовать список заказов для API за фиксированное число запросов.
+    
+    Все категории, запчасти и карты сортировки, на которые ссылаются заказы,
+    загружаются заранее (по одному запросу на каждый вид данных), поэтому
+    стоимость не зависит от количества заказов и выбранных деталей.
+    Если передан снимок каталога, они берутся из него без запросов к БД.
+    
+    Args:
+        orders: список объектов Order
+        lang: язык перевода ('ru', 'en', 'he') или None
+        include_mechanic: добавить краткую информацию о механике
+        catalog: снимок каталога (catalog_cache.CatalogSnapshot) или None
+    
+    Returns:
+        list: словари в формате Order.to_dict()
+    """
+    orders = list(orders)
+    if not orders:
+        return []
+
+    # 1. Категории: по индексу названий (name / name_ru / name_en / name_he)
+    aliases = {o.category for o in orders if o.category}
+    categories_by_alias = {}
+    if catalog is not None:
+        for alias in aliases:
+            cat = catalog.resolve_category(alias)
+            if cat is not None:
+                categories_by_alias[alias] = cat
+    elif aliases:
+        matched = (
+            db.session.query(CategoryAlias.alias, Category)
+            .join(Category, Category.id == CategoryAlias.category_id)
+            .filter(CategoryAlias.alias.in_(aliases))
+            .all()
+        )
+        categories_by_alias = dict(matched)
+
+    # 2. Запчасти, на которые есть ссылки по part_id
+    part_ids = set()
+    for order in orders:
+        for part in (order.selected_parts or []):
+            if isinstance(part, dict) and part.get('part_id'):
+                pid = _coerce_part_id(part.get('part_id'))
+                if pid is not None:
+                    part_ids.add(pid)
+    parts_by_id = {}
+    if catalog is not None:
+        parts_by_id = catalog.parts_by_id
+    elif part_ids:
+        parts_by_id = {p.id: p for p in Part.query.filter(Part.id.in_(part_ids)).all()}
+
+    # 3. Карты сортировки для всех задействованных категорий
+    raw_categories = set()
+    for order in orders:
+        cat = categories_by_alias.get(order.category)
+        raw_categories.add(cat.name if cat else order.category)
+    if catalog is not None:
+        sort_maps = {name: catalog.get_sort_map(name) for name in raw_categories}
+    else:
+        parts_by_category = {name: [] for name in raw_categories}
+        if raw_categories:
+            for p in Part.query.filter(Part.category.in_(raw_categories)).all():
+                parts_by_category.setdefault(p.category, []).append(p)
+        sort_maps = {name: build_sort_map(items) for name, items in parts_by_category.items()}
+
+    # 4. Механики (только если нужны)
+    mechanics_by_id = {}
+    if include_mechanic:
+        mechanic_ids = {o.mechanic_id for o in orders if o.mechanic_id}
+        if mechanic_ids:
+            mechanics_by_id = {m.id: m for m in Mechanic.query.filter(Mechanic.id.in_(mechanic_ids)).all()}
+
+    part_lang = lang if lang else 'ru'
+    result = []
+    for order in orders:
+        category_obj = categories_by_alias.get(order.category)
+        category_raw = category_obj.name if category_obj else order.category
+        category_name = order.category
+        if lang and category_obj:
+            category_name = category_obj.get_name(lang)
+
         # Обработка selected_parts с переводом
         selected_parts_translated = []
-        for part in (self.selected_parts or []):
+        for part in (order.selected_parts or []):
             if isinstance(part, dict):
                 part_id = part.get('part_id')
                 quantity = part.get('quantity', 1)
-                added_flag = part.get('added_by_mechanic')
-                added_at = part.get('added_at')
-                
-                # Если есть part_id, получаем название на нужном языке
                 if part_id:
-                    part_obj = Part.query.get(part_id)
+                    part_obj = parts_by_id.get(_coerce_part_id(part_id))
                     if part_obj:
-                        part_name = part_obj.get_name(lang) if lang else part_obj.get_name('ru')
                         item = {
                             'part_id': part_id,
-                            'name': part_name,
+                            'name': part_obj.get_name(part_lang),
                             'quantity': quantity
                         }
-                        # Копируем is_original для каждой детали
-                        if 'is_original' in part:
-                            item['is_original'] = part['is_original']
-                        if added_flag is not None:
-                            item['added_by_mechanic'] = added_flag
-                        if added_at:
-                            item['added_at'] = added_at
-                        selected_parts_translated.append(item)
                     else:
                         # Если запчасть не найдена, используем старое название
                         item = {
                             'name': part.get('name', 'Unknown'),
                             'quantity': quantity
                         }
-                        # Копируем is_original для каждой детали
-                        if 'is_original' in part:
-                            item['is_original'] = part['is_original']
-                        if added_flag is not None:
-                            item['added_by_mechanic'] = added_flag
-                        if added_at:
-                            item['added_at'] = added_at
-                        selected_parts_translated.append(item)
                 else:
                     # Старый формат без part_id
-                    if isinstance(part, dict):
-                        raw_name = part.get('name', '')
-                        name = raw_name
-                        if isinstance(raw_name, str) and (raw_name.strip() == 'no_additives' or raw_name.strip().casefold() in no_additives_aliases_cf):
-                            name = translate_no_additives(lang)
-                        item = {
-                            'name': name,
-                            'quantity': quantity
-                        }
-                        # Копируем is_original для каждой детали
-                        if 'is_original' in part:
-                            item['is_original'] = part['is_original']
-                        if added_flag is not None:
-                            item['added_by_mechanic'] = added_flag
-                        if added_at:
-                            item['added_at'] = added_at
-                        selected_parts_translated.append(item)
-                    else:
-                        selected_parts_translated.append(part)
-            else:
+                    raw_name = part.get('name', '')
+                    item = {
+                        'name': _translate_no_additives(lang) if _is_no_additives(raw_name) else raw_name,
+                        'quantity': quantity
+                    }
+                selected_parts_translated.append(_copy_part_flags(part, item))
+            elif _is_no_additives(part):
                 # Совсем старый формат (просто строка)
-                if isinstance(part, str) and (part.strip() == 'no_additives' or part.strip().casefold() in no_additives_aliases_cf):
-                    selected_parts_translated.append(translate_no_additives(lang))
-                else:
-                    selected_parts_translated.append(part)
+                selected_parts_translated.append(_translate_no_additives(lang))
+            else:
+                selected_parts_translated.append(part)
 
         # Сортировка по порядковому номеру из БД
         try:
-            parts_in_category = Part.query.filter_by(category=category_raw).all()
-            id_to_order = {p.id: (p.sort_order if p.sort_order is not None else 0) for p in parts_in_category}
-            name_to_order = {}
-            for p in parts_in_category:
-                for nm in [p.name_ru, p.name_en, p.name_he, p.name]:
-                    if nm:
-                        name_to_order[nm] = (p.sort_order if p.sort_order is not None else 0)
-            max_order = max([o for o in id_to_order.values()] + [0])
-            def sort_key(item, idx):
-                if isinstance(item, dict):
-                    pid = item.get('part_id')
-                    nm = item.get('name')
-                    if isinstance(pid, str) and pid.isdigit():
-                        pid = int(pid)
-                    if pid in id_to_order:
-                        return (id_to_order[pid], idx)
-                    if nm in name_to_order:
-                        return (name_to_order[nm], idx)
-                    return (max_order + 1, idx)
-                else:
-                    if item in name_to_order:
-                        return (name_to_order[item], idx)
-                    return (max_order + 1, idx)
-            selected_parts_translated = [x for _, x in sorted([(sort_key(it, i), it) for i, it in enumerate(selected_parts_translated)], key=lambda t: t[0])]
+            selected_parts_translated = sort_by_sort_map(selected_parts_translated, sort_maps[category_raw])
         except Exception:
             pass
-        
+
         data = {
-            'id': self.id,
-            'mechanic_name': self.mechanic_name,
-            'telegram_id': self.telegram_id,
+            'id': order.id,
+            'mechanic_name': order.mechanic_name,
+            'telegram_id': order.telegram_id,
             'category': category_name,
             'category_raw': category_raw,
-            'plate_number': self.plate_number,
+            'plate_number': order.plate_number,
             'selected_parts': selected_parts_translated,
-            'is_original': self.is_original,
-            'photo_url': self.photo_url,
-            'comment': self.comment,
-            'status': self.status,
-            'printed': self.printed,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            'is_original': order.is_original,
+            'photo_url': order.photo_url,
+            'comment': order.comment,
+            'status': order.status,
+            'printed': order.printed,
+            'created_at': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'updated_at': order.updated_at.strftime('%Y-%m-%d %H:%M:%S')
         }
-        
+
         # Добавить информацию о механике, если он есть
-        if include_mechanic and self.mechanic:
+        mechanic = mechanics_by_id.get(order.mechanic_id) if include_mechanic else None
+        if mechanic:
             data['mechanic'] = {
-                'id': self.mechanic.id,
-                'username': self.mechanic.username,
-                'full_name': self.mechanic.full_name
+                'id': mechanic.id,
+                'username': mechanic.username,
+                'full_name': mechanic.full_name
             }
-        
-        return data
-    
-    def __repr__(self):
-        return f'<Order {self.id} - {self.mechanic_name}>'
+
+        result.append(data)
+
+    return result
@@ -0,0 +1,281 @@
+"""
+Очередь исходящих уведомлений Telegram (outbox) для Felix Hub
+
+Обработчики запросов не ходят в Telegram сами: enqueue_telegram_message()
+добавляет строку в notification_outbox в той же транзакции, что и изменение
+заказа (уведомление не уйдёт, если транзакция откатилась, и не потеряется,
+если процесс упал после commit). Фоновый поток воркера забирает ожидающие
+записи и отправляет их через общий requests.Session с keep-alive,
+таймаутами, повторами соединения и экспоненциальной паузой между попытками.
+
+Записи захватываются "арендой": next_attempt_at сдвигается на
+NOTIFICATION_LEASE_SECONDS вперёд в короткой транзакции, поэтому несколько
+воркеров gunicorn не отправят одно сообщение дважды, а запись, чей воркер
+умер во время отправки, будет повторена после истечения аренды.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from urllib3.util.retry import Retry
+
+from env_config import env_float, env_int
+from metrics import observe_telegram_send
+from models import db, NotificationOutbox
+
+# TELEGRAM_API_BASE позволяет направить отправку на заглушку (нагрузочный тест, офлайн-разработка)
+TELEGRAM_API_URL = '{base}/bot{token}/sendMessage'
+
+
+def create_http_session():
+    """
+    HTTP-сессия для Telegram API
+
+    Повторяются только ошибки соединения и ответы 502/503/504: повтор после
+    таймаута чтения мог бы отправить сообщение дважды.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        status=2,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry)
+    http = requests.Session()
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+
+def deliver_telegram_message(http, chat_id, text):
+    """
+    Отправить одно сообщение
+
+    Returns:
+        tuple: (успех, текст ошибки, пауза до повтора в секундах или None,
+                True если повторять бесполезно)
+    """
+    token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not token:
+        return False, 'TELEGRAM_BOT_TOKEN не настроен', None, False
+
+    timeout = (
+        env_float('TELEGRAM_CONNECT_TIMEOUT', 3.05),
+        env_float('TELEGRAM_READ_TIMEOUT', 10)
+    )
+    try:
+        response = http.post(
+            TELEGRAM_API_URL.format(base=os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org').rstrip('/'), token=token),
+            data={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'},
+            timeout=timeout
+        )
+    except requests.RequestException as e:
+        return False, str(e), None, False
+
+    if response.status_code == 200:
+        return True, None, None, False
+
+    retry_after = None
+    try:
+        body = response.json()
+        description = body.get('description') or response.text
+        retry_after = (body.get('parameters') or {}).get('retry_after')
+    except ValueError:
+        description = response.text
+    error = f'HTTP {response.status_code}: {description[:500]}'
+
+    # 4xx (кроме 429 Too Many Requests) - неверный chat_id, заблокированный бот и т.п.
+    permanent = 400 <= response.status_code < 500 and response.status_code != 429
+    return False, error, retry_after, permanent
+
+
+def enqueue_telegram_message(chat_id, text):
+    """
+    Поставить сообщение в очередь (в текущей транзакции, без commit)
+
+    Args:
+        chat_id: Telegram chat_id получателя
+        text: текст сообщения (HTML)
+    """
+    db.session.add(NotificationOutbox(chat_id=str(chat_id), text=text))
+    db.session.info['outbox_enqueued'] = True
+
+
+def _retry_delay(attempts, retry_after=None):
+    if retry_after:
+        return float(retry_after)
+    base = env_float('NOTIFICATION_BACKOFF_SECONDS', 5)
+    return min(base * (2 ** max(attempts - 1, 0)), env_float('NOTIFICATION_BACKOFF_MAX_SECONDS', 3600))
+
+
+class NotificationWorker:
+    """Фоновый поток отправки уведомлений для одного приложения внутри воркера"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.http = None
+        self.cleaned_at = None
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+                self.thread.start()
+
+    def notify(self):
+        self.ensure_started()
+        self.wakeup.set()
+
+    def _run(self):
+        self.http = create_http_session()
+        poll_seconds = env_float('NOTIFICATION_POLL_SECONDS', 5)
+        while True:
+            self.wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while self.process_batch():
+                        pass
+                    self._cleanup()
+            except Exception as e:
+                print(f"❌ Ошибка обработки очереди уведомлений: {e}")
+            self.wakeup.wait(poll_seconds)
+
+    def _claim_batch(self):
+        """Захватить пачку готовых к отправке записей"""
+        now = datetime.utcnow()
+        batch_size = env_int('NOTIFICATION_BATCH_SIZE', 20)
+        try:
+            rows = (
+                NotificationOutbox.query
+                .filter(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now)
+                .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            lease_until = now + timedelta(seconds=env_float('NOTIFICATION_LEASE_SECONDS', 120))
+            claimed = []
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = lease_until
+                claimed.append((row.id, row.chat_id, row.text, row.attempts))
+            db.session.commit()
+            return claimed
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+    def process_batch(self):
+        """
+        Отправить одну пачку
+
+        Returns:
+            int: сколько записей было обработано (0 - очередь пуста)
+        """
+        claimed = self._claim_batch()
+        if not claimed:
+            return 0
+
+        max_attempts = env_int('NOTIFICATION_MAX_ATTEMPTS', 8)
+        results = []
+        for row_id, chat_id, text, attempts in claimed:
+            started_at = time.perf_counter()
+            ok, error, retry_after, permanent = deliver_telegram_message(self.http, chat_id, text)
+            observe_telegram_send(time.perf_counter() - started_at, ok, permanent)
+            results.append((row_id, attempts, ok, error, retry_after, permanent))
+            if not ok:
+                print(f"⚠️ Уведомление {row_id} не отправлено (попытка {attempts}): {error}")
+
+        try:
+            now = datetime.utcnow()
+            rows = {r.id: r for r in NotificationOutbox.query.filter(
+                NotificationOutbox.id.in_([r[0] for r in results])
+            ).all()}
+            for row_id, attempts, ok, error, retry_after, permanent in results:
+                row = rows.get(row_id)
+                if row is None:
+                    continue
+                if ok:
+                    row.status = 'sent'
+                    row.sent_at = now
+                    row.last_error = None
+                elif permanent or attempts >= max_attempts:
+                    row.status = 'failed'
+                    row.last_error = error
+                else:
+                    row.next_attempt_at = now + timedelta(seconds=_retry_delay(attempts, retry_after))
+                    row.last_error = error
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+        return len(claimed)
+
+    def _cleanup(self):
+        """Раз в час удалять отправленные записи старше NOTIFICATION_RETENTION_DAYS"""
+        now = datetime.utcnow()
+        if self.cleaned_at and now - self.cleaned_at < timedelta(hours=1):
+            return
+        self.cleaned_at = now
+        cutoff = now - timedelta(days=env_float('NOTIFICATION_RETENTION_DAYS', 7))
+        try:
+            NotificationOutbox.query.filter(
+                NotificationOutbox.status == 'sent',
+                NotificationOutbox.created_at < cutoff
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Ошибка очистки очереди уведомлений: {e}")
+        finally:
+            db.session.remove()
+
+
+def get_notification_worker(app=None):
+    app = app or current_app._get_current_object()
+    worker = app.extensions.get('notification_worker')
+    if worker is None:
+        worker = app.extensions.setdefault('notification_worker', NotificationWorker(app))
+    return worker
+
+
+def resume_pending_notifications(app):
+    """Запустить обработчик при старте, если в очереди остались неотправленные записи"""
+    with app.app_context():
+        pending = db.session.query(NotificationOutbox.id).filter(
+            NotificationOutbox.status == 'pending'
+        ).first()
+        db.session.remove()
+    if pending:
+        get_notification_worker(app).notify()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker_after_commit(session):
+    if session.info.pop('outbox_enqueued', False) and has_app_context():
+        if not current_app.testing:
+            get_notification_worker().notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('outbox_enqueued', None)
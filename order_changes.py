@@ -0,0 +1,100 @@
+"""
+Лента изменений заказов для Felix Hub
+
+Страницы, которые раньше каждые N секунд перекачивали целую страницу заказов,
+опрашивают /api/orders/changes?since=<watermark> и получают только заказы,
+изменённые после watermark (по updated_at), и id удалённых заказов
+(по таблице order_tombstones). В ответе приходит новый watermark.
+
+Запрос берёт изменения с небольшим перекрытием (ORDER_CHANGES_OVERLAP_SECONDS),
+чтобы не потерять транзакции, которые получили updated_at до начала опроса,
+а закоммитились после. Поэтому клиент должен применять изменения идемпотентно
+(сравнивать updated_at заказа с уже известным).
+"""
+
+from datetime import datetime, timedelta
+
+from env_config import env_int
+from models import db, Order, OrderTombstone
+
+
+def current_watermark():
+    """Watermark "сейчас" - с него клиент начинает опрашивать изменения"""
+    return format_watermark(datetime.utcnow())
+
+
+def format_watermark(moment):
+    return moment.isoformat()
+
+
+def parse_watermark(raw):
+    """Разобрать watermark из запроса; None если он отсутствует или повреждён"""
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def record_order_deletion(order):
+    """
+    Записать отметку об удалении заказа (в текущей транзакции)
+
+    Заодно удаляет отметки старше ORDER_TOMBSTONE_RETENTION_DAYS дней.
+    """
+    now = datetime.utcnow()
+    db.session.add(OrderTombstone(order_id=order.id, mechanic_id=order.mechanic_id, deleted_at=now))
+
+    retention_days = env_int('ORDER_TOMBSTONE_RETENTION_DAYS', 7)
+    OrderTombstone.query.filter(
+        OrderTombstone.deleted_at < now - timedelta(days=retention_days)
+    ).delete(synchronize_session=False)
+
+
+def get_order_changes(since, mechanic_id=None):
+    """
+    Получить изменения заказов после since
+
+    Args:
+        since: datetime (UTC) из предыдущего ответа или None
+        mechanic_id: ограничить заказами одного механика
+
+    Returns:
+        dict: {
+            'orders': list,  # Изменённые/новые заказы (объекты Order)
+            'created': list,  # id заказов, созданных после since (с перекрытием)
+            'deleted': list,  # id удалённых заказов
+            'watermark': str,  # Новый watermark
+            'reset': bool  # True - клиенту нужно полностью перезагрузить данные
+        }
+    """
+    now = datetime.utcnow()
+    watermark = format_watermark(now)
+    retention_days = env_int('ORDER_TOMBSTONE_RETENTION_DAYS', 7)
+
+    # Нет watermark или он старше хранимых отметок об удалении - полная перезагрузка
+    if since is None or since < now - timedelta(days=retention_days):
+        return {'orders': [], 'created': [], 'deleted': [], 'watermark': watermark, 'reset': True}
+
+    window_start = since - timedelta(seconds=env_int('ORDER_CHANGES_OVERLAP_SECONDS', 2))
+    limit = env_int('ORDER_CHANGES_LIMIT', 200)
+
+    query = Order.query.filter(Order.updated_at > window_start)
+    if mechanic_id is not None:
+        query = query.filter(Order.mechanic_id == mechanic_id)
+    orders = query.order_by(Order.updated_at.asc(), Order.id.asc()).limit(limit + 1).all()
+
+    # Слишком много изменений - дешевле перезагрузить страницу целиком
+    if len(orders) > limit:
+        return {'orders': [], 'created': [], 'deleted': [], 'watermark': watermark, 'reset': True}
+
+    tombstones = OrderTombstone.query.filter(OrderTombstone.deleted_at > window_start)
+    if mechanic_id is not None:
+        tombstones = tombstones.filter(OrderTombstone.mechanic_id == mechanic_id)
+    deleted = sorted({t.order_id for t in tombstones.all()})
+
+    # Тоже с перекрытием: клиент отсеивает уже показанные id
+    created = [o.id for o in orders if o.created_at and o.created_at > window_start]
+
+    return {'orders': orders, 'created': created, 'deleted': deleted, 'watermark': watermark, 'reset': False}
@@ -0,0 +1,106 @@
+"""
+Журнал событий заказов (order_events) для Felix Hub
+
+update_order перезаписывает status на месте, поэтому раньше нельзя было
+узнать, когда заказ попал в каждый статус. Теперь эндпоинты, меняющие
+заказ, добавляют строку в order_events в той же транзакции:
+
+- order_created   - submit_order (None -> 'новый');
+- status_changed  - update_order при смене статуса;
+- order_cancelled - mechanic_cancel_order ('новый' -> 'отменено');
+- part_added      - add_part_to_order (статус не меняется).
+
+Строки только добавляются. Индексы (order_id, id) и (to_status, created_at)
+покрывают хронологию заказа и подсчёт переходов за период.
+"""
+
+from flask import has_request_context, session
+from flask_login import current_user
+from sqlalchemy import func
+
+from models import db, OrderEvent
+
+THROUGHPUT_BUCKETS = ('hour', 'day')
+
+# Формат начала периода для SQLite (в PostgreSQL - date_trunc)
+_SQLITE_BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00',
+}
+
+
+def current_actor():
+    """Кто выполняет текущий запрос: admin, mechanic:<id> или api"""
+    if not has_request_context():
+        return None
+    if session.get('admin_logged_in'):
+        return 'admin'
+    if current_user.is_authenticated:
+        return f'mechanic:{current_user.id}'
+    return 'api'
+
+
+def record_order_event(order, event, from_status=None, to_status=None, actor=None):
+    """
+    Записать событие заказа в текущей транзакции
+
+    Args:
+        order: заказ (для нового заказа id получается через flush)
+        event: order_created / status_changed / order_cancelled / part_added
+        actor: по умолчанию - текущий пользователь запроса
+    """
+    if order.id is None:
+        db.session.flush()
+    entry = OrderEvent(
+        order_id=order.id,
+        event=event,
+        from_status=from_status,
+        to_status=to_status,
+        actor=actor if actor is not None else current_actor(),
+    )
+    db.session.add(entry)
+    return entry
+
+
+def get_order_timeline(order_id):
+    """События заказа в порядке записи"""
+    return OrderEvent.query.filter(OrderEvent.order_id == order_id).order_by(OrderEvent.id).all()
+
+
+def _bucket_expression(bucket):
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(bucket, OrderEvent.created_at)
+    return func.strftime(_SQLITE_BUCKET_FORMATS[bucket], OrderEvent.created_at)
+
+
+def get_status_throughput(start, end, to_status=None, bucket='day'):
+    """
+    Количество переходов в статусы за период [start, end)
+
+    Args:
+        to_status: считать только переходы в этот статус (например 'готово')
+        bucket: hour / day
+
+    Returns:
+        list: [{'period': 'YYYY-MM-DD HH:MM:SS', 'to_status': str, 'count': int}]
+    """
+    if bucket not in THROUGHPUT_BUCKETS:
+        raise ValueError(f'bucket должен быть одним из: {", ".join(THROUGHPUT_BUCKETS)}')
+
+    period = _bucket_expression(bucket).label('period')
+    query = db.session.query(period, OrderEvent.to_status, func.count(OrderEvent.id)).filter(
+        OrderEvent.created_at >= start,
+        OrderEvent.created_at < end,
+        OrderEvent.to_status.isnot(None),
+        OrderEvent.from_status.is_distinct_from(OrderEvent.to_status),
+    )
+    if to_status:
+        query = query.filter(OrderEvent.to_status == to_status)
+    rows = query.group_by(period, OrderEvent.to_status).order_by(period, OrderEvent.to_status).all()
+
+    result = []
+    for period_start, status, count in rows:
+        if hasattr(period_start, 'strftime'):
+            period_start = period_start.strftime('%Y-%m-%d %H:%M:%S')
+        result.append({'period': period_start, 'to_status': status, 'count': count})
+    return result
@@ -0,0 +1,99 @@
+"""
+Потоковая выгрузка заказов (CSV / JSONL) для Felix Hub
+
+Заказы читаются частями через yield_per (на PostgreSQL - серверный курсор,
+без загрузки всей выборки в память) и сериализуются той же функцией, что
+и API заказов (serialize_orders), но со снимком каталога: названия
+категорий и запчастей берутся из памяти, без запросов на каждую часть.
+Ответ отдаётся генератором, поэтому первые строки уходят клиенту сразу,
+а выгрузка за год не упирается в таймаут воркера.
+"""
+
+import csv
+import io
+import json
+
+from env_config import env_int
+from models import Order, serialize_orders
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+CSV_COLUMNS = (
+    'id', 'created_at', 'updated_at', 'status', 'mechanic_name', 'telegram_id',
+    'category', 'category_raw', 'plate_number', 'is_original', 'printed',
+    'parts', 'comment', 'photo_url'
+)
+
+
+def export_batch_size():
+    return max(1, env_int('ORDER_EXPORT_BATCH_SIZE', 500))
+
+
+def iter_order_batches(query, batch_size=None):
+    """Заказы запроса пачками в порядке (created_at, id)"""
+    batch_size = batch_size or export_batch_size()
+    batch = []
+    for order in query.order_by(Order.created_at, Order.id).yield_per(batch_size):
+        batch.append(order)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_parts(selected_parts):
+    """Состав заказа одной строкой: "Колодки x2; Диск" """
+    items = []
+    for part in selected_parts or []:
+        if isinstance(part, dict):
+            name = part.get('name', '')
+            quantity = part.get('quantity', 1)
+            items.append(f'{name} x{quantity}' if quantity not in (None, 1, '1') else name)
+        else:
+            items.append(str(part))
+    return '; '.join(items)
+
+
+# Ячейка с такого символа в Excel считается формулой
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """Текст, введённый пользователем, не должен исполняться как формула (CSV injection)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([_csv_cell(value) for value in values])
+    return buffer.getvalue()
+
+
+def generate_order_export(query, export_format='csv', lang=None, catalog=None, batch_size=None):
+    """
+    Строки выгрузки
+
+    Args:
+        query: отфильтрованный запрос Order.query
+        export_format: csv (с BOM для Excel) или jsonl (по заказу в строке)
+        lang: язык названий категорий и запчастей
+        catalog: снимок каталога для названий без запросов к БД
+
+    Yields:
+        str: очередная порция текста ответа
+    """
+    if export_format == 'csv':
+        yield '\ufeff' + _csv_line(CSV_COLUMNS)
+
+    for batch in iter_order_batches(query, batch_size):
+        lines = []
+        for data in serialize_orders(batch, lang=lang, catalog=catalog):
+            if export_format == 'jsonl':
+                lines.append(json.dumps(data, ensure_ascii=False) + '\n')
+            else:
+                row = dict(data, parts=format_parts(data['selected_parts']))
+                lines.append(_csv_line(['' if row.get(col) is None else row.get(col) for col in CSV_COLUMNS]))
+        yield ''.join(lines)
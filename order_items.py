@@ -0,0 +1,102 @@
+"""
+Двойная запись позиций заказа в таблицу order_items для Felix Hub
+
+Order.selected_parts (JSON) пока остаётся основным форматом, а таблица
+order_items заполняется параллельно:
+- любое изменение selected_parts (создание заказа, правка, скрипты)
+  перед flush пересобирает позиции заказа целиком;
+- добавление одной запчасти механиком (insert_order_item) - один INSERT
+  на её место после сортировки и один UPDATE сдвига следующих позиций,
+  без пересборки остальных;
+- старые заказы переносятся пачками (backfill_order_items) при старте.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import db, Order, OrderItem
+
+
+def build_order_items(selected_parts):
+    """Позиции заказа из списка selected_parts"""
+    if not isinstance(selected_parts, list):
+        return []
+    return [OrderItem.from_selected_part(part, position) for position, part in enumerate(selected_parts)]
+
+
+def insert_order_item(order, entry, position):
+    """
+    Вставить в заказ одну позицию на место position (в текущей транзакции)
+
+    position - индекс entry в уже отсортированном selected_parts; позиции
+    с этого места сдвигаются на одну, чтобы order_items повторял порядок JSON.
+    selected_parts, изменённый тем же запросом, не вызывает пересборку
+    позиций этого заказа.
+    """
+    db.session.query(OrderItem).filter(
+        OrderItem.order_id == order.id, OrderItem.position >= position
+    ).update({OrderItem.position: OrderItem.position + 1}, synchronize_session=False)
+    item = OrderItem.from_selected_part(entry, position)
+    item.order_id = order.id
+    db.session.add(item)
+    db.session.info.setdefault('order_items_synced', set()).add(order.id)
+    return item
+
+
+def backfill_order_items(batch_size=500):
+    """
+    Перенести selected_parts старых заказов в order_items
+
+    Обрабатываются только заказы без позиций, пачками по batch_size
+    с commit после каждой пачки.
+
+    Returns:
+        int: количество перенесённых заказов
+    """
+    has_items = db.session.query(OrderItem.id).filter(OrderItem.order_id == Order.id).exists()
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Order.id, Order.selected_parts)
+            .filter(Order.id > last_id, ~has_items)
+            .order_by(Order.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for order_id, selected_parts in rows:
+            items = build_order_items(selected_parts)
+            for item in items:
+                item.order_id = order_id
+            db.session.add_all(items)
+            if items:
+                migrated += 1
+        db.session.commit()
+        last_id = rows[-1][0]
+    return migrated
+
+
+@event.listens_for(Session, 'before_flush')
+def _sync_order_items(session, flush_context, instances):
+    synced = session.info.get('order_items_synced', set())
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Order) or obj in session.deleted:
+            continue
+        if obj.id is not None and obj.id in synced:
+            continue
+        if obj not in session.new and not inspect(obj).attrs.selected_parts.history.has_changes():
+            continue
+        with session.no_autoflush:
+            obj.items = build_order_items(obj.selected_parts)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_synced_after_commit(session):
+    session.info.pop('order_items_synced', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_synced_after_rollback(session):
+    session.info.pop('order_items_synced', None)
@@ -0,0 +1,236 @@
+"""
+Очередь активных заказов для расчёта времени готовности в Felix Hub
+
+Раньше расчёт ETA, /api/orders/queue и страницы заказов при каждом запросе
+загружали все активные заказы целиком, только чтобы посчитать их и
+пронумеровать. Теперь каждый воркер держит упорядоченный по (created_at, id)
+список id активных заказов:
+
+- собственные изменения воркера (создание, смена статуса, удаление)
+  применяются сразу после commit;
+- изменения других воркеров подтягиваются по ленте изменений заказов
+  (order_changes) не чаще раза в ORDER_QUEUE_CHECK_SECONDS секунд;
+- если лента просит полной перезагрузки (слишком много изменений или
+  устаревший watermark), список строится заново одним запросом по
+  нужным колонкам без загрузки заказов целиком.
+
+Для модели ETA (eta_model.py) вместе с заказом хранятся его категория
+и количество позиций.
+
+Длина очереди - O(1), позиция заказа - O(log n) по отсортированному списку.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from env_config import env_float
+from eta_model import count_order_items
+from models import db, Order
+from order_changes import get_order_changes, parse_watermark
+
+ACTIVE_ORDER_STATUSES = ('новый', 'в работе', 'в ожидании запчасти')
+
+
+def _check_interval():
+    if current_app.testing:
+        return 0.0
+    return env_float('ORDER_QUEUE_CHECK_SECONDS', 1.0)
+
+
+def _queue_key(order_id, created_at):
+    return (created_at or datetime.min, order_id)
+
+
+class OrderQueue:
+    """Активные заказы одного приложения внутри воркера"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.loaded = False
+        self.since = None
+        self.checked_at = 0.0
+        # Счётчик изменений - ключ кэша накопленных оценок ETA
+        self.version = 0
+        self.keys = []
+        self.entries = {}
+        self.by_mechanic = {}
+
+    def _remove(self, order_id):
+        entry = self.entries.pop(order_id, None)
+        if entry is None:
+            return
+        key, mechanic_id = entry[:2]
+        del self.keys[bisect_left(self.keys, key)]
+        mechanic_keys = self.by_mechanic.get(mechanic_id)
+        if mechanic_keys is not None:
+            del mechanic_keys[bisect_left(mechanic_keys, key)]
+            if not mechanic_keys:
+                del self.by_mechanic[mechanic_id]
+
+    def _insert(self, order_id, created_at, mechanic_id, category, item_count):
+        key = _queue_key(order_id, created_at)
+        self.entries[order_id] = (key, mechanic_id, category, item_count)
+        insort(self.keys, key)
+        insort(self.by_mechanic.setdefault(mechanic_id, []), key)
+
+    def apply(self, order_id, created_at, mechanic_id, active, category=None, item_count=0):
+        """Учесть текущее состояние заказа (идемпотентно)"""
+        with self.lock:
+            if not active and order_id not in self.entries:
+                return
+            self._remove(order_id)
+            if active:
+                self._insert(order_id, created_at, mechanic_id, category, item_count)
+            self.version += 1
+
+    def apply_order(self, order):
+        self.apply(
+            order.id, order.created_at, order.mechanic_id, order.status in ACTIVE_ORDER_STATUSES,
+            order.category, count_order_items(order.selected_parts)
+        )
+
+    def reload(self, rows, since):
+        """rows: (id, created_at, mechanic_id, category, selected_parts) активных заказов"""
+        with self.lock:
+            self.keys = []
+            self.entries = {}
+            self.by_mechanic = {}
+            for order_id, created_at, mechanic_id, category, selected_parts in rows:
+                key = _queue_key(order_id, created_at)
+                self.entries[order_id] = (key, mechanic_id, category, count_order_items(selected_parts))
+                self.keys.append(key)
+                self.by_mechanic.setdefault(mechanic_id, []).append(key)
+            self.keys.sort()
+            for mechanic_keys in self.by_mechanic.values():
+                mechanic_keys.sort()
+            self.since = since
+            self.loaded = True
+            self.version += 1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def order_ids(self):
+        """id активных заказов в порядке очереди"""
+        with self.lock:
+            return [order_id for _, order_id in self.keys]
+
+    def features(self, mechanic_id=None):
+        """(id, категория, количество позиций) в порядке очереди"""
+        with self.lock:
+            keys = self.keys if mechanic_id is None else self.by_mechanic.get(mechanic_id, [])
+            return [(order_id,) + self.entries[order_id][2:] for _, order_id in keys]
+
+    def positions(self, order_ids, mechanic_id=None):
+        """
+        Позиции заказов в очереди (с 1)
+
+        Args:
+            order_ids: id заказов (например, текущей страницы)
+            mechanic_id: считать позицию только среди заказов этого механика
+
+        Returns:
+            dict: {id: позиция} только для активных заказов
+        """
+        result = {}
+        with self.lock:
+            keys = self.keys if mechanic_id is None else self.by_mechanic.get(mechanic_id, [])
+            for order_id in order_ids:
+                entry = self.entries.get(order_id)
+                if entry is not None and (mechanic_id is None or entry[1] == mechanic_id):
+                    result[order_id] = bisect_left(keys, entry[0]) + 1
+        return result
+
+
+def _load_active_orders():
+    return (
+        db.session.query(Order.id, Order.created_at, Order.mechanic_id, Order.category, Order.selected_parts)
+        .filter(Order.status.in_(ACTIVE_ORDER_STATUSES))
+        .all()
+    )
+
+
+def _get_queue():
+    queue = current_app.extensions.get('order_queue')
+    if queue is None:
+        queue = current_app.extensions.setdefault('order_queue', OrderQueue())
+    return queue
+
+
+def get_order_queue():
+    """
+    Актуальная очередь активных заказов
+
+    Изменения других воркеров проверяются не чаще раза в
+    ORDER_QUEUE_CHECK_SECONDS (в режиме тестирования - при каждом обращении).
+    """
+    queue = _get_queue()
+    if queue.loaded and time.monotonic() - queue.checked_at < _check_interval():
+        return queue
+
+    with queue.refresh_lock:
+        if queue.loaded and time.monotonic() - queue.checked_at < _check_interval():
+            return queue
+
+        changes = get_order_changes(queue.since if queue.loaded else None)
+        if changes['reset']:
+            queue.reload(_load_active_orders(), parse_watermark(changes['watermark']))
+        else:
+            for order in changes['orders']:
+                queue.apply_order(order)
+            for order_id in changes['deleted']:
+                queue.apply(order_id, None, None, False)
+            queue.since = parse_watermark(changes['watermark'])
+        queue.checked_at = time.monotonic()
+        return queue
+
+
+# Поля, от которых зависят место заказа в очереди и его оценка ETA
+_QUEUE_FIELDS = ('status', 'created_at', 'mechanic_id', 'category', 'selected_parts')
+
+
+def _order_change(order):
+    return (
+        order.id, order.created_at, order.mechanic_id, order.status in ACTIVE_ORDER_STATUSES,
+        order.category, count_order_items(order.selected_parts)
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_queue_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes.append(_order_change(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _QUEUE_FIELDS):
+                changes.append(_order_change(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            changes.append((obj.id, None, None, False))
+    if changes:
+        session.info.setdefault('order_queue_changes', []).extend(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_queue_changes(session):
+    changes = session.info.pop('order_queue_changes', None)
+    if changes and has_app_context():
+        queue = _get_queue()
+        if queue.loaded:
+            for change in changes:
+                queue.apply(*change)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('order_queue_changes', None)
@@ -0,0 +1,123 @@
+"""
+Статистика заказов по статусам для Felix Hub
+
+Все счётчики блока stats (/api/orders) считаются одним агрегатным запросом
+SUM(CASE ...) вместо пяти отдельных COUNT. Для запроса без фильтров результат
+кэшируется в воркере на ORDER_STATS_CACHE_SECONDS секунд: админ-панель
+опрашивает этот эндпоинт постоянно, а без фильтров все вкладки видят одно и то же.
+Кэш сбрасывается сразу после commit, изменившего заказы в этом воркере.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+
+from env_config import env_float
+from models import Order
+
+
+class _OrderStatsCacheState:
+    """Кэш статистики без фильтров для одного приложения внутри воркера"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key = None
+        self.stats = None
+        self.expires_at = 0.0
+
+
+def _get_state():
+    state = current_app.extensions.get('order_stats_cache')
+    if state is None:
+        state = current_app.extensions.setdefault('order_stats_cache', _OrderStatsCacheState())
+    return state
+
+
+def _cache_ttl():
+    if current_app.testing:
+        return 0.0
+    return env_float('ORDER_STATS_CACHE_SECONDS', 5.0)
+
+
+def _today_start():
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def compute_order_stats(query, today_start=None):
+    """
+    Посчитать статистику по статусам одним проходом
+
+    Args:
+        query: отфильтрованный запрос Order.query
+        today_start: начало текущих суток (по умолчанию - локальная полночь)
+
+    Returns:
+        dict: {'total', 'new', 'in_progress', 'ready', 'today'}
+    """
+    if today_start is None:
+        today_start = _today_start()
+
+    row = query.with_entities(
+        func.count(Order.id),
+        func.sum(case((Order.status == 'новый', 1), else_=0)),
+        func.sum(case((Order.status == 'в работе', 1), else_=0)),
+        func.sum(case((Order.status == 'готово', 1), else_=0)),
+        func.sum(case((Order.created_at >= today_start, 1), else_=0))
+    ).order_by(None).one()
+
+    return {
+        'total': int(row[0] or 0),
+        'new': int(row[1] or 0),
+        'in_progress': int(row[2] or 0),
+        'ready': int(row[3] or 0),
+        'today': int(row[4] or 0)
+    }
+
+
+def get_unfiltered_order_stats():
+    """Статистика по всем заказам с коротким кэшем в воркере"""
+    today_start = _today_start()
+    state = _get_state()
+    now = time.monotonic()
+
+    with state.lock:
+        if state.key == today_start and state.stats is not None and now < state.expires_at:
+            return dict(state.stats)
+
+    stats = compute_order_stats(Order.query, today_start)
+
+    with state.lock:
+        state.key = today_start
+        state.stats = stats
+        state.expires_at = time.monotonic() + _cache_ttl()
+    return dict(stats)
+
+
+def invalidate_order_stats():
+    """Сбросить кэш статистики текущего воркера"""
+    state = _get_state()
+    with state.lock:
+        state.stats = None
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_orders_changed(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Order):
+            session.info['orders_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('orders_changed', False) and has_app_context():
+        invalidate_order_stats()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('orders_changed', None)
@@ -0,0 +1,294 @@
+"""
+Поток событий заказов (Server-Sent Events) для Felix Hub
+
+Страницы подписываются на /api/orders/stream и получают события
+order_created, status_changed, part_added и order_deleted сразу после commit,
+вместо опроса сервера каждые N секунд.
+
+Доставка между воркерами gunicorn:
+- PostgreSQL: событие отправляется через pg_notify внутри транзакции заказа
+  (уходит только при commit), каждый воркер держит одно LISTEN-соединение
+  и раздаёт события своим подписчикам;
+- SQLite и другие БД: события своего воркера раздаются после commit,
+  изменения из других процессов подхватываются опросом ленты изменений
+  (order_changes) раз в ORDER_STREAM_POLL_SECONDS секунд - один запрос
+  на воркер, а не на каждую открытую вкладку.
+
+Фоновый поток запускается при первой подписке и останавливается,
+когда подписчиков не осталось.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from env_config import env_float
+from models import db
+
+ORDER_EVENTS_CHANNEL = 'felix_order_events'
+
+# Сколько ключей событий помнить для отсева дублей
+_SEEN_KEYS_LIMIT = 2000
+
+# Потоки воркера, которые SSE-подключения не могут занять
+STREAM_RESERVED_THREADS = 2
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _event_key(payload):
+    """Ключ для отсева повторов: одно и то же изменение приходит и после commit, и из опроса"""
+    return (payload['type'] == 'order_deleted', payload['order_id'], payload.get('updated_at'))
+
+
+class OrderSubscription:
+    """Очередь событий одного SSE-клиента"""
+
+    def __init__(self, hub, mechanic_id=None):
+        self.hub = hub
+        self.mechanic_id = mechanic_id
+        self.queue = queue.Queue(maxsize=200)
+
+    def wants(self, payload):
+        return self.mechanic_id is None or payload.get('mechanic_id') == self.mechanic_id
+
+    def push(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            # Клиент не успевает читать - вместо накопленных событий пусть перезагрузит данные целиком
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait({'type': 'resync', 'order_id': None, 'updated_at': None})
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class _OrderEventHub:
+    """Подписчики и фоновый поток доставки событий для одного приложения внутри воркера"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.seen = OrderedDict()
+        self.thread = None
+
+    def subscribe(self, mechanic_id=None, max_clients=None):
+        with self.lock:
+            if max_clients is not None and len(self.subscribers) >= max_clients:
+                return None
+            subscription = OrderSubscription(self, mechanic_id)
+            self.subscribers.add(subscription)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='order-events', daemon=True)
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        with self.lock:
+            return bool(self.subscribers)
+
+    def broadcast(self, payload):
+        key = _event_key(payload)
+        with self.lock:
+            if key in self.seen:
+                return
+            self.seen[key] = True
+            while len(self.seen) > _SEEN_KEYS_LIMIT:
+                self.seen.popitem(last=False)
+            targets = [s for s in self.subscribers if s.wants(payload)]
+        for subscription in targets:
+            subscription.push(payload)
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                if _is_postgres():
+                    self._listen_postgres()
+                else:
+                    self._poll_changes()
+            except Exception as e:
+                print(f"❌ Поток событий заказов остановлен: {e}")
+            finally:
+                db.session.remove()
+                with self.lock:
+                    self.thread = None
+                    restart = bool(self.subscribers)
+                # Подписчик мог появиться, пока поток завершался
+                if restart:
+                    with self.lock:
+                        if self.thread is None:
+                            self.thread = threading.Thread(target=self._run, name='order-events', daemon=True)
+                            self.thread.start()
+
+    def _listen_postgres(self):
+        """LISTEN на отдельном соединении, пока есть подписчики"""
+        while self.has_subscribers():
+            raw = None
+            try:
+                raw = db.engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+                while self.has_subscribers():
+                    for notify in conn.notifies(timeout=5.0):
+                        try:
+                            self.broadcast(json.loads(notify.payload))
+                        except (TypeError, ValueError, KeyError):
+                            continue
+            except Exception as e:
+                print(f"⚠️ Ошибка LISTEN {ORDER_EVENTS_CHANNEL}: {e}")
+                time.sleep(2)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+    def _poll_changes(self):
+        """Запасной вариант без LISTEN/NOTIFY: опрос ленты изменений одним запросом на воркер"""
+        from order_changes import get_order_changes
+
+        since = datetime.utcnow()
+        while self.has_subscribers():
+            time.sleep(env_float('ORDER_STREAM_POLL_SECONDS', 1.0))
+            try:
+                changes = get_order_changes(since)
+                since = datetime.fromisoformat(changes['watermark'])
+                if changes['reset']:
+                    self.broadcast({'type': 'resync', 'order_id': None, 'updated_at': changes['watermark']})
+                    continue
+                created = set(changes['created'])
+                for order in changes['orders']:
+                    self.broadcast(order_event_payload(
+                        'order_created' if order.id in created else 'order_updated', order
+                    ))
+                for order_id in changes['deleted']:
+                    self.broadcast({'type': 'order_deleted', 'order_id': order_id, 'updated_at': None})
+            except Exception as e:
+                print(f"⚠️ Ошибка опроса изменений заказов: {e}")
+            finally:
+                db.session.remove()
+
+
+def _get_hub():
+    hub = current_app.extensions.get('order_event_hub')
+    if hub is None:
+        hub = current_app.extensions.setdefault('order_event_hub', _OrderEventHub(current_app._get_current_object()))
+    return hub
+
+
+def order_event_payload(event_type, order, **extra):
+    """Краткое описание изменения заказа для клиента (без состава заказа)"""
+    payload = {
+        'type': event_type,
+        'order_id': order.id,
+        'status': order.status,
+        'mechanic_id': order.mechanic_id,
+        'mechanic_name': order.mechanic_name,
+        'plate_number': order.plate_number,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None
+    }
+    payload.update(extra)
+    return payload
+
+
+def publish_order_event(event_type, order, **extra):
+    """
+    Опубликовать событие заказа в текущей транзакции
+
+    Вызывается до db.session.commit(): событие уходит подписчикам
+    только если транзакция закоммитится.
+
+    Args:
+        event_type: order_created / status_changed / part_added / order_deleted
+        order: заказ (для удаления - до session.delete)
+        **extra: дополнительные поля события (например old_status)
+    """
+    db.session.flush()
+    payload = order_event_payload(event_type, order, **extra)
+    if event_type == 'order_deleted':
+        payload['updated_at'] = None
+
+    if _is_postgres():
+        db.session.execute(
+            text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': ORDER_EVENTS_CHANNEL, 'payload': json.dumps(payload, ensure_ascii=False)}
+        )
+    else:
+        db.session.info.setdefault('order_events', []).append(payload)
+
+
+def stream_client_limit():
+    """
+    Лимит SSE-подключений на воркер
+
+    Каждое подключение держит поток gunicorn до ORDER_STREAM_MAX_SECONDS,
+    поэтому ORDER_STREAM_MAX_CLIENTS урезается до числа потоков воркера
+    (GUNICORN_THREADS) за вычетом STREAM_RESERVED_THREADS для обычных запросов.
+    """
+    max_clients = int(env_float('ORDER_STREAM_MAX_CLIENTS', 6))
+    threads = int(env_float('GUNICORN_THREADS', 8))
+    return max(0, min(max_clients, threads - STREAM_RESERVED_THREADS))
+
+
+def subscribe_order_events(mechanic_id=None):
+    """
+    Подписать SSE-клиента на события заказов
+
+    Returns:
+        OrderSubscription | None: None если достигнут лимит ORDER_STREAM_MAX_CLIENTS
+    """
+    return _get_hub().subscribe(mechanic_id, max_clients=stream_client_limit())
+
+
+def unsubscribe_order_events(subscription):
+    """Отписать клиента (можно вызывать вне контекста приложения)"""
+    subscription.close()
+
+
+def format_sse(payload, event_id=None):
+    """Сериализовать событие в формат text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f"event: {payload['type']}")
+    lines.append('data: ' + json.dumps(payload, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+@event.listens_for(Session, 'after_commit')
+def _broadcast_after_commit(session):
+    events = session.info.pop('order_events', None)
+    if events and has_app_context():
+        hub = _get_hub()
+        for payload in events:
+            hub.broadcast(payload)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('order_events', None)
@@ -0,0 +1,137 @@
+"""
+Курсорная (keyset) пагинация заказов для Felix Hub
+
+Вместо OFFSET страница ищется по ключу (created_at, id) через индекс
+ix_orders_created_at_id, поэтому скорость не зависит от номера страницы.
+Курсоры непрозрачны для клиента: это base64 от JSON с ключом
+первой/последней строки и направлением.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import text, tuple_
+
+from models import db, Order
+
+CURSOR_NEXT = 'n'
+CURSOR_PREV = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или создан не этим приложением"""
+
+
+def encode_cursor(order, direction):
+    """Создать курсор, указывающий на заказ order в направлении direction"""
+    payload = {
+        'd': direction,
+        't': order.created_at.isoformat(),
+        'i': order.id
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Разобрать курсор
+
+    Returns:
+        tuple: (направление, created_at, id)
+
+    Raises:
+        InvalidCursor: если курсор нельзя разобрать
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        direction = payload['d']
+        created_at = datetime.fromisoformat(payload['t'])
+        order_id = int(payload['i'])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(str(e))
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise InvalidCursor(f'unknown direction {direction!r}')
+
+    return direction, created_at, order_id
+
+
+def paginate_by_cursor(query, cursor, page_size):
+    """
+    Получить страницу заказов (новые сверху) по курсору
+
+    Args:
+        query: отфильтрованный запрос Order.query
+        cursor: курсор из предыдущего ответа или пустая строка для первой страницы
+        page_size: размер страницы
+
+    Returns:
+        dict: {
+            'orders': list,  # Заказы страницы (created_at DESC, id DESC)
+            'next_cursor': str | None,  # Курсор следующей (более старой) страницы
+            'prev_cursor': str | None  # Курсор предыдущей (более новой) страницы
+        }
+    """
+    key = tuple_(Order.created_at, Order.id)
+
+    if not cursor:
+        rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(page_size + 1).all()
+        has_next = len(rows) > page_size
+        has_prev = False
+        orders = rows[:page_size]
+    else:
+        direction, created_at, order_id = decode_cursor(cursor)
+        if direction == CURSOR_NEXT:
+            rows = (
+                query.filter(key < tuple_(created_at, order_id))
+                .order_by(Order.created_at.desc(), Order.id.desc())
+                .limit(page_size + 1)
+                .all()
+            )
+            has_next = len(rows) > page_size
+            has_prev = True
+            orders = rows[:page_size]
+        else:
+            rows = (
+                query.filter(key > tuple_(created_at, order_id))
+                .order_by(Order.created_at.asc(), Order.id.asc())
+                .limit(page_size + 1)
+                .all()
+            )
+            has_prev = len(rows) > page_size
+            has_next = True
+            orders = list(reversed(rows[:page_size]))
+
+    return {
+        'orders': orders,
+        'next_cursor': encode_cursor(orders[-1], CURSOR_NEXT) if orders and has_next else None,
+        'prev_cursor': encode_cursor(orders[0], CURSOR_PREV) if orders and has_prev else None
+    }
+
+
+def estimate_orders_count():
+    """
+    Приблизительное количество заказов без полного сканирования таблицы
+
+    Для PostgreSQL берётся статистика планировщика (pg_class.reltuples),
+    для остальных БД оценка недоступна.
+
+    Returns:
+        int | None
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    try:
+        value = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'orders'")
+        ).scalar()
+    except Exception:
+        db.session.rollback()
+        return None
+    if value is None or value < 0:
+        return None
+    return int(value)
@@ -0,0 +1,303 @@
+"""
+Потоковый импорт запчастей из CSV/XLSX для Felix Hub
+
+Файл поставщика читается построчно (Werkzeug держит загрузку во временном
+файле, а не в памяти), строки проверяются и записываются пачками:
+- существующая запчасть ищется по паре (category, name_ru) одним запросом
+  на пачку и обновляется (UPDATE по первичному ключу через executemany);
+- новые запчасти вставляются одним INSERT на пачку;
+- отсутствующие категории создаются.
+
+Каждая пачка - отдельная транзакция, поэтому ошибки в одной пачке не
+отменяют уже загруженные. Ошибки строк не прерывают импорт, а попадают
+в отчёт с номером строки файла.
+
+Колонки (первая строка - заголовок, лишние колонки игнорируются):
+name_ru (или name), category - обязательные; name_en, name_he,
+description_ru, description_en, description_he, is_active, sort_order.
+"""
+
+import csv
+import io
+
+from sqlalchemy import insert, update, tuple_
+
+from catalog_cache import bump_catalog_version
+from env_config import env_int
+from migrate_parts_translations import find_translation
+from models import db, Part, Category, CategoryAlias, rebuild_category_aliases
+
+TEXT_FIELDS = ('name_en', 'name_he', 'description_ru', 'description_en', 'description_he')
+
+MAX_NAME_LENGTH = 250
+MAX_CATEGORY_LENGTH = 120
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да', '+'}
+_FALSE_VALUES = {'0', 'false', 'no', 'n', 'нет', '-'}
+
+
+class ImportFileError(ValueError):
+    """Файл нельзя прочитать как таблицу запчастей"""
+
+
+def default_batch_size():
+    return max(1, env_int('PARTS_IMPORT_BATCH_SIZE', 500))
+
+
+def _normalize_header(header):
+    columns = []
+    for name in header:
+        column = str(name or '').strip().lower()
+        columns.append('name_ru' if column == 'name' and 'name_ru' not in columns else column)
+    if 'name_ru' not in columns or 'category' not in columns:
+        raise ImportFileError('В заголовке должны быть колонки name_ru (или name) и category')
+    return columns
+
+
+def iter_csv_rows(stream):
+    """
+    Строки CSV (разделитель , ; или табуляция)
+
+    Заголовок читается сразу (ошибка формата - ImportFileError здесь же),
+    строки - лениво.
+
+    Returns:
+        iterator: (номер строки файла, {колонка: значение})
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.readline()
+    except UnicodeDecodeError:
+        raise ImportFileError('CSV должен быть в кодировке UTF-8')
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        delimiter = ','
+    columns = _normalize_header(next(csv.reader([sample], delimiter=delimiter), []))
+
+    def rows():
+        reader = csv.reader(text, delimiter=delimiter)
+        try:
+            for values in reader:
+                if any(value.strip() for value in values):
+                    yield reader.line_num + 1, dict(zip(columns, values))
+        except UnicodeDecodeError:
+            raise ImportFileError(f'Строка {reader.line_num + 1}: CSV должен быть в кодировке UTF-8')
+    return rows()
+
+
+def iter_xlsx_rows(stream):
+    """
+    Строки первого листа XLSX (openpyxl в режиме read_only)
+
+    Returns:
+        iterator: (номер строки файла, {колонка: значение})
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('Для импорта XLSX нужен пакет openpyxl')
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        sheet_rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = _normalize_header(next(sheet_rows, ()))
+    except ImportFileError:
+        raise
+    except Exception as e:
+        raise ImportFileError(f'Не удалось открыть XLSX: {e}')
+
+    def rows():
+        try:
+            for line_no, values in enumerate(sheet_rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield line_no, {
+                        column: '' if value is None else str(value)
+                        for column, value in zip(columns, values)
+                    }
+        finally:
+            workbook.close()
+    return rows()
+
+
+def iter_upload_rows(file_storage):
+    """Строки загруженного файла (по расширению: .csv / .xlsx)"""
+    filename = (file_storage.filename or '').lower()
+    if filename.endswith('.xlsx'):
+        return iter_xlsx_rows(file_storage.stream)
+    if filename.endswith('.csv') or filename.endswith('.txt'):
+        return iter_csv_rows(file_storage.stream)
+    raise ImportFileError('Поддерживаются файлы .csv и .xlsx')
+
+
+def _parse_bool(value):
+    value = str(value).strip().lower()
+    if value in _TRUE_VALUES:
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    raise ValueError(f"is_active: ожидается да/нет, получено '{value}'")
+
+
+def validate_row(raw):
+    """
+    Проверить строку файла
+
+    Returns:
+        dict: значения для Part (только колонки, которые есть в файле и не пусты;
+              name_ru и category - всегда)
+
+    Raises:
+        ValueError: текст ошибки для отчёта
+    """
+    name_ru = (raw.get('name_ru') or '').strip()
+    category = (raw.get('category') or '').strip()
+    if not name_ru:
+        raise ValueError('Не указано название (name_ru)')
+    if not category:
+        raise ValueError('Не указана категория')
+    if len(name_ru) > MAX_NAME_LENGTH:
+        raise ValueError(f'Название длиннее {MAX_NAME_LENGTH} символов')
+    if len(category) > MAX_CATEGORY_LENGTH:
+        raise ValueError(f'Категория длиннее {MAX_CATEGORY_LENGTH} символов')
+
+    values = {'name_ru': name_ru, 'category': category}
+    for field in TEXT_FIELDS:
+        value = (raw.get(field) or '').strip()
+        if value:
+            if field.startswith('name_') and len(value) > MAX_NAME_LENGTH:
+                raise ValueError(f'{field} длиннее {MAX_NAME_LENGTH} символов')
+            values[field] = value
+
+    if (raw.get('is_active') or '').strip():
+        values['is_active'] = _parse_bool(raw['is_active'])
+    sort_order = (raw.get('sort_order') or '').strip()
+    if sort_order:
+        try:
+            values['sort_order'] = int(float(sort_order))
+        except ValueError:
+            raise ValueError(f"sort_order: ожидается число, получено '{sort_order}'")
+    return values
+
+
+def _write_batch(batch):
+    """
+    Записать пачку проверенных строк в одной транзакции
+
+    Returns:
+        tuple: (создано, обновлено)
+    """
+    # Категория может быть указана любым её названием - приводим к Category.name
+    raw_names = dict(
+        db.session.query(CategoryAlias.alias, Category.name)
+        .join(Category, Category.id == CategoryAlias.category_id)
+        .filter(CategoryAlias.alias.in_({values['category'] for values in batch}))
+    )
+
+    # Повтор той же запчасти внутри пачки - побеждает последняя строка
+    by_key = {}
+    for values in batch:
+        values['category'] = raw_names.get(values['category'], values['category'])
+        key = (values['category'], values['name_ru'])
+        by_key[key] = {**by_key.get(key, {}), **values}
+
+    # (категория, название) -> (id, name_en, name_he); при дублях берётся самая старая запчасть
+    existing = dict(
+        ((category, name_ru), (part_id, name_en, name_he))
+        for part_id, category, name_ru, name_en, name_he in db.session.query(
+            Part.id, Part.category, Part.name_ru, Part.name_en, Part.name_he
+        )
+        .filter(tuple_(Part.category, Part.name_ru).in_(list(by_key)))
+        .order_by(Part.id.desc())
+    )
+
+    missing_categories = sorted({category for category, _ in by_key} - set(raw_names.values()))
+    if missing_categories:
+        next_sort = db.session.query(db.func.count(Category.id)).scalar() or 0
+        db.session.execute(insert(Category), [
+            {'name': name, 'is_active': True, 'sort_order': next_sort + i}
+            for i, name in enumerate(missing_categories)
+        ])
+        # Пакетная вставка идёт мимо flush, индекс названий обновляем сами
+        rebuild_category_aliases()
+
+    inserts = []
+    updates = []
+    for key, values in by_key.items():
+        values['name'] = values['name_ru']  # Старое поле для обратной совместимости
+        part_id, name_en, name_he = existing.get(key, (None, None, None))
+
+        # Как apply_auto_translations: словарь заполняет только пустые переводы,
+        # введённые вручную переводы существующих запчастей не затираются
+        missing_langs = [lang for lang, current in (('en', name_en), ('he', name_he))
+                         if not values.get(f'name_{lang}') and not current]
+        translation = find_translation(values['name_ru']) if missing_langs else None
+        for lang in missing_langs:
+            if translation and translation.get(lang):
+                values[f'name_{lang}'] = translation[lang]
+
+        if part_id is None:
+            # Одинаковый набор ключей - один executemany на всю пачку
+            inserts.append({'is_active': True, 'sort_order': 0, **dict.fromkeys(TEXT_FIELDS), **values})
+        else:
+            updates.append({'id': part_id, **values})
+
+    if inserts:
+        db.session.execute(insert(Part), inserts)
+    if updates:
+        db.session.execute(update(Part), updates)
+    bump_catalog_version()
+    db.session.commit()
+    return len(inserts), len(updates)
+
+
+def import_parts(rows, batch_size=None):
+    """
+    Импортировать строки, отдавая события по ходу работы
+
+    Args:
+        rows: итератор (номер строки, {колонка: значение})
+        batch_size: размер пачки (по умолчанию PARTS_IMPORT_BATCH_SIZE)
+
+    Yields:
+        dict: {'type': 'error', 'row', 'error'} для каждой ошибочной строки,
+              {'type': 'progress', ...} после каждой пачки,
+              {'type': 'done', ...} в конце
+    """
+    batch_size = batch_size or default_batch_size()
+    stats = {'processed': 0, 'created': 0, 'updated': 0, 'errors': 0}
+    batch = []
+    batch_rows = []
+
+    def flush():
+        try:
+            created, updated = _write_batch(batch)
+            stats['created'] += created
+            stats['updated'] += updated
+            return []
+        except Exception as e:
+            db.session.rollback()
+            stats['errors'] += len(batch_rows)
+            return [
+                {'type': 'error', 'row': row, 'error': f'Пачка не записана: {e}'}
+                for row in batch_rows
+            ]
+        finally:
+            batch.clear()
+            batch_rows.clear()
+
+    for line_no, raw in rows:
+        stats['processed'] += 1
+        try:
+            batch.append(validate_row(raw))
+            batch_rows.append(line_no)
+        except ValueError as e:
+            stats['errors'] += 1
+            yield {'type': 'error', 'row': line_no, 'error': str(e)}
+        if len(batch) >= batch_size:
+            yield from flush()
+            yield {'type': 'progress', **stats}
+
+    if batch:
+        yield from flush()
+    yield {'type': 'done', **stats}
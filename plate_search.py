@@ -0,0 +1,174 @@
+"""
+Поиск заказов по части гос номера для Felix Hub
+
+Фильтр Order.plate_number.ilike('%x%') не может использовать b-tree индекс
+и на больших таблицах сканирует все заказы. Поиск идёт по нормализованному
+номеру (Order.plate_normalized: только буквы и цифры, верхний регистр),
+поэтому "12345" находит "123-45-678".
+
+- PostgreSQL: LIKE '%x%' по plate_normalized обслуживается GIN-индексом
+  с gin_trgm_ops (расширение pg_trgm);
+- SQLite и другие БД: кандидаты ищутся по таблице триграмм
+  order_plate_ngrams (заказ должен содержать все триграммы запроса),
+  затем проверяются точным LIKE. Таблица поддерживается автоматически
+  при каждом flush, меняющем гос номер.
+
+Если на PostgreSQL расширение pg_trgm недоступно, используется таблица триграмм.
+Запросы короче трёх символов триграммами не покрываются и проверяются LIKE.
+"""
+
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import Session
+
+from models import db, Order, OrderPlateNgram, normalize_plate
+
+GRAM_SIZE = 3
+TRGM_INDEX_NAME = 'ix_orders_plate_normalized_trgm'
+
+# Есть ли GIN-индекс pg_trgm: {url БД: bool}
+_trigram_index_available = {}
+
+
+def plate_ngrams(normalized):
+    """Множество триграмм нормализованного номера"""
+    if len(normalized) < GRAM_SIZE:
+        return set()
+    return {normalized[i:i + GRAM_SIZE] for i in range(len(normalized) - GRAM_SIZE + 1)}
+
+
+def _uses_trigram_index(connection=None):
+    """Обслуживает ли поиск GIN-индекс pg_trgm (иначе нужна таблица триграмм)"""
+    bind = connection if connection is not None else db.engine
+    if bind.dialect.name != 'postgresql':
+        return False
+    key = str(bind.engine.url)
+    if key not in _trigram_index_available:
+        sql = text('SELECT 1 FROM pg_indexes WHERE indexname = :name')
+        if connection is not None:
+            found = connection.execute(sql, {'name': TRGM_INDEX_NAME}).first()
+        else:
+            with db.engine.connect() as conn:
+                found = conn.execute(sql, {'name': TRGM_INDEX_NAME}).first()
+        _trigram_index_available[key] = found is not None
+    return _trigram_index_available[key]
+
+
+def create_trigram_index():
+    """
+    Создать GIN-индекс pg_trgm (только PostgreSQL)
+
+    Returns:
+        bool: True если индекс есть; False - поиск будет идти через таблицу триграмм
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            conn.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {TRGM_INDEX_NAME} ON orders USING gin (plate_normalized gin_trgm_ops)'
+            ))
+            conn.commit()
+    except Exception as e:
+        print(f"⚠️ pg_trgm недоступен, поиск по номеру пойдёт через таблицу триграмм: {e}")
+    _trigram_index_available.pop(str(db.engine.url), None)
+    return _uses_trigram_index()
+
+
+def apply_plate_filter(query, plate_number):
+    """
+    Отфильтровать запрос заказов по части гос номера
+
+    Args:
+        query: запрос Order.query
+        plate_number: строка поиска в любом формате ("12-345", "12345", "a123")
+    """
+    normalized = normalize_plate(plate_number)
+    if not normalized:
+        # В запросе нет ни букв, ни цифр - ищем как раньше
+        return query.filter(Order.plate_number.ilike(f'%{plate_number}%'))
+
+    query = query.filter(Order.plate_normalized.like(f'%{normalized}%'))
+
+    grams = plate_ngrams(normalized)
+    if grams and not _uses_trigram_index():
+        candidates = (
+            db.session.query(OrderPlateNgram.order_id)
+            .filter(OrderPlateNgram.gram.in_(grams))
+            .group_by(OrderPlateNgram.order_id)
+            .having(func.count(OrderPlateNgram.gram) == len(grams))
+        )
+        query = query.filter(Order.id.in_(candidates))
+    return query
+
+
+def rebuild_plate_ngrams(batch_size=1000):
+    """
+    Заполнить plate_normalized и таблицу триграмм для существующих заказов
+
+    Returns:
+        int: количество обработанных заказов
+    """
+    processed = 0
+    last_id = 0
+    use_side_table = not _uses_trigram_index()
+    while True:
+        rows = (
+            db.session.query(Order.id, Order.plate_number, Order.plate_normalized)
+            .filter(Order.id > last_id)
+            .order_by(Order.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        if use_side_table:
+            OrderPlateNgram.query.filter(OrderPlateNgram.order_id.in_(ids)).delete(synchronize_session=False)
+        for order_id, plate_number, plate_normalized in rows:
+            normalized = normalize_plate(plate_number)
+            if plate_normalized != normalized:
+                Order.query.filter_by(id=order_id).update(
+                    {'plate_normalized': normalized, 'updated_at': Order.updated_at},
+                    synchronize_session=False
+                )
+            if use_side_table:
+                db.session.add_all(
+                    OrderPlateNgram(gram=gram, order_id=order_id) for gram in plate_ngrams(normalized)
+                )
+        db.session.commit()
+        processed += len(rows)
+        last_id = ids[-1]
+    return processed
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_plate_ngrams(session, flush_context):
+    changed = []
+    removed = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Order) and inspect(obj).attrs.plate_normalized.history.has_changes():
+            changed.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            removed.append(obj.id)
+    if not changed and not removed:
+        return
+
+    connection = session.connection()
+    if _uses_trigram_index(connection):
+        return
+
+    table = OrderPlateNgram.__table__
+    ids = [o.id for o in changed] + removed
+    connection.execute(table.delete().where(table.c.order_id.in_(ids)))
+    rows = [
+        {'gram': gram, 'order_id': order.id}
+        for order in changed
+        for gram in plate_ngrams(order.plate_normalized or '')
+    ]
+    if rows:
+        connection.execute(table.insert(), rows)
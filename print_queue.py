@@ -0,0 +1,261 @@
+"""
+Очередь печати чеков для Felix Hub
+
+Раньше update_order и /api/orders/<id>/print отправляли чек на принтер
+прямо в запросе, и TCP-принтер мог держать поток gunicorn до 10 секунд.
+Теперь чек сохраняется в таблицу print_jobs (в той же транзакции, что и
+изменение заказа), а фоновый поток печатает задания по одному.
+
+Состояния задания: queued -> printing -> done | failed.
+Неудачная печать повторяется PRINT_MAX_ATTEMPTS раз с растущей паузой;
+задание, "зависшее" в printing дольше PRINT_LEASE_SECONDS (воркер умер),
+снова берётся в работу. Задание в failed можно повторить, любое задание
+можно перепечатать (создаётся копия).
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_, and_
+from sqlalchemy.orm import Session
+
+from env_config import env_float, env_int
+from metrics import observe_print_job
+from models import db, Order, PrintJob
+from order_stream import publish_order_event
+
+ACTIVE_PRINT_STATUSES = ('queued', 'printing')
+
+
+def send_to_thermal_printer(text):
+    """Отправить текст на принтер через выбранный THERMAL_PRINT_BACKEND"""
+    backend = (os.getenv('THERMAL_PRINT_BACKEND', 'stdout') or 'stdout').strip().lower()
+    encoding = (os.getenv('THERMAL_PRINTER_ENCODING', 'utf-8') or 'utf-8').strip()
+    payload = (text or '').encode(encoding, errors='replace')
+
+    if backend in {'stdout', 'console'}:
+        print(text)
+        return
+
+    if backend == 'cups':
+        lp_path = shutil.which('lp')
+        if not lp_path:
+            raise RuntimeError('THERMAL_PRINT_BACKEND=cups, но lp не найден')
+
+        printer_name = (os.getenv('THERMAL_PRINTER_NAME') or '').strip()
+        cmd = [lp_path]
+        if printer_name:
+            cmd += ['-d', printer_name]
+        cmd += ['-o', 'raw']
+
+        proc = subprocess.run(
+            cmd, input=payload, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            timeout=env_float('THERMAL_PRINTER_TIMEOUT', 10)
+        )
+        if proc.returncode != 0:
+            err = proc.stderr.decode('utf-8', errors='replace').strip() or 'unknown error'
+            raise RuntimeError(f'Ошибка печати (cups): {err}')
+        return
+
+    if backend == 'tcp':
+        host = (os.getenv('THERMAL_PRINTER_HOST') or '').strip()
+        port_raw = (os.getenv('THERMAL_PRINTER_PORT') or '9100').strip()
+        port = int(port_raw) if port_raw.isdigit() else 9100
+        if not host:
+            raise RuntimeError('THERMAL_PRINT_BACKEND=tcp, но THERMAL_PRINTER_HOST не задан')
+
+        with socket.create_connection((host, port), timeout=env_float('THERMAL_PRINTER_TIMEOUT', 10)) as sock:
+            sock.sendall(payload)
+        return
+
+    raise RuntimeError(f'Неизвестный THERMAL_PRINT_BACKEND={backend}')
+
+
+def enqueue_print_job(order_id, receipt, source='manual'):
+    """
+    Поставить чек в очередь печати (в текущей транзакции, без commit)
+
+    Returns:
+        PrintJob: новое задание (id появится после flush)
+    """
+    job = PrintJob(order_id=order_id, receipt=receipt, source=source)
+    db.session.add(job)
+    db.session.info['print_enqueued'] = True
+    return job
+
+
+def has_active_print_job(order_id):
+    """Есть ли у заказа задание, которое ещё не напечатано"""
+    return db.session.query(PrintJob.id).filter(
+        PrintJob.order_id == order_id,
+        PrintJob.status.in_(ACTIVE_PRINT_STATUSES)
+    ).first() is not None
+
+
+def retry_print_job(job):
+    """Вернуть задание в состоянии failed в очередь"""
+    job.status = 'queued'
+    job.attempts = 0
+    job.next_attempt_at = datetime.utcnow()
+    job.last_error = None
+    job.finished_at = None
+    db.session.info['print_enqueued'] = True
+
+
+def reprint_job(job):
+    """Создать копию задания для повторной печати того же чека"""
+    return enqueue_print_job(job.order_id, job.receipt, source='reprint')
+
+
+def _retry_delay(attempts):
+    base = env_float('PRINT_RETRY_SECONDS', 5)
+    return min(base * (2 ** max(attempts - 1, 0)), 300)
+
+
+class PrintWorker:
+    """Фоновый поток печати для одного приложения внутри воркера"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='print-queue', daemon=True)
+                self.thread.start()
+
+    def notify(self):
+        self.ensure_started()
+        self.wakeup.set()
+
+    def _run(self):
+        poll_seconds = env_float('PRINT_POLL_SECONDS', 5)
+        while True:
+            self.wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while self.process_next():
+                        pass
+            except Exception as e:
+                print(f"❌ Ошибка обработки очереди печати: {e}")
+            self.wakeup.wait(poll_seconds)
+
+    def _claim_next(self):
+        """Взять в работу следующее задание (или задание с истёкшей арендой)"""
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=env_float('PRINT_LEASE_SECONDS', 60))
+        try:
+            job = (
+                PrintJob.query
+                .filter(or_(
+                    and_(PrintJob.status == 'queued', PrintJob.next_attempt_at <= now),
+                    and_(PrintJob.status == 'printing', PrintJob.started_at < lease_expired)
+                ))
+                .order_by(PrintJob.next_attempt_at, PrintJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.session.commit()
+                return None
+            job.status = 'printing'
+            job.started_at = now
+            job.attempts += 1
+            claimed = (job.id, job.order_id, job.receipt, job.attempts)
+            db.session.commit()
+            return claimed
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+    def process_next(self):
+        """
+        Напечатать одно задание
+
+        Returns:
+            bool: True если задание было (очередь стоит проверить ещё раз)
+        """
+        claimed = self._claim_next()
+        if claimed is None:
+            return False
+
+        job_id, order_id, receipt, attempts = claimed
+        error = None
+        started_at = time.perf_counter()
+        try:
+            send_to_thermal_printer(receipt)
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            print(f"⚠️ Задание печати {job_id} (заказ {order_id}) не выполнено, попытка {attempts}: {error}")
+        observe_print_job(time.perf_counter() - started_at, error is None)
+
+        try:
+            job = db.session.get(PrintJob, job_id)
+            now = datetime.utcnow()
+            if error is None:
+                job.status = 'done'
+                job.finished_at = now
+                job.last_error = None
+                # Через ORM, чтобы сработали слушатели flush/commit (кэши, очередь, SSE)
+                order = db.session.get(Order, order_id) if order_id is not None else None
+                if order is not None and not order.printed:
+                    order.printed = True
+                    publish_order_event('order_updated', order)
+            elif attempts >= env_int('PRINT_MAX_ATTEMPTS', 3):
+                job.status = 'failed'
+                job.finished_at = now
+                job.last_error = error
+            else:
+                job.status = 'queued'
+                job.next_attempt_at = now + timedelta(seconds=_retry_delay(attempts))
+                job.last_error = error
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+        return True
+
+
+def get_print_worker(app=None):
+    app = app or current_app._get_current_object()
+    worker = app.extensions.get('print_worker')
+    if worker is None:
+        worker = app.extensions.setdefault('print_worker', PrintWorker(app))
+    return worker
+
+
+def resume_print_queue(app):
+    """Запустить обработчик при старте, если в очереди остались задания"""
+    with app.app_context():
+        pending = db.session.query(PrintJob.id).filter(
+            PrintJob.status.in_(ACTIVE_PRINT_STATUSES)
+        ).first()
+        db.session.remove()
+    if pending:
+        get_print_worker(app).notify()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker_after_commit(session):
+    if session.info.pop('print_enqueued', False) and has_app_context():
+        if not current_app.testing:
+            get_print_worker().notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('print_enqueued', None)
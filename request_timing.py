@@ -0,0 +1,138 @@
+"""
+Счётчик SQL-запросов и Server-Timing для Felix Hub
+
+Включается переменной REQUEST_TIMING=true. Для каждого запроса считаются:
+- количество SQL-запросов и суммарное время в БД
+  (before_cursor_execute / after_cursor_execute движка);
+- время рендеринга шаблонов (сигналы before_render_template / template_rendered);
+- полное время обработки (before_request / after_request).
+
+Результат уходит в заголовок ответа Server-Timing (виден во вкладке Network
+браузера) и одной JSON-строкой в лог. REQUEST_TIMING_LOG_MIN_MS задаёт порог:
+в лог попадают только запросы не быстрее указанного (0 - все).
+
+Когда переключатель выключен, ни обработчики, ни слушатели событий не
+регистрируются, и накладных расходов нет. Запросы, выполненные генератором
+потокового ответа уже после after_request, не учитываются.
+"""
+
+import json
+import os
+import time
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+from env_config import env_float
+from models import db
+
+
+def request_timing_enabled():
+    return os.getenv('REQUEST_TIMING', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class RequestTiming:
+    """Замеры одного запроса"""
+
+    __slots__ = ('started_at', 'queries', 'db_seconds', 'template_seconds', 'template_started_at')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_started_at = None
+
+    def server_timing(self, total_seconds):
+        """Значение заголовка Server-Timing"""
+        return ', '.join((
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ))
+
+
+def _current_timing():
+    if not has_request_context():
+        return None
+    return g.get('request_timing')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала - на контексте выполнения: у упавшего запроса он просто исчезает,
+    # а не копится в conn.info соединения из пула
+    if context is not None and _current_timing() is not None:
+        context.request_timing_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _current_timing()
+    started = getattr(context, 'request_timing_started', None)
+    if timing is None or started is None:
+        return
+    timing.queries += 1
+    timing.db_seconds += time.perf_counter() - started
+
+
+def _before_render_template(sender, template, context, **extra):
+    timing = _current_timing()
+    if timing is not None and timing.template_started_at is None:
+        timing.template_started_at = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    timing = _current_timing()
+    if timing is not None and timing.template_started_at is not None:
+        timing.template_seconds += time.perf_counter() - timing.template_started_at
+        timing.template_started_at = None
+
+
+def _start_request_timing():
+    g.request_timing = RequestTiming()
+
+
+def _finish_request_timing(response):
+    timing = g.pop('request_timing', None)
+    if timing is None:
+        return response
+    total_seconds = time.perf_counter() - timing.started_at
+    response.headers['Server-Timing'] = timing.server_timing(total_seconds)
+
+    if total_seconds * 1000 >= env_float('REQUEST_TIMING_LOG_MIN_MS', 0):
+        print(json.dumps({
+            'event': 'request_timing',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': timing.queries,
+            'db_ms': round(timing.db_seconds * 1000, 1),
+            'template_ms': round(timing.template_seconds * 1000, 1),
+            'total_ms': round(total_seconds * 1000, 1),
+        }, ensure_ascii=False), flush=True)
+    return response
+
+
+def init_request_timing(app):
+    """
+    Подключить замеры к приложению, если REQUEST_TIMING включён
+
+    Вызывается после db.init_app(app) и до регистрации остальных
+    before_request, чтобы полное время включало их работу.
+
+    Returns:
+        bool: включены ли замеры
+    """
+    if not request_timing_enabled():
+        return False
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request_timing)
+    app.after_request(_finish_request_timing)
+    print("⏱️ Замеры запросов включены (Server-Timing)")
+    return True
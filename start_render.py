@@ -29,7 +29,8 @@ def main():
         'app:app',
         '--bind', f'0.0.0.0:{port}',
         '--workers', '1',
-        '--threads', '2',
+        # Число потоков задаёт gunicorn.conf.py (GUNICORN_THREADS): параметр
+        # командной строки перекрыл бы его
         '--timeout', '120',
         '--log-level', 'info',
         '--access-logfile', '-',
@@ -2,6 +2,30 @@
 let allParts = [];
 let allCategories = [];
 
+// Последние ответы API каталога: url -> {etag, data}
+const catalogResponses = new Map();
+
+// GET с If-None-Match: при 304 возвращаем сохранённые данные, не перекачивая каталог
+async function fetchCatalogJson(url) {
+    const cached = catalogResponses.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers });
+
+    if (response.status === 304 && cached) {
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        catalogResponses.set(url, { etag, data });
+    }
+    return data;
+}
+
 // Переключение вкладок
 function switchTab(tab, event) {
     document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
@@ -22,10 +46,7 @@ function switchTab(tab, event) {
 async function loadCategories() {
     try {
         const lang = getCurrentLanguage ? getCurrentLanguage() : 'ru';
-        const response = await fetch(`/api/categories?lang=${lang}`);
-        if (!response.ok) throw new Error('Ошибка загрузки категорий');
-        
-        allCategories = await response.json();
+        allCategories = await fetchCatalogJson(`/api/categories?lang=${lang}`);
         updateStats();
         renderCategories();
         updateCategoryFilters();
@@ -122,14 +143,11 @@ async function loadParts() {
         const activeOnly = statusFilter === 'active' ? 'true' : 'false';
         const lang = getCurrentLanguage ? getCurrentLanguage() : 'ru';
         
-        const response = await fetch(`/api/parts?active_only=${activeOnly}&lang=${lang}`);
-        if (!response.ok) throw new Error('Ошибка загрузки запчастей');
-        
-        allParts = await response.json();
+        allParts = await fetchCatalogJson(`/api/parts?active_only=${activeOnly}&lang=${lang}`);
         
         if (statusFilter === 'inactive') {
-            const allResponse = await fetch(`/api/parts?active_only=false&lang=${lang}`);
-            const allData = await allResponse.json();
+            // Тот же URL, что и выше - повторный запрос вернёт 304
+            const allData = await fetchCatalogJson(`/api/parts?active_only=false&lang=${lang}`);
             allParts = allData.filter(p => !p.is_active);
         }
         
@@ -77,6 +77,24 @@ def test_find_translation():
     print("✅ Тест 1 пройден\n")
 
 
+def test_find_translation_matches_linear_scan():
+    """Индекс словаря даёт тот же результат, что и перебор всех ключей"""
+    def linear_scan(part_name):
+        name_lower = part_name.lower().strip()
+        if name_lower in PARTS_TRANSLATIONS:
+            return PARTS_TRANSLATIONS[name_lower]
+        for key, translation in PARTS_TRANSLATIONS.items():
+            if key in name_lower or name_lower in key:
+                return translation
+        return None
+    
+    names = ['  ', 'масло', 'Фильтр', 'xyz']
+    for key in PARTS_TRANSLATIONS:
+        names += [key, key[1:-1], key.upper(), f'новая {key} (2 шт)', f'{key} и wd-40']
+    for name in names:
+        assert find_translation(name) is linear_scan(name), name
+
+
 def test_create_part_with_auto_translation():
     """Тест create_part с автоматическим добавлением переводов"""
     print("📝 Тест 2: create_part с автоматическими переводами (прямая работа с БД)")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест кэша справочника (CatalogSnapshot)
+Проверяет пересборку снимка только при изменении версии каталога
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import text
+
+from models import db, Category, Part, get_category_part_counts
+from catalog_cache import get_catalog_snapshot, bump_catalog_version, catalog_etag
+
+
+@pytest.fixture
+def catalog_app(app):
+    db.session.add(Category(name='тормоза', name_ru='Тормоза', name_en='Brakes', name_he='בלמים'))
+    db.session.add(Part(name_ru='Колодки', name_en='Pads', category='тормоза', sort_order=1))
+    db.session.add(Part(name_ru='Диск', category='тормоза', sort_order=0))
+    bump_catalog_version()
+    db.session.commit()
+    yield app
+
+
+def test_snapshot_contents(catalog_app):
+    snapshot = get_catalog_snapshot()
+
+    assert snapshot.version == 1
+    assert [p.name_ru for p in snapshot.parts] == ['Диск', 'Колодки']
+    assert snapshot.resolve_category('Brakes').name == 'тормоза'
+    assert snapshot.raw_category_name('בלמים') == 'тормоза'
+    assert snapshot.raw_category_name('unknown') == 'unknown'
+
+    pads = next(p for p in snapshot.parts if p.name_ru == 'Колодки')
+    assert snapshot.parts_by_id[pads.id].get_name('en') == 'Pads'
+    assert snapshot.parts_by_id[pads.id].get_name('he') == 'Колодки'
+
+    with pytest.raises(AttributeError):
+        snapshot.version = 5
+    with pytest.raises(TypeError):
+        snapshot.parts_by_id[999] = pads
+
+
+def test_snapshot_reused_until_version_changes(catalog_app, monkeypatch):
+    # Интервал проверки версии действует только вне режима тестирования
+    catalog_app.testing = False
+    first = get_catalog_snapshot()
+    assert get_catalog_snapshot() is first
+
+    # Изменение в другом воркере: версия растёт, но проверка ещё не наступила
+    db.session.execute(text('UPDATE catalog_state SET version = version + 1'))
+    db.session.commit()
+    assert get_catalog_snapshot() is first
+
+    # Интервал проверки истёк - снимок пересобирается
+    monkeypatch.setenv('CATALOG_VERSION_CHECK_SECONDS', '0')
+    second = get_catalog_snapshot()
+    assert second is not first
+    assert second.version == 2
+
+    # Без изменения версии снимок не пересобирается
+    assert get_catalog_snapshot() is second
+
+
+def test_local_write_invalidates_immediately(catalog_app):
+    before = get_catalog_snapshot()
+
+    db.session.add(Part(name_ru='Датчик', category='тормоза', sort_order=5))
+    bump_catalog_version()
+    db.session.commit()
+
+    after = get_catalog_snapshot()
+    assert after.version == before.version + 1
+    assert 'Датчик' in [p.name_ru for p in after.parts]
+
+
+def test_etag_follows_version(catalog_app):
+    snapshot = get_catalog_snapshot()
+    etag = catalog_etag(snapshot, 'parts|ru')
+    assert catalog_etag(get_catalog_snapshot(), 'parts|ru') == etag
+    assert catalog_etag(snapshot, 'parts|en') != etag
+
+    bump_catalog_version()
+    db.session.commit()
+    assert catalog_etag(get_catalog_snapshot(), 'parts|ru') != etag
+
+
+def test_category_part_counts_in_one_query(catalog_app):
+    db.session.add(Category(name='фильтры', name_ru='Фильтры'))
+    db.session.add(Part(name_ru='Старые колодки', category='тормоза', is_active=False))
+    db.session.commit()
+
+    counts = get_category_part_counts()
+    assert counts['тормоза'] == {'total': 3, 'active': 2}
+    assert 'фильтры' not in counts
+
+    categories = {c.name: c for c in Category.query.all()}
+    data = categories['тормоза'].to_dict(part_counts=counts)
+    assert (data['parts_count'], data['active_parts_count']) == (3, 2)
+    assert categories['фильтры'].to_dict(part_counts=counts)['parts_count'] == 0
+    # Без переданных счётчиков результат тот же
+    assert categories['тормоза'].to_dict()['active_parts_count'] == 2
+    assert 'parts_count' not in categories['тормоза'].to_dict(include_counts=False)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест курсорной пагинации заказов
+Проверяет обход вперёд/назад без пропусков и дублей, в т.ч. при одинаковом created_at
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Order
+from pagination import paginate_by_cursor, decode_cursor, InvalidCursor
+
+
+@pytest.fixture
+def orders_app(app):
+    base = datetime(2025, 1, 1, 12, 0, 0)
+    for i in range(23):
+        # Каждые три заказа имеют одинаковое время создания
+        db.session.add(Order(
+            mechanic_name='Иван',
+            category='тормоза',
+            plate_number=f'123-45-{i:03d}',
+            selected_parts=[],
+            status='новый' if i % 2 else 'готово',
+            created_at=base + timedelta(minutes=i // 3, microseconds=123)
+        ))
+    db.session.commit()
+    yield app
+
+
+def expected_ids(query):
+    return [o.id for o in query.order_by(Order.created_at.desc(), Order.id.desc()).all()]
+
+
+def test_walk_forward_and_back(orders_app):
+    query = Order.query
+    pages = []
+    page = paginate_by_cursor(query, '', 5)
+    assert page['prev_cursor'] is None
+    pages.append([o.id for o in page['orders']])
+    while page['next_cursor']:
+        page = paginate_by_cursor(query, page['next_cursor'], 5)
+        pages.append([o.id for o in page['orders']])
+
+    assert [len(p) for p in pages] == [5, 5, 5, 5, 3]
+    assert [i for p in pages for i in p] == expected_ids(Order.query)
+
+    # Обратно от последней страницы до первой
+    back = []
+    while page['prev_cursor']:
+        page = paginate_by_cursor(query, page['prev_cursor'], 5)
+        back.append([o.id for o in page['orders']])
+    assert back == list(reversed(pages[:-1]))
+    assert page['prev_cursor'] is None
+
+
+def test_filtered_query(orders_app):
+    query = Order.query.filter_by(status='новый')
+    page = paginate_by_cursor(query, '', 4)
+    seen = [o.id for o in page['orders']]
+    while page['next_cursor']:
+        page = paginate_by_cursor(query, page['next_cursor'], 4)
+        seen += [o.id for o in page['orders']]
+    assert seen == expected_ids(Order.query.filter_by(status='новый'))
+
+
+def test_invalid_cursor(orders_app):
+    for bad in ('garbage', 'eyJkIjoieCJ9', '!!!'):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(bad)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест модели времени готовности (eta_model)
+Проверяет окна перцентилей, расчёт времени обработки, откат к более общим
+оценкам и накопленное время по очереди
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+
+from models import db, Order
+from eta_model import EtaModel, RollingPercentile, count_order_items, get_eta_model, queue_estimates
+from order_queue import get_order_queue
+
+
+def test_rolling_percentile_drops_old_values():
+    window = RollingPercentile(3)
+    for value in (50, 1, 2, 3):
+        window.add(value)
+    assert len(window) == 3
+    assert window.percentile(0) == 1
+    assert window.percentile(50) == 2
+    assert window.percentile(100) == 3
+
+
+def test_count_order_items_skips_labels_in_any_spelling():
+    parts = [
+        {'part_id': 1, 'name': 'Колодки', 'quantity': 2},
+        {'name': 'no_additives', 'quantity': 1, 'is_label': True},
+        {'name': 'NO ADDITIVES', 'quantity': 1},
+        'Без присадок',
+        ' ללא תוספים ',
+        'no_additives',
+        'Диск',
+    ]
+    assert count_order_items(parts) == 2
+    assert count_order_items(None) == 0
+
+
+def test_service_time_excludes_queue_wait_and_falls_back():
+    model = EtaModel(default_minutes=10, percentile=90, window=10, min_samples=2, max_sample_minutes=60)
+    start = datetime(2024, 1, 1, 9, 0)
+
+    # Второй заказ создан раньше, чем готов первый: считается от готовности первого
+    assert model.observe('тормоза', 1, start, start + timedelta(minutes=4)) == 4
+    assert model.observe('тормоза', 1, start, start + timedelta(minutes=10)) == 6
+    # Ночной перерыв не попадает в выборки
+    assert model.observe('тормоза', 1, start, start + timedelta(hours=20)) is None
+
+    assert model.estimate('тормоза', 1) == 6
+    # Для другого числа позиций - окно категории, для другой категории - общее
+    assert model.estimate('тормоза', 5) == 6
+    assert model.estimate('двигатель', 1) == 6
+    assert EtaModel(default_minutes=10, min_samples=2).estimate('тормоза', 1) == 10
+
+
+def test_ready_at_is_stamped_and_learned(app):
+    created_at = datetime.utcnow() - timedelta(minutes=30)
+    orders = []
+    for _ in range(6):
+        order = Order(
+            mechanic_id=1, mechanic_name='Иван', category='тормоза', plate_number='123',
+            selected_parts=[{'name': 'Колодки', 'quantity': 1}], status='новый', created_at=created_at,
+        )
+        db.session.add(order)
+        orders.append(order)
+    db.session.commit()
+
+    for order in orders[:5]:
+        order.status = 'готово'
+        db.session.commit()
+    assert all(order.ready_at is not None for order in orders[:5])
+    ready_at = orders[0].ready_at
+    orders[0].status = 'готово'
+    db.session.commit()
+    assert orders[0].ready_at == ready_at
+
+    model = get_eta_model()
+    assert model.sample_count() >= 1
+    estimates, total = queue_estimates(get_order_queue(), model)
+    assert list(estimates) == [orders[5].id]
+    assert total == model.estimate('тормоза', 1)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест статистики заказов механиков (get_mechanics_order_stats)
+Сверяет сгруппированный запрос с подсчётом по каждому статусу отдельно
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, Mechanic, Order, get_mechanics_order_stats
+
+
+def per_status_counts(mechanic):
+    """Прежний расчёт: отдельный COUNT на каждый статус"""
+    return {
+        'total': mechanic.orders.count(),
+        'new': mechanic.orders.filter_by(status='новый').count(),
+        'processing': mechanic.orders.filter_by(status='в работе').count(),
+        'ready': mechanic.orders.filter_by(status='готово').count(),
+        'completed': mechanic.orders.filter_by(status='выдано').count(),
+    }
+
+
+def test_grouped_stats_match_per_status_counts(app):
+    mechanics = []
+    for username in ('ivan', 'avi', 'idle'):
+        mechanic = Mechanic(username=username, full_name=username)
+        mechanic.set_password('secret')
+        db.session.add(mechanic)
+        mechanics.append(mechanic)
+    db.session.commit()
+    ivan, avi, idle = mechanics
+
+    statuses = {
+        ivan: ['новый', 'новый', 'в работе', 'готово', 'выдано', 'выдано', 'выдано', 'отменено'],
+        avi: ['готово', 'в ожидании запчасти'],
+    }
+    for mechanic, mechanic_statuses in statuses.items():
+        for status in mechanic_statuses:
+            db.session.add(Order(
+                mechanic_id=mechanic.id, mechanic_name=mechanic.full_name, category='тормоза',
+                plate_number='123', selected_parts=[], status=status,
+            ))
+    db.session.commit()
+
+    stats = get_mechanics_order_stats([m.id for m in mechanics])
+    for mechanic in mechanics:
+        assert stats[mechanic.id] == per_status_counts(mechanic)
+        assert mechanic.get_order_stats() == per_status_counts(mechanic)
+
+    # Статусы вне статистики входят только в total
+    assert stats[ivan.id] == {'total': 8, 'new': 2, 'processing': 1, 'ready': 1, 'completed': 3}
+    assert stats[avi.id] == {'total': 2, 'new': 0, 'processing': 0, 'ready': 1, 'completed': 0}
+    assert stats[idle.id] == {'total': 0, 'new': 0, 'processing': 0, 'ready': 0, 'completed': 0}
+    assert get_mechanics_order_stats([]) == {}
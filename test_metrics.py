@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест метрик Prometheus (metrics)
+Проверяет гистограммы запросов и SQL, длину очереди и счётчики фоновых задач
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import text
+
+from models import db
+from metrics import count_order_created, init_metrics, metrics_enabled, observe_print_job, observe_telegram_send
+
+pytestmark = pytest.mark.skipif(not metrics_enabled(), reason='prometheus_client не установлен')
+
+
+@pytest.fixture
+def probe_app(app):
+    """Приложение с одним маршрутом"""
+    @app.route('/probe')
+    def probe():
+        db.session.execute(text('SELECT 1'))
+        return 'ok'
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    return app
+
+
+def sample(body, line_prefix):
+    for line in body.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint(probe_app, monkeypatch):
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    monkeypatch.setenv('METRICS_PUBLIC', 'true')
+    assert init_metrics(probe_app, active_orders=lambda: 7)
+    client = probe_app.test_client()
+
+    before = client.get('/metrics').get_data(as_text=True)
+    client.get('/probe')
+    with pytest.raises(RuntimeError):
+        client.get('/boom')
+    observe_telegram_send(0.2, False, permanent=True)
+    observe_print_job(0.1, True)
+    count_order_created()
+    body = client.get('/metrics').get_data(as_text=True)
+
+    prefix = 'felix_http_requests_total{endpoint="probe",method="GET",status="200"}'
+    assert sample(body, prefix) == sample(before, prefix) + 1
+    # Необработанное исключение учитывается как 500
+    failed = 'felix_http_requests_total{endpoint="boom",method="GET",status="500"}'
+    assert sample(body, failed) == sample(before, failed) + 1
+    assert sample(body, 'felix_db_query_duration_seconds_count') > sample(before, 'felix_db_query_duration_seconds_count')
+    assert sample(body, 'felix_telegram_send_failures_total{permanent="true"}') >= 1
+    assert sample(body, 'felix_print_job_duration_seconds_count{result="done"}') >= 1
+    assert sample(body, 'felix_orders_created_total') == sample(before, 'felix_orders_created_total') + 1
+    assert sample(body, 'felix_active_orders') == 7
+
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_metrics_route_requires_token(app, monkeypatch):
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    monkeypatch.delenv('METRICS_PUBLIC', raising=False)
+    assert init_metrics(app)
+    assert app.test_client().get('/metrics').status_code == 404
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест очереди уведомлений Telegram (notification_outbox)
+Проверяет запись в транзакции заказа, аренду записей, паузы между повторами
+и окончательную ошибку
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import notification_outbox
+from models import db, NotificationOutbox
+from notification_outbox import NotificationWorker, _retry_delay, enqueue_telegram_message
+
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    """Заглушка отправки: результаты по очереди, вызовы сохраняются"""
+    results = []
+    calls = []
+
+    def deliver(http, chat_id, text):
+        calls.append((chat_id, text))
+        return results.pop(0) if results else (True, None, None, False)
+
+    monkeypatch.setattr(notification_outbox, 'deliver_telegram_message', deliver)
+    return results, calls
+
+
+def outbox_row():
+    db.session.expire_all()
+    return NotificationOutbox.query.one()
+
+
+def test_enqueue_follows_transaction(app):
+    enqueue_telegram_message(42, 'откатится')
+    db.session.rollback()
+    assert NotificationOutbox.query.count() == 0
+    assert 'outbox_enqueued' not in db.session.info
+
+    enqueue_telegram_message(42, 'Заказ готов')
+    db.session.commit()
+    row = outbox_row()
+    assert (row.chat_id, row.text, row.status, row.attempts) == ('42', 'Заказ готов', 'pending', 0)
+
+
+def test_lease_claim_and_reclaim_after_expiry(app, monkeypatch):
+    monkeypatch.setenv('NOTIFICATION_LEASE_SECONDS', '120')
+    enqueue_telegram_message(1, 'Текст')
+    db.session.commit()
+    worker = NotificationWorker(app)
+
+    claimed = worker._claim_batch()
+    assert [(chat_id, attempts) for _, chat_id, _, attempts in claimed] == [('1', 1)]
+    assert outbox_row().next_attempt_at > datetime.utcnow() + timedelta(seconds=100)
+    # Пока аренда действует, другой воркер запись не получит
+    assert worker._claim_batch() == []
+
+    # Воркер умер во время отправки - после истечения аренды запись повторяется
+    outbox_row().next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert [attempts for *_, attempts in worker._claim_batch()] == [2]
+
+
+def test_sent_and_retry_backoff(app, deliveries, monkeypatch):
+    monkeypatch.setenv('NOTIFICATION_BACKOFF_SECONDS', '5')
+    results, calls = deliveries
+    enqueue_telegram_message(7, 'Текст')
+    db.session.commit()
+    worker = NotificationWorker(app)
+
+    # 429 с retry_after - пауза из ответа Telegram
+    results.append((False, 'HTTP 429: Too Many Requests', 30, False))
+    assert worker.process_batch() == 1
+    row = outbox_row()
+    assert (row.status, row.attempts, row.last_error) == ('pending', 1, 'HTTP 429: Too Many Requests')
+    assert timedelta(seconds=25) < row.next_attempt_at - datetime.utcnow() <= timedelta(seconds=30)
+    assert worker.process_batch() == 0
+
+    outbox_row().next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert worker.process_batch() == 1
+    row = outbox_row()
+    assert (row.status, row.sent_at is not None, row.last_error) == ('sent', True, None)
+    assert calls == [('7', 'Текст'), ('7', 'Текст')]
+
+    assert [_retry_delay(n) for n in (1, 2, 3)] == [5, 10, 20]
+    monkeypatch.setenv('NOTIFICATION_BACKOFF_MAX_SECONDS', '15')
+    assert _retry_delay(3) == 15
+    assert _retry_delay(3, retry_after=2) == 2
+
+
+def test_failed_after_max_attempts_or_permanent_error(app, deliveries, monkeypatch):
+    monkeypatch.setenv('NOTIFICATION_MAX_ATTEMPTS', '2')
+    results, _ = deliveries
+    enqueue_telegram_message(1, 'Текст')
+    db.session.commit()
+    worker = NotificationWorker(app)
+
+    results.extend([(False, 'timeout', None, False)] * 2)
+    worker.process_batch()
+    assert outbox_row().status == 'pending'
+    outbox_row().next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    worker.process_batch()
+    row = outbox_row()
+    assert (row.status, row.attempts, row.last_error) == ('failed', 2, 'timeout')
+
+    # Ошибка 4xx (бот заблокирован) - без повторов
+    db.session.delete(row)
+    enqueue_telegram_message(2, 'Текст')
+    db.session.commit()
+    results.append((False, 'HTTP 403: Forbidden', None, True))
+    worker.process_batch()
+    row = outbox_row()
+    assert (row.status, row.attempts) == ('failed', 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест ленты изменений заказов (/api/orders/changes)
+Проверяет выдачу изменённых, новых и удалённых заказов после watermark
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Order
+from order_changes import get_order_changes, record_order_deletion
+
+
+def make_order(mechanic_id, moment):
+    return Order(
+        mechanic_id=mechanic_id,
+        mechanic_name='Иван',
+        category='тормоза',
+        plate_number='123-45-678',
+        selected_parts=[],
+        created_at=moment,
+        updated_at=moment
+    )
+
+
+@pytest.fixture
+def changes_app(app):
+    old = datetime.utcnow() - timedelta(hours=1)
+    for mechanic_id in (1, 1, 2):
+        db.session.add(make_order(mechanic_id, old))
+    db.session.commit()
+    yield app
+
+
+def test_no_watermark_requires_reset(changes_app):
+    changes = get_order_changes(None)
+    assert changes['reset'] is True
+    assert changes['orders'] == []
+
+    stale = datetime.utcnow() - timedelta(days=30)
+    assert get_order_changes(stale)['reset'] is True
+
+
+def test_changes_after_watermark(changes_app):
+    since = datetime.utcnow() - timedelta(minutes=10)
+    assert get_order_changes(since)['orders'] == []
+
+    # Изменение статуса, новый заказ и удаление
+    order = db.session.get(Order, 1)
+    order.status = 'готово'
+    order.updated_at = datetime.utcnow()
+    db.session.add(make_order(2, datetime.utcnow()))
+    doomed = db.session.get(Order, 3)
+    record_order_deletion(doomed)
+    db.session.delete(doomed)
+    db.session.commit()
+
+    changes = get_order_changes(since)
+    assert changes['reset'] is False
+    assert [o.id for o in changes['orders']] == [1, 4]
+    assert changes['created'] == [4]
+    assert changes['deleted'] == [3]
+
+    # Только заказы одного механика
+    mine = get_order_changes(since, mechanic_id=1)
+    assert [o.id for o in mine['orders']] == [1]
+    assert mine['deleted'] == []
+
+
+def test_too_many_changes_require_reset(changes_app, monkeypatch):
+    monkeypatch.setenv('ORDER_CHANGES_LIMIT', '2')
+    since = datetime.utcnow() - timedelta(hours=2)
+    assert get_order_changes(since)['reset'] is True
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест журнала событий заказов (order_event_log)
+Проверяет хронологию заказа и подсчёт переходов в статусы за период
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+
+from models import db, Order, OrderEvent
+from order_event_log import get_order_timeline, get_status_throughput, record_order_event
+
+
+def test_timeline_and_throughput(app):
+    order = Order(
+        mechanic_id=1, mechanic_name='Иван', category='тормоза', plate_number='123',
+        selected_parts=[], status='новый',
+    )
+    db.session.add(order)
+    record_order_event(order, 'order_created', None, 'новый', actor='mechanic:1')
+    db.session.commit()
+
+    order.status = 'готово'
+    record_order_event(order, 'status_changed', 'новый', 'готово', actor='admin')
+    record_order_event(order, 'part_added', 'готово', 'готово', actor='mechanic:1')
+    db.session.commit()
+
+    timeline = get_order_timeline(order.id)
+    assert [(e.event, e.from_status, e.to_status, e.actor) for e in timeline] == [
+        ('order_created', None, 'новый', 'mechanic:1'),
+        ('status_changed', 'новый', 'готово', 'admin'),
+        ('part_added', 'готово', 'готово', 'mechanic:1'),
+    ]
+
+    # Событие вне периода не учитывается
+    db.session.add(OrderEvent(
+        order_id=order.id, event='status_changed', from_status='новый', to_status='готово',
+        created_at=datetime.utcnow() - timedelta(days=30),
+    ))
+    db.session.commit()
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=1)
+    end = now + timedelta(days=1)
+    throughput = get_status_throughput(start, end)
+    # part_added не меняет статус и в переходы не входит
+    assert sorted((row['to_status'], row['count']) for row in throughput) == [('готово', 1), ('новый', 1)]
+
+    hourly = get_status_throughput(start, end, to_status='готово', bucket='hour')
+    assert [row['count'] for row in hourly] == [1]
+    assert hourly[0]['period'].endswith(':00:00')
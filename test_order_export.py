@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест потоковой выгрузки заказов (order_export)
+Проверяет формат CSV/JSONL и чтение заказов пачками
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+
+from models import db, Category, Part, Order
+from order_export import generate_order_export, format_parts
+
+
+def seed(count):
+    db.session.add(Category(name='тормоза', name_ru='Тормоза', name_en='Brakes'))
+    pads = Part(name_ru='Колодки', name_en='Pads', category='тормоза')
+    db.session.add(pads)
+    db.session.commit()
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        db.session.add(Order(
+            mechanic_name='Иван',
+            category='Тормоза',
+            plate_number=f'123-45-{i:03d}',
+            selected_parts=[{'part_id': pads.id, 'name': 'Колодки', 'quantity': 2}, 'Диск'],
+            created_at=start + timedelta(hours=count - i),
+        ))
+    db.session.commit()
+
+
+def test_csv_export_in_batches(app):
+    seed(7)
+
+    chunks = list(generate_order_export(Order.query, 'csv', lang='en', batch_size=3))
+    # Заголовок и по порции на пачку из 3 заказов
+    assert len(chunks) == 1 + 3
+    assert chunks[0].startswith('\ufeffid,created_at')
+
+    rows = list(csv.DictReader(io.StringIO(''.join(chunks).lstrip('\ufeff'))))
+    assert len(rows) == 7
+    # Старые заказы первыми
+    assert rows[0]['plate_number'] == '123-45-006'
+    assert rows[0]['category'] == 'Brakes'
+    assert rows[0]['parts'] == 'Pads x2; Диск'
+
+
+def test_jsonl_export_respects_filters(app):
+    seed(4)
+    Order.query.filter_by(plate_number='123-45-001').update({'status': 'готово'})
+    db.session.commit()
+
+    lines = ''.join(generate_order_export(Order.query.filter_by(status='готово'), 'jsonl')).splitlines()
+    assert [json.loads(line)['plate_number'] for line in lines] == ['123-45-001']
+
+
+def test_format_parts():
+    assert format_parts([{'name': 'Колодки', 'quantity': 1}, {'name': 'Масло', 'quantity': 4}, 'Диск']) == \
+        'Колодки; Масло x4; Диск'
+
+
+def test_csv_escapes_formulas(app):
+    db.session.add(Order(
+        mechanic_name='@SUM(A1)', category='тормоза', plate_number='=1+1',
+        selected_parts=['-2+3'], comment='\t=cmd', is_original=False,
+    ))
+    db.session.commit()
+
+    row = next(csv.DictReader(io.StringIO(''.join(generate_order_export(Order.query, 'csv')).lstrip('\ufeff'))))
+    assert (row['mechanic_name'], row['plate_number'], row['parts'], row['comment']) == \
+        ("'@SUM(A1)", "'=1+1", "'-2+3", "'\t=cmd")
+    assert row['category'] == 'тормоза'
+    assert row['is_original'] == 'False'
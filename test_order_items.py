@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест таблицы order_items
+Проверяет двойную запись selected_parts и перенос старых заказов
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, Order, OrderItem
+from order_items import backfill_order_items, build_order_items, insert_order_item
+
+
+def make_order(selected_parts):
+    order = Order(
+        mechanic_name='Иван',
+        category='тормоза',
+        plate_number='123-45-678',
+        selected_parts=selected_parts
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def item_rows(order_id):
+    items = OrderItem.query.filter_by(order_id=order_id).order_by(OrderItem.position).all()
+    return [(i.position, i.part_id, i.name, i.quantity, i.is_original, i.is_label) for i in items]
+
+
+def test_dual_write_on_create_and_update(app):
+    order = make_order([
+        {'part_id': '7', 'name': 'Колодки', 'quantity': 2, 'is_original': True},
+        'Без присадок',
+        'Фильтр'
+    ])
+    assert item_rows(order.id) == [
+        (0, 7, 'Колодки', 2, True, False),
+        (1, None, 'Без присадок', 1, None, True),
+        (2, None, 'Фильтр', 1, None, False)
+    ]
+
+    order.selected_parts = [{'name': 'Диск', 'quantity': 1}]
+    db.session.commit()
+    assert item_rows(order.id) == [(0, None, 'Диск', 1, None, False)]
+
+    # Изменение других полей не трогает позиции
+    order.status = 'готово'
+    db.session.commit()
+    assert len(item_rows(order.id)) == 1
+
+
+def test_insert_single_item(app):
+    order = make_order([{'name': 'Диск', 'quantity': 1}, 'Фильтр'])
+    entry = {'part_id': 3, 'name': 'Датчик', 'quantity': 1, 'added_by_mechanic': True, 'added_at': '2025-01-01 10:00:00'}
+    # Датчик встаёт между позициями после сортировки - следующие сдвигаются
+    insert_order_item(order, entry, 1)
+    order.selected_parts = [order.selected_parts[0], entry, order.selected_parts[1]]
+    db.session.commit()
+
+    items = OrderItem.query.filter_by(order_id=order.id).order_by(OrderItem.position).all()
+    assert [(i.position, i.name) for i in items] == [(0, 'Диск'), (1, 'Датчик'), (2, 'Фильтр')]
+    assert items[1].added_by_mechanic is True
+    assert items[1].added_at.year == 2025
+    # Совпадает с полной пересборкой из selected_parts
+    rebuilt = [(i.position, i.part_id, i.name, i.quantity, i.is_original, i.is_label)
+               for i in build_order_items(order.selected_parts)]
+    assert item_rows(order.id) == rebuilt
+
+
+def test_backfill_and_delete(app):
+    first = make_order(['Фильтр'])
+    second = make_order([{'name': 'Диск', 'quantity': 3}])
+    OrderItem.query.delete()
+    db.session.commit()
+
+    assert backfill_order_items(batch_size=1) == 2
+    assert item_rows(second.id) == [(0, None, 'Диск', 3, None, False)]
+    assert backfill_order_items() == 0
+
+    db.session.delete(first)
+    db.session.commit()
+    assert OrderItem.query.count() == 1
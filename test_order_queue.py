@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест очереди активных заказов (order_queue)
+Проверяет позиции, обновление после commit и подхват изменений из БД
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, Order
+from order_queue import get_order_queue
+
+
+def add_order(minutes_ago, status='новый', mechanic_id=1):
+    order = Order(
+        mechanic_id=mechanic_id,
+        mechanic_name='Иван',
+        category='тормоза',
+        plate_number='123',
+        selected_parts=[],
+        status=status,
+        created_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def test_queue_positions_follow_status_changes(app):
+    first = add_order(30)
+    done = add_order(20, status='готово')
+    second = add_order(10, mechanic_id=2)
+
+    queue = get_order_queue()
+    assert len(queue) == 2
+    assert queue.order_ids() == [first.id, second.id]
+    assert queue.positions([first.id, done.id, second.id]) == {first.id: 1, second.id: 2}
+    assert queue.positions([second.id], mechanic_id=2) == {second.id: 1}
+
+    # Изменение этого воркера применяется сразу после commit
+    third = add_order(0, status='в работе')
+    first.status = 'готово'
+    db.session.commit()
+    assert queue.order_ids() == [second.id, third.id]
+
+    # Изменение в обход ORM (другой воркер, скрипт) приходит через ленту изменений
+    db.session.execute(
+        text("UPDATE orders SET status = 'в ожидании запчасти', updated_at = :now WHERE id = :id"),
+        {'now': datetime.utcnow(), 'id': done.id}
+    )
+    db.session.commit()
+    assert get_order_queue().order_ids() == [done.id, second.id, third.id]
+
+    db.session.delete(second)
+    db.session.commit()
+    assert get_order_queue().positions([third.id]) == {third.id: 2}
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест пакетной сериализации заказов (serialize_orders)
+Проверяет формат ответа и то, что число SQL-запросов не зависит от количества заказов
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from models import db, Category, CategoryAlias, Part, Order, Mechanic, serialize_orders
+from catalog_cache import get_catalog_snapshot
+
+
+def seed(orders_count):
+    category = Category(name='тормоза', name_ru='Тормоза', name_en='Brakes', name_he='בלמים')
+    db.session.add(category)
+    pads = Part(name_ru='Колодки', name_en='Pads', name_he='רפידות', category='тормоза', sort_order=2)
+    disc = Part(name_ru='Диск', name_en='Disc', name_he='דיסק', category='тормоза', sort_order=1)
+    db.session.add_all([pads, disc])
+    mechanic = Mechanic(username='ivan', full_name='Иван')
+    mechanic.set_password('secret')
+    db.session.add(mechanic)
+    db.session.commit()
+
+    for i in range(orders_count):
+        db.session.add(Order(
+            mechanic_id=mechanic.id,
+            mechanic_name='Иван',
+            category='Тормоза',
+            plate_number=f'123-45-{i:03d}',
+            selected_parts=[
+                {'part_id': pads.id, 'name': 'Колодки', 'quantity': 2, 'is_original': True},
+                'Диск',
+                {'name': 'no_additives', 'quantity': 1, 'is_label': True},
+            ],
+        ))
+    db.session.commit()
+
+
+def count_queries(func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements)
+
+
+def test_serialize_orders_format(app):
+    seed(1)
+    order = Order.query.first()
+
+    data = serialize_orders([order], lang='en', include_mechanic=True)[0]
+
+    assert data['category'] == 'Brakes'
+    assert data['category_raw'] == 'тормоза'
+    assert data['mechanic']['username'] == 'ivan'
+    # Диск (sort_order=1) идёт перед колодками (sort_order=2), метка - в конце
+    assert data['selected_parts'] == [
+        'Диск',
+        {'part_id': order.selected_parts[0]['part_id'], 'name': 'Pads', 'quantity': 2, 'is_original': True},
+        {'name': 'NO ADDITIVES', 'quantity': 1},
+    ]
+    assert order.to_dict(lang='en') == serialize_orders([order], lang='en')[0]
+
+
+def test_serialize_orders_constant_queries(app):
+    seed(50)
+
+    few = Order.query.limit(2).all()
+    many = Order.query.all()
+
+    _, few_queries = count_queries(lambda: serialize_orders(few, lang='he', include_mechanic=True))
+    result, many_queries = count_queries(lambda: serialize_orders(many, lang='he', include_mechanic=True))
+
+    assert len(result) == 50
+    assert few_queries == many_queries
+    assert many_queries <= 4
+
+
+def test_category_aliases_follow_category_writes(app):
+    seed(1)
+    category = Category.query.first()
+    aliases = lambda: {a.alias: a.category_id for a in CategoryAlias.query.all()}
+    assert aliases() == {name: category.id for name in ('тормоза', 'Тормоза', 'Brakes', 'בלמים')}
+
+    category.name_en = 'Brake system'
+    db.session.commit()
+    assert 'Brakes' not in aliases()
+    assert aliases()['Brake system'] == category.id
+
+    order = Order.query.first()
+    order.category = 'Brake system'
+    db.session.commit()
+    assert serialize_orders([order], lang='he')[0]['category'] == 'בלמים'
+
+    db.session.delete(category)
+    db.session.commit()
+    assert aliases() == {}
+
+
+def test_serialize_orders_with_catalog_snapshot(app):
+    seed(3)
+    orders = Order.query.all()
+    snapshot = get_catalog_snapshot()
+
+    result, queries = count_queries(lambda: serialize_orders(orders, lang='en', catalog=snapshot))
+
+    assert queries == 0
+    assert result == serialize_orders(orders, lang='en')
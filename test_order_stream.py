@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест потока событий заказов (SSE)
+Проверяет доставку событий подписчикам только после commit и фильтр по механику
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Order
+from order_stream import (
+    publish_order_event, subscribe_order_events, unsubscribe_order_events, format_sse, stream_client_limit,
+)
+
+
+@pytest.fixture
+def stream_app(app, monkeypatch):
+    # Фоновый опрос не должен мешать проверкам
+    monkeypatch.setenv('ORDER_STREAM_POLL_SECONDS', '3600')
+    yield app
+
+
+def make_order(mechanic_id):
+    order = Order(
+        mechanic_id=mechanic_id,
+        mechanic_name='Иван',
+        category='тормоза',
+        plate_number='123-45-678',
+        selected_parts=[]
+    )
+    db.session.add(order)
+    return order
+
+
+def test_events_delivered_after_commit(stream_app):
+    everyone = subscribe_order_events()
+    mine = subscribe_order_events(mechanic_id=2)
+    try:
+        order = make_order(1)
+        publish_order_event('order_created', order)
+        assert everyone.get(timeout=0) is None
+
+        db.session.commit()
+        payload = everyone.get(timeout=0)
+        assert payload['type'] == 'order_created'
+        assert payload['order_id'] == order.id
+        assert payload['updated_at']
+        assert mine.get(timeout=0) is None
+
+        # Откат - событие не уходит
+        order.status = 'готово'
+        publish_order_event('status_changed', order, old_status='новый')
+        db.session.rollback()
+        assert everyone.get(timeout=0) is None
+    finally:
+        unsubscribe_order_events(everyone)
+        unsubscribe_order_events(mine)
+
+
+def test_client_limit_leaves_threads_for_requests(stream_app, monkeypatch):
+    monkeypatch.setenv('ORDER_STREAM_MAX_CLIENTS', '6')
+    monkeypatch.setenv('GUNICORN_THREADS', '4')
+    assert stream_client_limit() == 2
+    monkeypatch.setenv('GUNICORN_THREADS', '2')
+    assert stream_client_limit() == 0
+    assert subscribe_order_events() is None
+
+    monkeypatch.setenv('GUNICORN_THREADS', '16')
+    assert stream_client_limit() == 6
+
+
+def test_format_sse():
+    text = format_sse({'type': 'status_changed', 'order_id': 5, 'status': 'готово'}, event_id=3)
+    assert text.startswith('id: 3\nevent: status_changed\ndata: {')
+    assert '"status": "готово"' in text
+    assert text.endswith('\n\n')
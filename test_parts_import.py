@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест импорта запчастей из файла (parts_import)
+Проверяет пакетную вставку/обновление, приведение категорий и отчёт об ошибках
+"""
+
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Category, Part
+from parts_import import ImportFileError, import_parts, iter_csv_rows
+
+
+def run_import(text, batch_size=2):
+    events = list(import_parts(iter_csv_rows(io.BytesIO(text.encode('utf-8'))), batch_size=batch_size))
+    return events[-1], [e for e in events if e['type'] == 'error']
+
+
+def test_import_upserts_in_batches(app):
+    db.session.add(Category(name='тормоза', name_ru='Тормоза', name_en='Brakes'))
+    db.session.add(Part(name_ru='Колодки', name='Колодки', category='тормоза', sort_order=1))
+    db.session.commit()
+
+    done, errors = run_import(
+        'name_ru;category;name_en;sort_order;is_active\n'
+        'Колодки;Brakes;Pads;5;да\n'
+        ';тормоза;;;\n'
+        'Тормозная жидкость;тормоза;;x;\n'
+        'Тормозная жидкость;Тормоза;;3;нет\n'
+        'Фильтр салона;фильтры;;;\n'
+    )
+
+    assert (done['processed'], done['created'], done['updated'], done['errors']) == (5, 2, 1, 2)
+    assert [e['row'] for e in errors] == [3, 4]
+
+    pads = Part.query.filter_by(name_ru='Колодки').one()
+    assert (pads.category, pads.name_en, pads.sort_order) == ('тормоза', 'Pads', 5)
+
+    fluid = Part.query.filter_by(name_ru='Тормозная жидкость').one()
+    assert fluid.category == 'тормоза'
+    assert fluid.name_en == 'Brake fluid'
+    assert fluid.is_active is False
+
+    # Новая категория создана и попала в индекс названий
+    assert Category.query.filter_by(name='фильтры').count() == 1
+    done, _ = run_import('name,category\nФильтр салона,фильтры\n')
+    assert (done['created'], done['updated']) == (0, 1)
+
+
+def test_reimport_keeps_manual_translations(app):
+    db.session.add(Category(name='тормоза', name_ru='Тормоза'))
+    db.session.add(Part(name_ru='Тормозная жидкость', name='Тормозная жидкость', category='тормоза',
+                        name_en='My custom EN', name_he=None))
+    db.session.commit()
+
+    done, errors = run_import('name_ru;category;sort_order\nТормозная жидкость;тормоза;7\nНеизвестная деталь;тормоза;1\n')
+    assert (done['created'], done['updated'], errors) == (1, 1, [])
+
+    fluid = Part.query.filter_by(name_ru='Тормозная жидкость').one()
+    # Ручной перевод сохранён, пустой - заполнен из словаря
+    assert fluid.name_en == 'My custom EN'
+    assert fluid.name_he
+    assert fluid.sort_order == 7
+    assert Part.query.filter_by(name_ru='Неизвестная деталь').one().name_en is None
+
+    # Повторный импорт без колонок переводов ничего не затирает
+    run_import('name_ru;category\nТормозная жидкость;тормоза\n')
+    db.session.expire_all()
+    assert Part.query.filter_by(name_ru='Тормозная жидкость').one().name_en == 'My custom EN'
+
+
+def test_import_rejects_bad_header():
+    with pytest.raises(ImportFileError):
+        iter_csv_rows(io.BytesIO('title,group\nКолодки,тормоза\n'.encode('utf-8')))
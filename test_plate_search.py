@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест поиска заказов по части гос номера
+Проверяет нормализацию номера и поиск через таблицу триграмм (SQLite)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Order, OrderPlateNgram, normalize_plate
+from plate_search import apply_plate_filter, rebuild_plate_ngrams
+
+
+@pytest.fixture
+def plates_app(app):
+    for plate in ('123-45-678', '12-345-67', 'A123BC77', '999-11-222'):
+        db.session.add(Order(mechanic_name='Иван', category='тормоза', plate_number=plate, selected_parts=[]))
+    db.session.commit()
+    yield app
+
+
+def search(text):
+    return sorted(o.plate_number for o in apply_plate_filter(Order.query, text).all())
+
+
+def test_normalize_plate():
+    assert normalize_plate('123-45-678') == '12345678'
+    assert normalize_plate(' a123 bc-77 ') == 'A123BC77'
+    assert normalize_plate(None) == ''
+
+
+def test_search_ignores_separators(plates_app):
+    assert search('12345') == ['12-345-67', '123-45-678']
+    assert search('45-67') == ['12-345-67', '123-45-678']
+    assert search('bc7') == ['A123BC77']
+    assert search('1') == ['12-345-67', '123-45-678', '999-11-222', 'A123BC77']
+    assert search('000') == []
+
+
+def test_ngrams_follow_changes(plates_app):
+    order = Order.query.filter_by(plate_number='999-11-222').one()
+    order.plate_number = '555-00-111'
+    db.session.commit()
+    assert search('99911') == []
+    assert search('55500') == ['555-00-111']
+
+    db.session.delete(order)
+    db.session.commit()
+    assert OrderPlateNgram.query.filter_by(order_id=order.id).count() == 0
+
+
+def test_rebuild(plates_app):
+    OrderPlateNgram.query.delete()
+    db.session.commit()
+    assert search('12345') == []
+
+    assert rebuild_plate_ngrams(batch_size=2) == 4
+    assert search('12345') == ['12-345-67', '123-45-678']
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест очереди печати чеков (print_queue)
+Проверяет постановку в очередь, переходы состояний задания, повтор и
+перепечатку, а также отметку printed только после успешной печати
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models import db, Order, PrintJob
+from order_stream import subscribe_order_events, unsubscribe_order_events
+from print_queue import PrintWorker, enqueue_print_job, has_active_print_job, reprint_job, retry_print_job
+
+
+@pytest.fixture
+def order(app, monkeypatch):
+    monkeypatch.setenv('THERMAL_PRINT_BACKEND', 'stdout')
+    order = Order(mechanic_name='Иван', category='тормоза', plate_number='123-45-678', selected_parts=[])
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def job_state(job_id):
+    db.session.expire_all()
+    job = db.session.get(PrintJob, job_id)
+    return job.status, job.attempts, job.last_error
+
+
+def is_printed(order_id):
+    db.session.expire_all()
+    return db.session.get(Order, order_id).printed
+
+
+def test_enqueue_and_print(app, order, capsys):
+    order_id = order.id
+    job = enqueue_print_job(order_id, 'ЧЕК 1', source='auto')
+    db.session.commit()
+    job_id = job.id
+    assert has_active_print_job(order_id)
+    assert job_state(job_id) == ('queued', 0, None)
+
+    worker = PrintWorker(app)
+    subscription = subscribe_order_events()
+    try:
+        assert worker.process_next() is True
+        # Отметка printed приходит открытым вкладкам через поток событий
+        event = subscription.get(timeout=0)
+        assert (event['type'], event['order_id']) == ('order_updated', order_id)
+    finally:
+        unsubscribe_order_events(subscription)
+    assert 'ЧЕК 1' in capsys.readouterr().out
+    assert job_state(job_id) == ('done', 1, None)
+    assert is_printed(order_id)
+    assert not has_active_print_job(order_id)
+    assert worker.process_next() is False
+
+
+def test_failure_retry_and_reprint(app, order, monkeypatch):
+    order_id = order.id
+    monkeypatch.setenv('THERMAL_PRINT_BACKEND', 'broken')
+    monkeypatch.setenv('PRINT_MAX_ATTEMPTS', '2')
+    job = enqueue_print_job(order_id, 'ЧЕК')
+    db.session.commit()
+    job_id = job.id
+    worker = PrintWorker(app)
+
+    # Неудача - снова в очереди с паузой, заказ не отмечен напечатанным
+    assert worker.process_next() is True
+    status, attempts, error = job_state(job_id)
+    assert (status, attempts) == ('queued', 1)
+    assert 'broken' in error
+    assert not is_printed(order_id)
+    assert has_active_print_job(order_id)
+    assert worker.process_next() is False
+
+    db.session.get(PrintJob, job_id).next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    worker.process_next()
+    assert job_state(job_id)[:2] == ('failed', 2)
+    assert not has_active_print_job(order_id)
+    assert not is_printed(order_id)
+
+    # Повтор упавшего задания после починки принтера
+    monkeypatch.setenv('THERMAL_PRINT_BACKEND', 'stdout')
+    retry_print_job(db.session.get(PrintJob, job_id))
+    db.session.commit()
+    assert job_state(job_id) == ('queued', 0, None)
+    worker.process_next()
+    assert job_state(job_id) == ('done', 1, None)
+    assert is_printed(order_id)
+
+    # Перепечатка - новое задание с тем же чеком
+    copy = reprint_job(db.session.get(PrintJob, job_id))
+    db.session.commit()
+    assert (copy.id != job_id, copy.receipt, copy.source, copy.status) == (True, 'ЧЕК', 'reprint', 'queued')
+    assert has_active_print_job(order_id)
+
+
+def test_enqueue_discarded_on_rollback(app, order):
+    enqueue_print_job(order.id, 'ЧЕК')
+    db.session.rollback()
+    assert PrintJob.query.count() == 0
+    assert 'print_enqueued' not in db.session.info
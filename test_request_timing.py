@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест замеров запросов (request_timing)
+Проверяет заголовок Server-Timing, строку лога и выключенный режим
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import render_template_string
+from sqlalchemy import text
+
+from models import db
+from request_timing import init_request_timing
+
+
+@pytest.fixture
+def probe_app(app):
+    """Приложение с одним маршрутом"""
+    @app.route('/probe')
+    def probe():
+        db.session.execute(text('SELECT 1'))
+        db.session.execute(text('SELECT 2'))
+        return render_template_string('{{ value }}', value='ok')
+
+    @app.route('/broken-query')
+    def broken_query():
+        try:
+            db.session.execute(text('SELECT * FROM missing_table'))
+        except Exception:
+            db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        return 'ok'
+
+    return app
+
+
+def test_server_timing_header_and_log(probe_app, monkeypatch, capsys):
+    monkeypatch.setenv('REQUEST_TIMING', 'true')
+    assert init_request_timing(probe_app)
+
+    response = probe_app.test_client().get('/probe')
+    assert response.status_code == 200
+    header = response.headers['Server-Timing']
+    assert 'db;dur=' in header and 'desc="2 queries"' in header
+    assert 'tpl;dur=' in header and 'total;dur=' in header
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+    entry = json.loads(lines[-1])
+    assert entry['event'] == 'request_timing'
+    assert entry['path'] == '/probe'
+    assert entry['queries'] == 2
+    assert entry['status'] == 200
+
+
+def test_disabled_by_default(probe_app, monkeypatch):
+    monkeypatch.delenv('REQUEST_TIMING', raising=False)
+    assert not init_request_timing(probe_app)
+    response = probe_app.test_client().get('/probe')
+    assert 'Server-Timing' not in response.headers
+
+
+def test_failed_statement_does_not_skew_timing(probe_app, monkeypatch):
+    monkeypatch.setenv('REQUEST_TIMING', 'true')
+    assert init_request_timing(probe_app)
+    client = probe_app.test_client()
+
+    assert 'desc="1 queries"' in client.get('/broken-query').headers['Server-Timing']
+    assert 'desc="2 queries"' in client.get('/probe').headers['Server-Timing']
+    # Упавший запрос не оставляет в соединении из пула неснятых отметок времени
+    with db.engine.connect() as conn:
+        assert not any(isinstance(value, list) and value for value in conn.info.values())